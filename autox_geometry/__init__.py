@@ -0,0 +1,7 @@
+# Shared MALDI plate geometry handling for fleX MS1 AutoXecute Generator and fleX MS/MS AutoXecute Generator.
+
+from autox_geometry.model import PlateGeometry, get_plate_geometry, parse_position_name
+from autox_geometry.registry import GeometryRegistry, get_geometry_registry
+from autox_geometry.route import get_route_length, optimize_route
+from autox_geometry.overhead import METHOD_LOAD_TIME, STAGE_SPEED, get_overhead_params, get_method_load_time, \
+    get_travel_time
@@ -0,0 +1,177 @@
+import os
+import re
+import math
+import threading
+from lxml import etree as et
+
+# Attribute names used for physical spot coordinates in geometry (*.xeo) files, in order of preference.
+X_COORDINATE_ATTRIBUTES = ['UnitCoord_X', 'PosX', 'XPos', 'X', 'x']
+Y_COORDINATE_ATTRIBUTES = ['UnitCoord_Y', 'PosY', 'YPos', 'Y', 'y']
+# Attribute names used for the plate dimensions on the root element of geometry (*.xeo) files.
+WIDTH_ATTRIBUTES = ['Width', 'PlateWidth', 'SizeX']
+HEIGHT_ATTRIBUTES = ['Height', 'PlateHeight', 'SizeY']
+# Distance in µm spanned by the columns of a standard microplate (i.e. 24 columns at 4.5 mm pitch). Used to estimate the
+# spot pitch for geometry files without physical coordinates.
+MICROPLATE_COLUMN_SPAN = 108000.0
+
+POSITION_NAME_PATTERN = re.compile(r'^([A-Z]+)(\d+)$')
+
+_GEOMETRY_CACHE = {}
+_GEOMETRY_CACHE_LOCK = threading.Lock()
+
+
+def parse_position_name(position_name):
+    """
+    Convert a plate position name into zero-based row and column indices. Rows follow the plate map convention used by
+    the example plate maps (A-Z followed by AA-ZZ).
+
+    :param position_name: Plate position name (i.e. "A1" or "AB12").
+    :type position_name: str
+    :return: Tuple of row and column indices or None if the position name does not follow the row/column convention.
+    :rtype: tuple[int, int] | None
+    """
+    match = POSITION_NAME_PATTERN.match(position_name)
+    if match is None:
+        return None
+    letters, column = match.groups()
+    if len(letters) == 1:
+        row = ord(letters) - 65
+    elif len(letters) == 2:
+        row = 26 + (ord(letters[0]) - 65) * 26 + (ord(letters[1]) - 65)
+    else:
+        return None
+    return row, int(column) - 1
+
+
+def _get_float_attribute(element, attribute_names):
+    """
+    Get the first available attribute from a list of candidate attribute names as a float.
+
+    :param element: XML element.
+    :param attribute_names: Candidate attribute names in order of preference.
+    :type attribute_names: list[str]
+    :return: Attribute value or None if none of the attributes are present or numeric.
+    :rtype: float | None
+    """
+    for attribute in attribute_names:
+        value = element.get(attribute)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+class PlateGeometry(object):
+    """
+    Parsed MALDI plate geometry (*.xeo) file. Exposes the set of position names for constant time lookup, the physical
+    X/Y coordinates of each spot, and the plate dimensions. Physical coordinates are assumed to be in µm. If a geometry
+    file does not provide physical coordinates, coordinates are derived from the row/column position names using the
+    spot pitch of a standard microplate with the same number of columns.
+
+    :param geometry_path: Path to the geometry (*.xeo) file.
+    :type geometry_path: str
+    """
+    def __init__(self, geometry_path):
+        """
+        Constructor Method
+        """
+        self.geometry_path = geometry_path
+        root = et.parse(geometry_path).getroot()
+        # Spot positions in the order they are listed in the geometry file.
+        self.positions = {}
+        has_physical_coordinates = True
+        for element in root.xpath('//PlateSpots//*[@PositionName]'):
+            x = _get_float_attribute(element, X_COORDINATE_ATTRIBUTES)
+            y = _get_float_attribute(element, Y_COORDINATE_ATTRIBUTES)
+            if x is None or y is None:
+                has_physical_coordinates = False
+            self.positions[element.get('PositionName')] = (x, y)
+        self.has_physical_coordinates = has_physical_coordinates
+        self.position_names = frozenset(self.positions.keys())
+        self._order = {position_name: index for index, position_name in enumerate(self.positions.keys())}
+
+        row_cols = {i: parse_position_name(i) for i in self.positions.keys()}
+        self.rows = len(set(i[0] for i in row_cols.values() if i is not None))
+        self.columns = len(set(i[1] for i in row_cols.values() if i is not None))
+        if not has_physical_coordinates:
+            pitch = MICROPLATE_COLUMN_SPAN / max(self.columns, 1)
+            for position_name, row_col in row_cols.items():
+                self.positions[position_name] = (row_col[1] * pitch, row_col[0] * pitch) if row_col else (0.0, 0.0)
+
+        # Plate dimensions in the same units as the spot coordinates.
+        width = _get_float_attribute(root, WIDTH_ATTRIBUTES)
+        height = _get_float_attribute(root, HEIGHT_ATTRIBUTES)
+        if (width is None or height is None) and self.positions:
+            xs = [i[0] for i in self.positions.values()]
+            ys = [i[1] for i in self.positions.values()]
+            width = max(xs) - min(xs)
+            height = max(ys) - min(ys)
+        self.width = width
+        self.height = height
+
+    def __contains__(self, position_name):
+        return position_name in self.position_names
+
+    def __len__(self):
+        return len(self.positions)
+
+    def get_coordinates(self, position_name):
+        """
+        Get the X/Y coordinates of a spot.
+
+        :param position_name: Plate position name.
+        :type position_name: str
+        :return: Tuple of X and Y coordinates.
+        :rtype: tuple[float, float]
+        """
+        return self.positions[position_name]
+
+    def get_distance(self, position_name_1, position_name_2):
+        """
+        Get the straight line distance between two spots.
+
+        :param position_name_1: First plate position name.
+        :type position_name_1: str
+        :param position_name_2: Second plate position name.
+        :type position_name_2: str
+        :return: Distance between the two spots.
+        :rtype: float
+        """
+        x1, y1 = self.positions[position_name_1]
+        x2, y2 = self.positions[position_name_2]
+        return math.hypot(x2 - x1, y2 - y1)
+
+    def sort_spots(self, spots):
+        """
+        Sort spots in the order they appear in the geometry file. Spots that are not on the geometry are dropped.
+
+        :param spots: Plate position names.
+        :type spots: collections.abc.Iterable[str]
+        :return: Sorted plate position names.
+        :rtype: list[str]
+        """
+        return sorted((i for i in spots if i in self.position_names), key=self._order.__getitem__)
+
+
+def get_plate_geometry(geometry_path):
+    """
+    Obtain the parsed PlateGeometry for a geometry (*.xeo) file. Parsed geometries are cached per file and only parsed
+    again if the file modification time or size changes.
+
+    :param geometry_path: Path to the geometry (*.xeo) file.
+    :type geometry_path: str
+    :return: Parsed plate geometry.
+    :rtype: PlateGeometry
+    """
+    stat = os.stat(geometry_path)
+    key = os.path.abspath(geometry_path)
+    with _GEOMETRY_CACHE_LOCK:
+        cached = _GEOMETRY_CACHE.get(key)
+        if cached is not None and cached[0] == (stat.st_mtime, stat.st_size):
+            return cached[1]
+    geometry = PlateGeometry(geometry_path)
+    with _GEOMETRY_CACHE_LOCK:
+        _GEOMETRY_CACHE[key] = ((stat.st_mtime, stat.st_size), geometry)
+    return geometry
@@ -0,0 +1,57 @@
+import os
+import configparser
+
+# Method load and stage travel overheads shared by the acquisition time estimates of fleX MS1 AutoXecute Generator and
+# fleX MS/MS AutoXecute Generator. Both read the overheads from etc/acquisition_time.cfg, so overheads calibrated from
+# past runs are used by both estimates.
+
+ACQUISITION_TIME_CONFIG_PATH = os.path.join(os.path.split(os.path.dirname(__file__))[0], 'etc',
+                                            'acquisition_time.cfg')
+# Default time in seconds for timsControl to load a method.
+METHOD_LOAD_TIME = 3.0
+# Default stage speed in µm per second.
+STAGE_SPEED = 10000.0
+
+
+def get_overhead_params(config_path=ACQUISITION_TIME_CONFIG_PATH):
+    """
+    Obtain the method load time and stage speed from the [Overheads] section of the acquisition time config file.
+    Defaults are used for any missing parameters.
+
+    :param config_path: Path to the acquisition time config file.
+    :type config_path: str
+    :return: Dictionary containing the method load time in seconds and stage speed in µm per second.
+    :rtype: dict
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    return {'method_load_time': config.getfloat('Overheads', 'method_load_time', fallback=METHOD_LOAD_TIME),
+            'stage_speed': config.getfloat('Overheads', 'stage_speed', fallback=STAGE_SPEED)}
+
+
+def get_method_load_time(method_loads, method_load_time=METHOD_LOAD_TIME):
+    """
+    Get the time spent loading methods.
+
+    :param method_loads: Number of method loads.
+    :type method_loads: int
+    :param method_load_time: Time in seconds to load a method.
+    :type method_load_time: float
+    :return: Method load time in seconds.
+    :rtype: float
+    """
+    return method_loads * method_load_time
+
+
+def get_travel_time(travel_distance, stage_speed=STAGE_SPEED):
+    """
+    Get the time spent moving the stage between spots.
+
+    :param travel_distance: Straight line stage travel distance in µm.
+    :type travel_distance: float
+    :param stage_speed: Stage speed in µm per second.
+    :type stage_speed: float
+    :return: Stage travel time in seconds.
+    :rtype: float
+    """
+    return travel_distance / stage_speed
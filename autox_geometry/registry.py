@@ -0,0 +1,198 @@
+import os
+import json
+import threading
+import configparser
+from functools import lru_cache
+from autox_geometry.model import get_plate_geometry
+
+# Generalized MALDI target plate formats that can be listed in the [GeometryFiles] config section as
+# <format>spot_geometries.
+GEOMETRY_FORMATS = [24, 48, 96, 384, 1536, 6144]
+
+# Bump when the layout of the persisted index changes so that stale indices are discarded.
+INDEX_VERSION = 1
+
+
+class GeometryRegistry(object):
+    """
+    Registry of MALDI plate geometry (*.xeo) files shared by fleX MS1 AutoXecute Generator and fleX MS/MS AutoXecute
+    Generator. The [GeometryFiles] section of the config file is parsed once and geometry format lookups are answered
+    from a precomputed dictionary. Geometry files are indexed by path, modification time, and size so that each file is
+    only read once, and the index is persisted next to the config file so it can be reused across sessions.
+
+    :param config_path: Path to the ms1_autox_generator.cfg config file.
+    :type config_path: str
+    :param index_path: Path to the persisted geometry index. Defaults to geometry_index.json in the same directory as
+        the config file.
+    :type index_path: str | None
+    """
+    def __init__(self, config_path, index_path=None):
+        """
+        Constructor Method
+        """
+        self.config_path = config_path
+        if index_path is None:
+            index_path = os.path.join(os.path.dirname(config_path), 'geometry_index.json')
+        self.index_path = index_path
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.geometry_path = config['GeometryFiles']['path']
+        self.defaults = set(i for i in config['GeometryFiles']['defaults'].split(',') if i)
+        # Precompute geometry name -> generalized plate format.
+        self.formats = {}
+        for plate_format in GEOMETRY_FORMATS:
+            key = f'{plate_format}spot_geometries'
+            if key in config['GeometryFiles']:
+                for geometry in config['GeometryFiles'][key].split(','):
+                    if geometry:
+                        self.formats[geometry] = plate_format
+
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+        # Geometry name -> geometry file path from the most recent scan.
+        self.geometry_files = {}
+
+    def _load_index(self):
+        """
+        Load the persisted geometry index if one exists.
+
+        :return: Dictionary with geometry file paths as keys and dictionaries containing mtime, size, and whether the
+            file is a flexImaging geometry as values.
+        :rtype: dict
+        """
+        try:
+            with open(self.index_path, 'r') as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+        if index.get('version') != INDEX_VERSION:
+            return {}
+        return index.get('files', {})
+
+    def _save_index(self):
+        """
+        Persist the geometry index. Failing to write the index (i.e. read only install directory) is not an error; the
+        index will simply be rebuilt in the next session.
+        """
+        try:
+            with open(self.index_path, 'w') as index_file:
+                json.dump({'version': INDEX_VERSION, 'files': self._index}, index_file)
+        except OSError:
+            pass
+
+    def get_geometry_format(self, geometry):
+        """
+        Obtain the generalized MALDI target plate geometry format for a geometry name. Either 24 spot, 48 spot, 96 spot,
+        384 spot, 1536 spot, or 6144 spot plates.
+
+        :param geometry: Geometry name (i.e. the geometry attribute of an AutoXecute sequence).
+        :type geometry: str
+        :return: Generalized MALDI target plate geometry format or None if the geometry is not listed in the config.
+        :rtype: int | None
+        """
+        return self.formats.get(geometry)
+
+    def get_geometry_files(self, geometry_path=None):
+        """
+        Obtain the list of MALDI plate geometries to be selected from. Only geometries in the config inclusion list that
+        are not imaging geometries from flexImaging are returned. Files whose path, modification time, and size match
+        the persisted index are not read again.
+
+        :param geometry_path: Path to the directory containing MALDI plate geometry (*.xeo) files. Defaults to the path
+            in the config file.
+        :type geometry_path: str | None
+        :return: Dictionary containing the geometry name as keys and the path to the corresponding geometry files as
+            values.
+        :rtype: dict
+        """
+        if geometry_path is None:
+            geometry_path = self.geometry_path
+        geometry_files = {}
+        with self._lock:
+            changed = False
+            for path, stat in scan_geometry_files(geometry_path):
+                name = os.path.splitext(os.path.split(path)[-1])[0]
+                # Discard geometry files not found in inclusion list before touching the file contents.
+                if name not in self.defaults:
+                    continue
+                entry = self._index.get(path)
+                if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+                    entry = {'mtime': stat.st_mtime,
+                             'size': stat.st_size,
+                             'imaging': is_imaging_geometry(path)}
+                    self._index[path] = entry
+                    changed = True
+                # Only keep geometry files that are not imaging geometries from flexImaging.
+                if not entry['imaging']:
+                    geometry_files[name] = os.path.normpath(path)
+            if changed:
+                self._save_index()
+            self.geometry_files = geometry_files
+        return geometry_files
+
+    def get_plate_geometry(self, geometry, geometry_path=None):
+        """
+        Obtain the parsed PlateGeometry for a geometry name. The GeometryFiles directory is only scanned if the geometry
+        was not found in the most recent scan.
+
+        :param geometry: Geometry name (i.e. the geometry attribute of an AutoXecute sequence).
+        :type geometry: str
+        :param geometry_path: Path to the directory containing MALDI plate geometry (*.xeo) files. Defaults to the path
+            in the config file.
+        :type geometry_path: str | None
+        :return: Parsed plate geometry or None if the geometry file could not be found.
+        :rtype: autox_geometry.model.PlateGeometry | None
+        """
+        if geometry not in self.geometry_files:
+            self.get_geometry_files(geometry_path)
+        if geometry not in self.geometry_files:
+            return None
+        return get_plate_geometry(self.geometry_files[geometry])
+
+
+def scan_geometry_files(geometry_path):
+    """
+    Recursively find geometry (*.xeo) files using os.scandir so that file stats are obtained from the directory listing
+    where the platform allows it.
+
+    :param geometry_path: Path to the directory containing MALDI plate geometry (*.xeo) files.
+    :type geometry_path: str
+    :return: Generator of tuples of the geometry file path and its os.stat_result.
+    :rtype: collections.abc.Iterator[tuple[str, os.stat_result]]
+    """
+    try:
+        entries = list(os.scandir(geometry_path))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from scan_geometry_files(entry.path)
+        elif os.path.splitext(entry.name)[1] == '.xeo':
+            yield entry.path, entry.stat()
+
+
+def is_imaging_geometry(geometry_path):
+    """
+    Determine whether a geometry file was created by flexImaging.
+
+    :param geometry_path: Path to the geometry (*.xeo) file.
+    :type geometry_path: str
+    :return: Whether the geometry file is an imaging geometry from flexImaging.
+    :rtype: bool
+    """
+    with open(geometry_path, 'rb') as geometry_object:
+        return b'flexImaging' in geometry_object.read()
+
+
+@lru_cache(maxsize=None)
+def get_geometry_registry(config_path):
+    """
+    Obtain the shared GeometryRegistry for a config file. The registry is only constructed once per config file.
+
+    :param config_path: Path to the ms1_autox_generator.cfg config file.
+    :type config_path: str
+    :return: Geometry registry for the config file.
+    :rtype: GeometryRegistry
+    """
+    return GeometryRegistry(os.path.abspath(config_path))
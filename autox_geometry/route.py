@@ -0,0 +1,145 @@
+# Stage travel route optimization for spots on a MALDI plate. numpy is imported where needed so that importing
+# autox_geometry stays lightweight.
+
+# Maximum number of 2-opt passes over a route.
+MAX_2OPT_PASSES = 10
+
+
+def get_route_length(geometry, spots):
+    """
+    Get the total straight line stage travel distance when acquiring spots in the given order.
+
+    :param geometry: Plate geometry used to look up spot coordinates.
+    :type geometry: autox_geometry.PlateGeometry
+    :param spots: Plate position names in acquisition order.
+    :type spots: list[str]
+    :return: Total travel distance in the units of the geometry coordinates.
+    :rtype: float
+    """
+    return sum(geometry.get_distance(spots[i], spots[i + 1]) for i in range(len(spots) - 1))
+
+
+def get_path_length(coordinates):
+    """
+    Get the total straight line distance along coordinates in order.
+
+    :param coordinates: Array of X/Y coordinates with shape (n, 2).
+    :type coordinates: numpy.ndarray
+    :return: Total distance in the units of the coordinates.
+    :rtype: float
+    """
+    import numpy as np
+
+    return float(np.sum(np.hypot(*(coordinates[1:] - coordinates[:-1]).T)))
+
+
+def get_nearest_neighbor_route(coordinates):
+    """
+    Build a route through all coordinates by always moving to the closest coordinate not yet visited, starting from
+    the first coordinate.
+
+    :param coordinates: Array of X/Y coordinates with shape (n, 2).
+    :type coordinates: numpy.ndarray
+    :return: Array of indices into coordinates in route order.
+    :rtype: numpy.ndarray
+    """
+    import numpy as np
+
+    count = coordinates.shape[0]
+    route = np.zeros(count, dtype=int)
+    visited = np.zeros(count, dtype=bool)
+    visited[0] = True
+    for step in range(1, count):
+        distances = np.hypot(*(coordinates - coordinates[route[step - 1]]).T)
+        distances[visited] = np.inf
+        route[step] = np.argmin(distances)
+        visited[route[step]] = True
+    return route
+
+
+def improve_route_2opt(coordinates, route, max_passes=MAX_2OPT_PASSES):
+    """
+    Improve an open route with 2-opt moves, reversing the segment of the route between two edges whenever that
+    shortens the route. The first coordinate of the route is kept in place.
+
+    :param coordinates: Array of X/Y coordinates with shape (n, 2).
+    :type coordinates: numpy.ndarray
+    :param route: Array of indices into coordinates in route order.
+    :type route: numpy.ndarray
+    :param max_passes: Maximum number of passes over the route.
+    :type max_passes: int
+    :return: Array of indices into coordinates in improved route order.
+    :rtype: numpy.ndarray
+    """
+    import numpy as np
+
+    route = route.copy()
+    count = route.shape[0]
+    points = coordinates[route]
+    edges = np.hypot(*(points[1:] - points[:-1]).T)
+    for i in range(max_passes):
+        improved = False
+        for start in range(count - 2):
+            # Reversing route[start + 1:end + 1] replaces edges (start, start + 1) and (end, end + 1) with
+            # (start, end) and (start + 1, end + 1). The last spot has no following edge.
+            ends = np.arange(start + 2, count)
+            new_first = np.hypot(*(points[ends] - points[start]).T)
+            new_second = np.zeros(ends.shape[0])
+            new_second[:-1] = np.hypot(*(points[ends[:-1] + 1] - points[start + 1]).T)
+            old_second = np.zeros(ends.shape[0])
+            old_second[:-1] = edges[ends[:-1]]
+            delta = new_first + new_second - edges[start] - old_second
+            best = np.argmin(delta)
+            if delta[best] < -1e-9:
+                end = ends[best]
+                route[start + 1:end + 1] = route[start + 1:end + 1][::-1].copy()
+                points[start + 1:end + 1] = points[start + 1:end + 1][::-1].copy()
+                edges = np.hypot(*(points[1:] - points[:-1]).T)
+                improved = True
+        if not improved:
+            break
+    return route
+
+
+def optimize_route(geometry, spots, groups=None, max_passes=MAX_2OPT_PASSES):
+    """
+    Reorder spots to minimize stage travel using a nearest neighbor route improved with 2-opt. If groups are given, the
+    route is only optimized within runs of consecutive spots that share the same group (i.e. the same method) so that
+    the number of group changes is not increased. Each run starts from its original first spot. Runs whose optimized
+    route is not shorter keep their original order, and the original order is returned if the optimized route is longer
+    overall.
+
+    :param geometry: Plate geometry used to look up spot coordinates.
+    :type geometry: autox_geometry.PlateGeometry
+    :param spots: Plate position names in the original acquisition order. Spots may be repeated.
+    :type spots: list[str]
+    :param groups: Optional group key for each spot.
+    :type groups: list | None
+    :param max_passes: Maximum number of 2-opt passes over each run.
+    :type max_passes: int
+    :return: List of indices into spots in optimized acquisition order.
+    :rtype: list[int]
+    """
+    import numpy as np
+
+    if groups is None:
+        groups = [None] * len(spots)
+    order = []
+    run_start = 0
+    for index in range(1, len(spots) + 1):
+        if index < len(spots) and groups[index] == groups[run_start]:
+            continue
+        if index - run_start <= 2:
+            order += list(range(run_start, index))
+        else:
+            coordinates = np.array([geometry.get_coordinates(spot) for spot in spots[run_start:index]], dtype=float)
+            route = improve_route_2opt(coordinates, get_nearest_neighbor_route(coordinates), max_passes)
+            if get_path_length(coordinates[route]) < get_path_length(coordinates):
+                order += [run_start + int(i) for i in route]
+            else:
+                order += list(range(run_start, index))
+        run_start = index
+    # Optimizing runs separately can lengthen the travel between runs.
+    if get_route_length(geometry, [spots[i] for i in order]) > get_route_length(geometry, spots):
+        return list(range(len(spots)))
+    return order
@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+# Benchmark of maldi_polymerization output formats. The same datasets are converted to each output format, and the
+# write time, file size, and random access read time of each file are reported. Random access reads require pyteomics.
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'maldi_polymerization'))
+
+# Seed used to choose the spectra read in the random access benchmark so that each format reads the same spectra.
+RANDOM_ACCESS_SEED = 0
+
+
+def get_args():
+    """
+    Parse command line parameters, including required and optional parameters.
+
+    :return: Arguments with default or user specified values.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--input',
+                        help='One or more MALDI-MS .d directories acquired from the timsTOF fleX in successive '
+                             'AutoXecute runs with different, non-overlapping mass range windows.',
+                        required=True,
+                        type=str,
+                        nargs='+')
+    parser.add_argument('--outdir',
+                        help='Directory to write the benchmark files to. Defaults to a temporary directory that is '
+                             'removed after the benchmark.',
+                        default='',
+                        type=str)
+    parser.add_argument('--mode',
+                        help='Choose whether export to spectra in raw or centroid formats. Defaults to profile.',
+                        default='profile',
+                        type=str,
+                        choices=['raw', 'centroid', 'profile'])
+    parser.add_argument('--compression',
+                        help='Choose between ZLIB compression (zlib) or no compression (none). Defaults to zlib.',
+                        default='zlib',
+                        type=str,
+                        choices=['zlib', 'none'])
+    parser.add_argument('--encoding',
+                        help='Choose encoding for binary arrays: 32-bit (32) or 64-bit (64). Defaults to 64-bit.',
+                        default=64,
+                        type=int,
+                        choices=[64, 32])
+    parser.add_argument('--mz_numpress',
+                        help='Compress the m/z array with MS-Numpress linear prediction compression (linear). '
+                             'Defaults to no MS-Numpress compression.',
+                        default=None,
+                        type=str,
+                        choices=['linear'])
+    parser.add_argument('--intensity_numpress',
+                        help='Compress the intensity array with MS-Numpress short logged float compression (slof) or '
+                             'positive integer compression (pic). Defaults to no MS-Numpress compression.',
+                        default=None,
+                        type=str,
+                        choices=['slof', 'pic'])
+    parser.add_argument('--reads',
+                        help='Number of randomly chosen spectra to read from each file. Defaults to 100.',
+                        default=100,
+                        type=int)
+
+    arguments = parser.parse_args()
+    return vars(arguments)
+
+
+def read_random_spectra(path, output_format, spectrum_ids):
+    """
+    Open an mzML or mzMLb file and read spectra by ID using the file's offset index.
+
+    :param path: Path to the mzML or mzMLb file.
+    :type path: str
+    :param output_format: Output format, either "mzml" or "mzmlb".
+    :type output_format: str
+    :param spectrum_ids: IDs of the spectra to read.
+    :type spectrum_ids: list[str]
+    :return: Time in seconds taken to open the file and read the spectra.
+    :rtype: float
+    """
+    from pyteomics import mzml, mzmlb
+    start = time.perf_counter()
+    if output_format == 'mzmlb':
+        reader = mzmlb.MzMLb(path)
+    else:
+        reader = mzml.PreIndexedMzML(path)
+    with reader:
+        for spectrum_id in spectrum_ids:
+            reader.get_by_id(spectrum_id)
+    return time.perf_counter() - start
+
+
+def run():
+    """
+    Convert the input datasets to each output format and print the write time, file size, and random access read time
+    of each file.
+    """
+    from pyTDFSDK.init_tdf_sdk import init_tdf_sdk_api
+    from maldi_polymerization import PartialTsfData, OUTPUT_EXTENSIONS, write_fusion_mzml
+
+    args = get_args()
+    outdir = args['outdir'] if args['outdir'] else tempfile.mkdtemp()
+    os.makedirs(outdir, exist_ok=True)
+
+    dll = init_tdf_sdk_api()
+    dlist = [PartialTsfData(dfile, dll) for dfile in args['input']]
+    sorted_dlist_lower = sorted(dlist, key=lambda x: x.MzAcqRangeLower)
+    frame_count = dlist[0].analysis['Frames'].shape[0]
+    random.seed(RANDOM_ACCESS_SEED)
+    spectrum_ids = ['scan=' + str(random.randint(1, frame_count)) for i in range(args['reads'])]
+
+    results = []
+    for output_format, extension in OUTPUT_EXTENSIONS.items():
+        output = os.path.join(outdir, 'benchmark' + extension)
+        start = time.perf_counter()
+        write_fusion_mzml(dlist,
+                          sorted_dlist_lower,
+                          args['input'],
+                          output,
+                          args['mode'],
+                          args['compression'],
+                          args['encoding'],
+                          False,
+                          output_format=output_format,
+                          mz_numpress=args['mz_numpress'],
+                          intensity_numpress=args['intensity_numpress'])
+        write_time = time.perf_counter() - start
+        results.append((output_format,
+                        write_time,
+                        os.path.getsize(output),
+                        read_random_spectra(output, output_format, spectrum_ids)))
+
+    print(f'{"Format":<8}{"Write (s)":>12}{"Size (MB)":>12}{"Reads (s)":>12}')
+    for output_format, write_time, size, read_time in results:
+        print(f'{output_format:<8}{write_time:>12.2f}{size / 1024 ** 2:>12.2f}{read_time:>12.2f}')
+    print(f'{frame_count} spectra written; {args["reads"]} spectra read at random from each file.')
+
+    if not args['outdir']:
+        shutil.rmtree(outdir)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import tempfile
+
+# Benchmark for parsing a MALDI plate map and writing an AutoXecute sequence in fleX MS1 AutoXecute Generator.
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ms1_autox_generator'))
+
+
+def get_args():
+    """
+    Parse command line parameters, including required and optional parameters.
+
+    :return: Arguments with default or user specified values.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--rows',
+                        help='Number of plate rows. Defaults to 64 (6144 spot plate).',
+                        default=64,
+                        type=int)
+    parser.add_argument('--columns',
+                        help='Number of plate columns. Defaults to 96 (6144 spot plate).',
+                        default=96,
+                        type=int)
+    parser.add_argument('--conditions',
+                        help='Number of distinct conditions on the plate map. Defaults to 96.',
+                        default=96,
+                        type=int)
+    parser.add_argument('--methods',
+                        help='Number of methods. Defaults to 48.',
+                        default=48,
+                        type=int)
+    parser.add_argument('--repeats',
+                        help='Number of repeats to measure. Defaults to 5.',
+                        default=5,
+                        type=int)
+
+    arguments = parser.parse_args()
+    return vars(arguments)
+
+
+def get_row_names(rows):
+    """
+    Get plate row names following the plate map convention (A-Z followed by AA-ZZ).
+
+    :param rows: Number of plate rows.
+    :type rows: int
+    :return: List of row names.
+    :rtype: list[str]
+    """
+    letters = [chr(i) for i in range(65, 91)]
+    return (letters + [i + j for i in letters for j in letters])[:rows]
+
+
+def write_test_files(directory, rows, columns, conditions):
+    """
+    Write a synthetic plate map (*.csv) and geometry (*.xeo) file where every spot is assigned a condition.
+
+    :param directory: Directory to write the files to.
+    :type directory: str
+    :param rows: Number of plate rows.
+    :type rows: int
+    :param columns: Number of plate columns.
+    :type columns: int
+    :param conditions: Number of distinct conditions.
+    :type conditions: int
+    :return: Tuple of the plate map path and geometry path.
+    :rtype: tuple[str, str]
+    """
+    row_names = get_row_names(rows)
+    plate_map_path = os.path.join(directory, 'plate_map.csv')
+    with open(plate_map_path, 'w') as plate_map:
+        plate_map.write(',' + ','.join(str(i) for i in range(1, columns + 1)) + '\n')
+        for row, row_name in enumerate(row_names):
+            plate_map.write(row_name + ',' + ','.join(f'condition_{(row * columns + col) % conditions}'
+                                                      for col in range(columns)) + '\n')
+    geometry_path = os.path.join(directory, 'geometry.xeo')
+    with open(geometry_path, 'w') as geometry:
+        geometry.write('<?xml version="1.0" encoding="UTF-8"?>\n<PlateType><PlateSpots>\n')
+        for row_name in row_names:
+            for col in range(1, columns + 1):
+                geometry.write(f'<PlateSpot PositionName="{row_name}{col}"/>\n')
+        geometry.write('</PlateSpots></PlateType>\n')
+    return plate_map_path, geometry_path
+
+
+def run():
+    """
+    Run the plate map parsing and AutoXecute sequence writing benchmark and report the median of each timing.
+    """
+    args = get_args()
+    from autox_seq import parse_maldi_plate_map, write_autox_seq
+
+    with tempfile.TemporaryDirectory() as directory:
+        plate_map_path, geometry_path = write_test_files(directory, args['rows'], args['columns'], args['conditions'])
+        methods = {f'method_{i}.m': os.path.join(directory, 'Methods', f'method_{i}.m') for i in range(args['methods'])}
+        output_path = os.path.join(directory, 'benchmark.run')
+        parse_times = []
+        write_times = []
+        for i in range(args['repeats']):
+            start = time.perf_counter()
+            conditions_dict = parse_maldi_plate_map(plate_map_path)
+            parsed = time.perf_counter()
+            write_autox_seq(conditions_dict, methods, output_path, 'benchmark', geometry_path)
+            written = time.perf_counter()
+            parse_times.append(parsed - start)
+            write_times.append(written - parsed)
+        run_bytes = os.path.getsize(output_path)
+
+    print(f'MS1 sequence benchmark ({args["rows"] * args["columns"]} spots, {args["conditions"]} conditions, '
+          f'{args["methods"]} methods, median of {args["repeats"]})')
+    print(f'{"parse_s":>10}: {statistics.median(parse_times):.3f}')
+    print(f'{"write_s":>10}: {statistics.median(write_times):.3f}')
+    print(f'{"run_bytes":>10}: {run_bytes}')
+
+
+if __name__ == '__main__':
+    run()
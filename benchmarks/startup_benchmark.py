@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Benchmark for the time it takes the fleX MS/MS AutoXecute Generator to paint its first window.
+
+# Modules that should not be loaded before the first paint.
+HEAVY_MODULES = ['pymaldiproc', 'pyopenms', 'plotly_resampler', 'pandas']
+
+
+def get_args():
+    """
+    Parse command line parameters, including required and optional parameters.
+
+    :return: Arguments with default or user specified values.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--autox',
+                        help='Optional AutoXecute sequence (*.run file) used to also measure the main dashboard layout '
+                             'payload that is sent once the sequence has been loaded.',
+                        default='',
+                        type=str)
+    parser.add_argument('--repeats',
+                        help='Number of cold starts to measure. Defaults to 5.',
+                        default=5,
+                        type=int)
+    parser.add_argument('--probe',
+                        help=argparse.SUPPRESS,
+                        action='store_true')
+
+    arguments = parser.parse_args()
+    return vars(arguments)
+
+
+def probe(autox_seq):
+    """
+    Measure a single cold start in the current interpreter. The time to first paint is the time taken to import the
+    app and serve both the index page and the initial layout, which is everything the webview window needs before it
+    can render. If an AutoXecute sequence is given, the time to build and serialize the main dashboard layout (time to
+    interactive) and the deferred modal window bodies are also measured. Results are printed to stdout as JSON.
+
+    :param autox_seq: Path to an AutoXecute sequence (*.run file) or an empty string.
+    :type autox_seq: str
+    """
+    start = time.perf_counter()
+    from msms_autox_generator.gui import app
+    imported = time.perf_counter()
+    client = app.server.test_client()
+    index = client.get('/')
+    index_served = time.perf_counter()
+    layout = client.get('/_dash-layout')
+    layout_served = time.perf_counter()
+    results = {'import_s': imported - start,
+               'index_s': index_served - imported,
+               'layout_s': layout_served - index_served,
+               'first_paint_s': layout_served - start,
+               'index_status': index.status_code,
+               'layout_status': layout.status_code,
+               'layout_bytes': len(layout.data),
+               'heavy_modules_loaded': [i for i in HEAVY_MODULES if i in sys.modules]}
+    if autox_seq:
+        from lxml import etree as et
+        from plotly.io.json import to_json_plotly
+        from msms_autox_generator.layout import (get_dashboard_layout, get_preprocessing_parameters_layout,
+                                                 get_autox_validation_modal_layout, get_run_layout)
+        from msms_autox_generator.util import get_maldi_dda_preprocessing_params, get_autox_path_dict
+        params = get_maldi_dda_preprocessing_params()
+        dashboard_start = time.perf_counter()
+        dashboard = to_json_plotly(get_dashboard_layout(params, autox_seq))
+        results['dashboard_s'] = time.perf_counter() - dashboard_start
+        results['dashboard_bytes'] = len(dashboard)
+        autox = et.parse(autox_seq).getroot()
+        modals_start = time.perf_counter()
+        modals = to_json_plotly([get_autox_validation_modal_layout(get_autox_path_dict(autox)),
+                                 get_preprocessing_parameters_layout(params),
+                                 get_run_layout(autox.attrib['directory'])])
+        results['deferred_modals_s'] = time.perf_counter() - modals_start
+        results['deferred_modals_bytes'] = len(modals)
+    print(json.dumps(results))
+
+
+def run():
+    """
+    Run the startup benchmark in fresh interpreters and report the median of each timing.
+    """
+    args = get_args()
+    if args['probe']:
+        probe(args['autox'])
+        return
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([repo_root, os.environ.get('PYTHONPATH', '')]))
+    results = []
+    for i in range(args['repeats']):
+        process_start = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--probe', '--autox', args['autox']],
+                                env=env,
+                                cwd=repo_root,
+                                capture_output=True,
+                                text=True,
+                                check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['process_s'] = time.perf_counter() - process_start
+        results.append(result)
+
+    print(f'Startup benchmark ({args["repeats"]} cold starts, median)')
+    for key in ['import_s', 'index_s', 'layout_s', 'first_paint_s', 'process_s']:
+        print(f'{key:>16}: {statistics.median([i[key] for i in results]):.3f}')
+    if args['autox']:
+        for key in ['dashboard_s', 'deferred_modals_s']:
+            print(f'{key:>16}: {statistics.median([i[key] for i in results]):.3f}')
+    for key in ['layout_bytes', 'dashboard_bytes', 'deferred_modals_bytes']:
+        if key in results[-1]:
+            print(f'{key:>16}: {int(statistics.median([i[key] for i in results]))}')
+    print(f'{"heavy modules":>16}: {", ".join(results[-1]["heavy_modules_loaded"]) or "none"}')
+
+
+if __name__ == '__main__':
+    run()
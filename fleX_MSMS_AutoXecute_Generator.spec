@@ -15,6 +15,7 @@ a = Analysis(
 		('C:\\Users\\bass\\code\\pyMALDIproc\\etc\\preprocessing.cfg', 'etc'),
 		('C:\\Users\\bass\\.conda\\envs\\pmp\\Lib\\site-packages\\TDF-SDK', 'TDF-SDK'),
 		('C:\\Users\\bass\\code\\flex_maldi_dda_automation\\etc\\ms1_autox_generator.cfg', 'etc'),
+		('C:\\Users\\bass\\code\\flex_maldi_dda_automation\\etc\\acquisition_time.cfg', 'etc'),
 		('C:\\Users\\bass\\code\\flex_maldi_dda_automation\\etc\\plate_map_legend.csv', 'etc'),
 		('LICENSE.md', '.'),
 		('fleX_MSMS_AutoXecute_Generator_Third_Party_Licenses.txt', '.'),
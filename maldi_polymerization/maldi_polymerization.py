@@ -1,7 +1,18 @@
+import re
 import sys
-import copy
-import gc
+import json
+import time
+import queue
+import shutil
+import hashlib
+import pathlib
+import sqlite3
 import argparse
+import datetime
+import threading
+import collections
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
 from psims.mzml import MzMLWriter
 from pyTDFSDK.init_tdf_sdk import *
 from pyTDFSDK.classes import *
@@ -21,6 +32,32 @@ INSTRUMENT_SOURCE_TYPE = {'0': 'unspecified',
                           '12': 'GC-APCI',
                           '13': 'VIP-HESI-APCI',
                           '18': 'VIP-HESI'}
+# Number of frame chunks per worker process that may be pending or waiting to be written in parallel mode.
+CHUNKS_PER_PROCESS = 2
+# File extension for each output format.
+OUTPUT_EXTENSIONS = {'mzml': '.mzML', 'mzmlb': '.mzMLb'}
+# Number of array elements per chunk of the HDF5 datasets in mzMLb files.
+MZMLB_BLOCK_SIZE = 2 ** 20
+# gzip compression level of the HDF5 datasets in mzMLb files.
+MZMLB_COMPRESSION_LEVEL = 4
+# PSI-MS names of the MS-Numpress compression modes for binary arrays.
+NUMPRESS_COMPRESSION = {'linear': 'MS-Numpress linear prediction compression',
+                        'pic': 'MS-Numpress positive integer compression',
+                        'slof': 'MS-Numpress short logged float compression'}
+# Fraction of the run spent waiting for prefetched spectra above which a run is reported as I/O-bound.
+IO_BOUND_WAIT_FRACTION = 0.5
+# Default regular expression used in batch mode to get the sample name of a dataset from its name without the .d
+# extension. Trailing window numbers (i.e. "strain1_mr1", "strain1_w2", or "strain1_3") are removed.
+SAMPLE_PATTERN = r'^(?P<sample>.+?)[_-](?:mr|w|window|range)?\d+$'
+# Frame ID (i.e. "5") or inclusive range of frame IDs (i.e. "10-20") accepted by --frames.
+FRAME_ID_PATTERN = re.compile(r'^(\d+)(?:-(\d+))?$')
+# Name of the manifest written to the output directory in batch mode.
+MANIFEST_FILENAME = 'maldi_polymerization_manifest.json'
+# Extension added to the output path to get the checkpoint directory, and name of the progress journal in it.
+CHECKPOINT_EXTENSION = '.checkpoint'
+CHECKPOINT_JOURNAL = 'progress.jsonl'
+# Datasets opened by each worker process in parallel mode, sorted by MzAcqRangeLower from lowest to highest.
+WORKER_SORTED_DLIST_LOWER = None
 
 
 def get_args():
@@ -33,14 +70,37 @@ def get_args():
 
     parser.add_argument('--input',
                         help='One or more MALDI-MS .d directories acquired from the timsTOF fleX in successive '
-                             'AutoXecute runs with different, non-overlapping mass range windows.',
-                        required=True,
+                             'AutoXecute runs with different, non-overlapping mass range windows. Required unless '
+                             '--batch is used.',
+                        default=None,
                         type=str,
                         nargs='+')
     parser.add_argument('--output',
-                        help='Name of the resulting mzML file.',
-                        required=True,
+                        help='Name of the resulting mzML or mzMLb file. If --batch is used, the directory to write '
+                             'the resulting files and manifest to, which defaults to the --batch directory.',
+                        default=None,
                         type=str)
+    parser.add_argument('--batch',
+                        help='Directory to search for .d directories. Datasets are grouped into window sets by '
+                             'sample name, and each window set is converted to its own file.',
+                        default=None,
+                        type=str)
+    parser.add_argument('--sample_pattern',
+                        help='Regular expression used with --batch to get the sample name from the name of a .d '
+                             'directory. The sample name is the "sample" group or the first group. Defaults to '
+                             'removing a trailing window number (i.e. strain1_mr1.d -> strain1).',
+                        default=SAMPLE_PATTERN,
+                        type=str)
+    parser.add_argument('--workers',
+                        help='Number of window sets converted at the same time when --batch is used. Defaults to 1.',
+                        default=1,
+                        type=int)
+    parser.add_argument('--format',
+                        help='Choose whether to write XML mzML (mzml) or HDF5 mzMLb (mzmlb) files. mzMLb requires '
+                             'h5py. Defaults to mzml.',
+                        default='mzml',
+                        type=str,
+                        choices=['mzml', 'mzmlb'])
     parser.add_argument('--mode',
                         help='Choose whether export to spectra in raw or centroid formats. Defaults to centroid.',
                         default='centroid',
@@ -56,12 +116,87 @@ def get_args():
                         default=64,
                         type=int,
                         choices=[64, 32])
+    parser.add_argument('--mz_encoding',
+                        help='Encoding for the m/z array: 32-bit (32) or 64-bit (64). Defaults to --encoding.',
+                        default=None,
+                        type=int,
+                        choices=[64, 32])
+    parser.add_argument('--intensity_encoding',
+                        help='Encoding for the intensity array: 32-bit (32) or 64-bit (64). Defaults to --encoding.',
+                        default=None,
+                        type=int,
+                        choices=[64, 32])
+    parser.add_argument('--mz_numpress',
+                        help='Compress the m/z array with MS-Numpress linear prediction compression (linear). '
+                             'Combined with ZLIB compression if --compression is zlib. Defaults to no MS-Numpress '
+                             'compression.',
+                        default=None,
+                        type=str,
+                        choices=['linear'])
+    parser.add_argument('--intensity_numpress',
+                        help='Compress the intensity array with MS-Numpress short logged float compression (slof) or '
+                             'positive integer compression (pic). Combined with ZLIB compression if --compression is '
+                             'zlib. Defaults to no MS-Numpress compression.',
+                        default=None,
+                        type=str,
+                        choices=['slof', 'pic'])
     parser.add_argument('--barebones_metadata',
                         help='Only use basic mzML metadata. Use if downstream data analysis tools throw errors with '
                              'descriptive CV terms.',
                         action='store_true')
+    parser.add_argument('--spots',
+                        help='Only convert the frames acquired from these MALDI spots (i.e. A1 B12).',
+                        default=None,
+                        type=str,
+                        nargs='+')
+    parser.add_argument('--frames',
+                        help='Only convert these frames. Frame IDs and ranges of frame IDs (i.e. 1 5 10-20) are '
+                             'accepted.',
+                        default=None,
+                        type=str,
+                        nargs='+')
+    parser.add_argument('--plate_map',
+                        help='Only convert the frames acquired from spots that are not empty in this MALDI plate map '
+                             '(*.csv).',
+                        default=None,
+                        type=str)
+    parser.add_argument('--checkpoint',
+                        help='Write stitched spectra to part files in a checkpoint directory ([output].checkpoint) '
+                             'before writing the output file. If the conversion is interrupted, running the same '
+                             'command again resumes after the last completed part.',
+                        action='store_true')
+    parser.add_argument('--checkpoint_interval',
+                        help='Number of frames per part file when --checkpoint is used. Defaults to 500.',
+                        default=500,
+                        type=int)
+    parser.add_argument('--processes',
+                        help='Number of worker processes used to read, trim, and stitch spectra in parallel. Spectra '
+                             'are still written in frame order by a single writer. Defaults to 1 (no parallel '
+                             'processing).',
+                        default=1,
+                        type=int)
+    parser.add_argument('--chunk_size',
+                        help='Number of frames processed by a worker process at a time when --processes is greater '
+                             'than 1. Defaults to 64.',
+                        default=64,
+                        type=int)
+    parser.add_argument('--prefetch_depth',
+                        help='Number of frames read ahead of stitching by a background reader thread for each input '
+                             'dataset, so that each dataset is read sequentially. Ignored if --processes is greater '
+                             'than 1. Defaults to 0 (no prefetching).',
+                        default=0,
+                        type=int)
 
     arguments = parser.parse_args()
+    if arguments.batch is None and (not arguments.input or not arguments.output):
+        parser.error('--input and --output are required unless --batch is used.')
+    for argument in ['processes', 'chunk_size', 'checkpoint_interval']:
+        if getattr(arguments, argument) < 1:
+            parser.error(f'--{argument} must be at least 1.')
+    try:
+        parse_frame_ids(arguments.frames or [])
+    except ValueError as e:
+        parser.error(str(e))
     return vars(arguments)
 
 
@@ -90,6 +225,8 @@ class PartialTsfData(TsfData):
 def trim_spectrum(spectrum, lower_mass_range, upper_mass_range):
     """
     Trim spectrum to include only features between the lower_mass_range (exclusive) and upper_mass_range (inclusive).
+    The m/z array is sorted, so the window bounds are found with a binary search and the trimmed arrays are views of the
+    original arrays rather than copies.
 
     :param spectrum: Spectrum to be trimmed.
     :type spectrum: pyTDFSDK.classes.TsfSpectrum
@@ -100,14 +237,58 @@ def trim_spectrum(spectrum, lower_mass_range, upper_mass_range):
     :return: Trimmed spectrum.
     :rtype: pyTDFSDK.classes.TsfSpectrum
     """
-    indices = np.where((spectrum.mz_array > lower_mass_range) & (spectrum.mz_array <= upper_mass_range))[0]
-    spectrum.mz_array = copy.deepcopy(spectrum.mz_array[indices])
-    spectrum.intensity_array = copy.deepcopy(spectrum.intensity_array[indices])
-    gc.collect()
+    start = np.searchsorted(spectrum.mz_array, lower_mass_range, side='right')
+    end = np.searchsorted(spectrum.mz_array, upper_mass_range, side='right')
+    spectrum.mz_array = spectrum.mz_array[start:end]
+    spectrum.intensity_array = spectrum.intensity_array[start:end]
     return spectrum
 
 
-def i_activate_the_magic_card_polymerization(sorted_dlist_lower, frame, mode, encoding):
+class FusionBuffer(object):
+    """
+    Output arrays for stitched spectra that are reused across frames. The arrays are only reallocated when a stitched
+    spectrum does not fit or has a different dtype, so the number of allocations per frame is near-constant. Stitched
+    arrays returned by stitch() are views of the buffer and are only valid until the next call to stitch().
+
+    :ivar allocations: Number of times the output arrays have been allocated.
+    """
+    def __init__(self):
+        """
+        Constructor Method
+        """
+        self.mz_array = np.empty(0)
+        self.intensity_array = np.empty(0)
+        self.allocations = 0
+
+    def stitch(self, mz_arrays, intensity_arrays):
+        """
+        Concatenate m/z and intensity arrays into the buffer.
+
+        :param mz_arrays: m/z arrays to concatenate.
+        :type mz_arrays: list[numpy.array]
+        :param intensity_arrays: Intensity arrays to concatenate.
+        :type intensity_arrays: list[numpy.array]
+        :return: Tuple of the stitched m/z array and stitched intensity array.
+        :rtype: tuple[numpy.array]
+        """
+        size = sum(array.size for array in mz_arrays)
+        mz_dtype = np.result_type(*mz_arrays)
+        intensity_dtype = np.result_type(*intensity_arrays)
+        if size > self.mz_array.size or mz_dtype != self.mz_array.dtype or \
+                intensity_dtype != self.intensity_array.dtype:
+            # leave headroom so that slightly larger spectra in later frames do not cause another allocation
+            capacity = max(size, int(self.mz_array.size * 1.5))
+            self.mz_array = np.empty(capacity, dtype=mz_dtype)
+            self.intensity_array = np.empty(capacity, dtype=intensity_dtype)
+            self.allocations += 1
+        fusion_mz_array = self.mz_array[:size]
+        fusion_intensity_array = self.intensity_array[:size]
+        np.concatenate(mz_arrays, out=fusion_mz_array)
+        np.concatenate(intensity_arrays, out=fusion_intensity_array)
+        return fusion_mz_array, fusion_intensity_array
+
+
+def i_activate_the_magic_card_polymerization(sorted_dlist_lower, frame, mode, encoding, buffer=None):
     """
     Combine the m/z and intensity arrays of multiple spectra.
 
@@ -119,18 +300,419 @@ def i_activate_the_magic_card_polymerization(sorted_dlist_lower, frame, mode, en
     :type mode: str
     :param encoding: Encoding bit mode, either "64" or "32"
     :type encoding: int
+    :param buffer: Buffer to stitch the spectra into. If None, new arrays are allocated.
+    :type buffer: FusionBuffer | None
     :return: Tuple of the new m/z array and new intensity array
     :rtype: tuple[numpy.array]
     """
-    spectra = [(TsfSpectrum(data, frame=frame, mode=mode, profile_bins=0, encoding=encoding), data)
+    spectra = [trim_spectrum(TsfSpectrum(data, frame=frame, mode=mode, profile_bins=0, encoding=encoding),
+                             data.MzAcqRangeLower,
+                             data.MzAcqRangeUpper)
                for data in sorted_dlist_lower]
-    spectra = [(trim_spectrum(spectrum, data.MzAcqRangeLower, data.MzAcqRangeUpper), data)
-               for spectrum, data in spectra]
-    mz_arrays = [copy.deepcopy(spectrum.mz_array) for spectrum, data in spectra]
-    intensity_arrays = [copy.deepcopy(spectrum.intensity_array) for spectrum, data in spectra]
-    fusion_mz_array = np.concatenate(mz_arrays)
-    fusion_intensity_array = np.concatenate(intensity_arrays)
-    return fusion_mz_array, fusion_intensity_array
+    mz_arrays = [spectrum.mz_array for spectrum in spectra]
+    intensity_arrays = [spectrum.intensity_array for spectrum in spectra]
+    if buffer is None:
+        return np.concatenate(mz_arrays), np.concatenate(intensity_arrays)
+    return buffer.stitch(mz_arrays, intensity_arrays)
+
+
+def init_fusion_worker(sorted_filenames):
+    """
+    Initialize a worker process for parallel stitching. Each worker process initializes its own TDF-SDK library and
+    opens its own copy of each dataset.
+
+    :param sorted_filenames: Paths to the Bruker .d directories sorted by MzAcqRangeLower from lowest to highest.
+    :type sorted_filenames: list[str]
+    """
+    global WORKER_SORTED_DLIST_LOWER
+    dll = init_tdf_sdk_api()
+    WORKER_SORTED_DLIST_LOWER = [PartialTsfData(dfile, dll) for dfile in sorted_filenames]
+
+
+def stitch_frame_chunk(frames, mode, encoding):
+    """
+    Get, trim, and stitch the spectra for a chunk of frames in a worker process.
+
+    :param frames: IDs of the frames in the chunk.
+    :type frames: list[int]
+    :param mode: Data array mode, either "profile", "centroid", or "raw".
+    :type mode: str
+    :param encoding: Encoding bit mode, either "64" or "32"
+    :type encoding: int
+    :return: List of tuples of the frame ID, stitched m/z array, and stitched intensity array.
+    :rtype: list[tuple]
+    """
+    return [(frame,) + i_activate_the_magic_card_polymerization(WORKER_SORTED_DLIST_LOWER, frame, mode, encoding)
+            for frame in frames]
+
+
+def iter_fusion_spectra(sorted_dlist_lower, frames, mode, encoding, buffer=None):
+    """
+    Get, trim, and stitch the spectra for each frame in order. Spectra are stitched into a single buffer that is reused
+    across frames, so each stitched spectrum must be written before the next one is requested.
+
+    :param sorted_dlist_lower: List of PartialTsfData objects sorted by MzAcqRangeLower from lowest to highest.
+    :type sorted_dlist_lower: list[PartialTsfData]
+    :param frames: IDs of the frames to stitch.
+    :type frames: list[int]
+    :param mode: Data array mode, either "profile", "centroid", or "raw".
+    :type mode: str
+    :param encoding: Encoding bit mode, either "64" or "32"
+    :type encoding: int
+    :param buffer: Buffer to stitch the spectra into. If None, a new buffer is created.
+    :type buffer: FusionBuffer | None
+    :return: Generator of tuples of the frame ID, stitched m/z array, and stitched intensity array.
+    """
+    if buffer is None:
+        buffer = FusionBuffer()
+    for frame in frames:
+        yield (frame,) + i_activate_the_magic_card_polymerization(sorted_dlist_lower, frame, mode, encoding, buffer)
+
+
+def iter_fusion_spectra_parallel(sorted_filenames, frames, mode, encoding, processes, chunk_size):
+    """
+    Get, trim, and stitch the spectra for each frame using multiple worker processes. Frames are split into chunks
+    that are processed in parallel, and stitched spectra are yielded in frame order. Completed chunks wait in a reorder
+    buffer until all previous chunks have been yielded. The buffer is bounded to CHUNKS_PER_PROCESS chunks per worker
+    process so that memory use does not grow with the number of frames when writing is slower than stitching.
+
+    :param sorted_filenames: Paths to the Bruker .d directories sorted by MzAcqRangeLower from lowest to highest.
+    :type sorted_filenames: list[str]
+    :param frames: IDs of the frames to stitch.
+    :type frames: list[int]
+    :param mode: Data array mode, either "profile", "centroid", or "raw".
+    :type mode: str
+    :param encoding: Encoding bit mode, either "64" or "32"
+    :type encoding: int
+    :param processes: Number of worker processes.
+    :type processes: int
+    :param chunk_size: Number of frames per chunk.
+    :type chunk_size: int
+    :return: Generator of tuples of the frame ID, stitched m/z array, and stitched intensity array.
+    """
+    chunks = [frames[i:i + chunk_size] for i in range(0, len(frames), chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes,
+                             initializer=init_fusion_worker,
+                             initargs=(sorted_filenames,)) as executor:
+        pending = collections.deque()
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < processes * CHUNKS_PER_PROCESS:
+                pending.append(executor.submit(stitch_frame_chunk, chunks[next_chunk], mode, encoding))
+                next_chunk += 1
+            # futures are consumed in submission order, so chunks are always yielded in frame order
+            for result in pending.popleft().result():
+                yield result
+
+
+def read_frames(data, frames, mode, encoding, frame_queue, stop):
+    """
+    Read and trim the spectra of a single dataset in frame order in a background reader thread. Trimmed spectra are put
+    in a bounded queue, which blocks the thread once it is full. If reading fails, the exception is put in the queue
+    instead so that it is raised by the stitcher.
+
+    :param data: PartialTsfData object to read spectra from.
+    :type data: PartialTsfData
+    :param frames: IDs of the frames to read.
+    :type frames: list[int]
+    :param mode: Data array mode, either "profile", "centroid", or "raw".
+    :type mode: str
+    :param encoding: Encoding bit mode, either "64" or "32"
+    :type encoding: int
+    :param frame_queue: Bounded queue to put tuples of the frame ID, trimmed m/z array, and trimmed intensity array in.
+    :type frame_queue: queue.Queue
+    :param stop: Event set by the stitcher to stop reading early.
+    :type stop: threading.Event
+    """
+    def put(item):
+        while not stop.is_set():
+            try:
+                frame_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for frame in frames:
+            spectrum = trim_spectrum(TsfSpectrum(data, frame=frame, mode=mode, profile_bins=0, encoding=encoding),
+                                     data.MzAcqRangeLower,
+                                     data.MzAcqRangeUpper)
+            if not put((frame, spectrum.mz_array, spectrum.intensity_array)):
+                return
+    except Exception as exception:
+        put(exception)
+
+
+def iter_fusion_spectra_prefetch(sorted_dlist_lower, frames, mode, encoding, prefetch_depth, stats=None,
+                                 buffer=None):
+    """
+    Get, trim, and stitch the spectra for each frame in order using one background reader thread per dataset. Each
+    reader thread reads its dataset sequentially up to prefetch_depth frames ahead, and matching frames from each
+    dataset are stitched into a single buffer that is reused across frames, so each stitched spectrum must be written
+    before the next one is requested.
+
+    :param sorted_dlist_lower: List of PartialTsfData objects sorted by MzAcqRangeLower from lowest to highest.
+    :type sorted_dlist_lower: list[PartialTsfData]
+    :param frames: IDs of the frames to stitch.
+    :type frames: list[int]
+    :param mode: Data array mode, either "profile", "centroid", or "raw".
+    :type mode: str
+    :param encoding: Encoding bit mode, either "64" or "32"
+    :type encoding: int
+    :param prefetch_depth: Maximum number of frames each reader thread reads ahead.
+    :type prefetch_depth: int
+    :param stats: Dictionary that the time spent waiting for reader threads ("read_wait") and the total time
+        ("elapsed") in seconds are written to.
+    :type stats: dict | None
+    :param buffer: Buffer to stitch the spectra into. If None, a new buffer is created.
+    :type buffer: FusionBuffer | None
+    :return: Generator of tuples of the frame ID, stitched m/z array, and stitched intensity array.
+    """
+    if buffer is None:
+        buffer = FusionBuffer()
+    if stats is None:
+        stats = {}
+    stats['read_wait'] = 0.0
+    stop = threading.Event()
+    frame_queues = [queue.Queue(maxsize=prefetch_depth) for data in sorted_dlist_lower]
+    readers = [threading.Thread(target=read_frames,
+                                args=(data, frames, mode, encoding, frame_queue, stop),
+                                daemon=True)
+               for data, frame_queue in zip(sorted_dlist_lower, frame_queues)]
+    start = time.perf_counter()
+    for reader in readers:
+        reader.start()
+    try:
+        for frame in frames:
+            mz_arrays = []
+            intensity_arrays = []
+            for frame_queue in frame_queues:
+                wait_start = time.perf_counter()
+                item = frame_queue.get()
+                stats['read_wait'] += time.perf_counter() - wait_start
+                if isinstance(item, Exception):
+                    raise item
+                mz_arrays.append(item[1])
+                intensity_arrays.append(item[2])
+            yield (frame,) + buffer.stitch(mz_arrays, intensity_arrays)
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+        stats['elapsed'] = time.perf_counter() - start
+
+
+def get_prefetch_report(stats):
+    """
+    Summarize whether a prefetching run was I/O-bound or CPU-bound. A run is I/O-bound if stitching and writing spent
+    more than IO_BOUND_WAIT_FRACTION of the run waiting for reader threads.
+
+    :param stats: Dictionary from iter_fusion_spectra_prefetch() containing "read_wait" and "elapsed".
+    :type stats: dict
+    :return: Report message.
+    :rtype: str
+    """
+    wait_fraction = stats['read_wait'] / stats['elapsed'] if stats['elapsed'] else 0.0
+    bound = 'I/O-bound' if wait_fraction > IO_BOUND_WAIT_FRACTION else 'CPU-bound'
+    return (f'Waited {stats["read_wait"]:.1f} s of {stats["elapsed"]:.1f} s ({wait_fraction:.0%}) for reader threads. '
+            f'Conversion was {bound}.')
+
+
+def get_buffer_report(buffer, spectra):
+    """
+    Summarize how often the stitching buffer was allocated during a run.
+
+    :param buffer: Buffer that the spectra were stitched into.
+    :type buffer: FusionBuffer
+    :param spectra: Number of spectra stitched into the buffer.
+    :type spectra: int
+    :return: Report message.
+    :rtype: str
+    """
+    return f'Stitched {spectra} spectra with {buffer.allocations} buffer allocations.'
+
+
+def parse_frame_ids(frame_args):
+    """
+    Parse frame IDs and ranges of frame IDs from the --frames command line parameter.
+
+    :param frame_args: Frame IDs (i.e. "5") and inclusive ranges of frame IDs (i.e. "10-20").
+    :type frame_args: list[str]
+    :return: Frame IDs.
+    :rtype: list[int]
+    :raises ValueError: If a value is not a frame ID or range of frame IDs, a frame ID is less than 1, or a range ends
+        before it starts.
+    """
+    frames = []
+    for frame_arg in frame_args:
+        match = FRAME_ID_PATTERN.match(frame_arg.strip())
+        if match is None:
+            raise ValueError(f'Invalid --frames value "{frame_arg}". Frame IDs must be positive integers (i.e. 5) or '
+                             f'ranges of frame IDs (i.e. 10-20).')
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) is not None else start
+        if start < 1:
+            raise ValueError(f'Invalid --frames value "{frame_arg}". Frame IDs start at 1.')
+        if end < start:
+            raise ValueError(f'Invalid --frames value "{frame_arg}". The end of a frame ID range must not be less '
+                             f'than its start.')
+        frames.extend(range(start, end + 1))
+    return frames
+
+
+def get_plate_map_spots(plate_map_filename):
+    """
+    Get the spots that are not empty in a MALDI plate map (*.csv). Plate maps use the same format as fleX MS1
+    AutoXecute Generator, with row names in the first column and one column per plate column.
+
+    :param plate_map_filename: Path to *.csv file containing plate map information.
+    :type plate_map_filename: str
+    :return: List of MALDI plate coordinates.
+    :rtype: list[str]
+    """
+    plate_map = pd.read_csv(plate_map_filename, index_col=0, dtype=str)
+    plate_map.columns = range(1, plate_map.shape[1] + 1)
+    plate_map = plate_map.stack().dropna()
+    return list(plate_map.index.get_level_values(0).astype(str) + plate_map.index.get_level_values(1).astype(str))
+
+
+def get_selected_frames(data, spots=None, frames=None):
+    """
+    Get the frames to convert. Spots are resolved to frames through the MaldiFrameInfo table. If neither spots nor
+    frames are given, all frames are selected.
+
+    :param data: PartialTsfData object containing the Frames and MaldiFrameInfo tables.
+    :type data: PartialTsfData
+    :param spots: MALDI spots to convert.
+    :type spots: list[str] | None
+    :param frames: Frame IDs to convert.
+    :type frames: list[int] | None
+    :return: Tuple of the sorted selected frame IDs, the spots not found in MaldiFrameInfo, and the frame IDs not found
+        in Frames.
+    :rtype: tuple[list]
+    """
+    all_frames = list(range(1, data.analysis['Frames'].shape[0] + 1))
+    if not spots and not frames:
+        return all_frames, [], []
+    selected = set()
+    missing_spots = []
+    missing_frames = []
+    if spots:
+        maldiframeinfo = data.analysis['MaldiFrameInfo']
+        spot_names = maldiframeinfo['SpotName'].astype(str).str.strip().str.upper()
+        for spot in dict.fromkeys(spots):
+            spot_frames = maldiframeinfo['Frame'][spot_names == spot.strip().upper()].astype(int).tolist()
+            if spot_frames:
+                selected.update(spot_frames)
+            else:
+                missing_spots.append(spot)
+    if frames:
+        for frame in dict.fromkeys(frames):
+            if 1 <= frame <= len(all_frames):
+                selected.add(frame)
+            else:
+                missing_frames.append(frame)
+    return sorted(selected), missing_spots, missing_frames
+
+
+def get_maldi_spot_identifiers(data):
+    """
+    Get the MALDI spot identifier of each frame once per run. Spot names are taken directly from the MaldiFrameInfo
+    table for dried droplet (SingleSpectra) datasets. For other datasets, pyTDFSDK.util.get_maldi_coords() is called
+    once per MaldiFrameInfo record.
+
+    :param data: PartialTsfData object containing the MaldiFrameInfo table.
+    :type data: PartialTsfData
+    :return: Dictionary containing frame IDs as keys and MALDI spot identifiers as values.
+    :rtype: dict
+    """
+    maldiframeinfo = data.analysis['MaldiFrameInfo']
+    frames = maldiframeinfo['Frame'].astype(int).tolist()
+    if data.analysis['GlobalMetadata'].get('MaldiApplicationType') == 'SingleSpectra':
+        spot_identifiers = maldiframeinfo['SpotName'].astype(str).tolist()
+    else:
+        spot_identifiers = [get_maldi_coords(data, maldiframeinfo_dict)
+                            for maldiframeinfo_dict in maldiframeinfo.to_dict(orient='records')]
+    return dict(zip(frames, spot_identifiers))
+
+
+def get_polarity(data):
+    """
+    Get the polarity of a dataset from the Frames table.
+
+    :param data: PartialTsfData object containing the Frames table.
+    :type data: PartialTsfData
+    :return: Polarity of the dataset.
+    :rtype: str
+    """
+    return list(set(data.analysis['Frames']['Polarity'].values.tolist()))[0]
+
+
+def get_binary_array_params(output_format, compression, encoding, mz_encoding=None, intensity_encoding=None,
+                            mz_numpress=None, intensity_numpress=None):
+    """
+    Get the encoding and compression of the m/z and intensity arrays. MS-Numpress compression is followed by ZLIB
+    compression if compression is "zlib", and arrays compressed with MS-Numpress are always 64-bit. For mzMLb, ZLIB
+    compression is applied to the HDF5 datasets by get_writer() instead of to each array.
+
+    :param output_format: Output format, either "mzml" or "mzmlb".
+    :type output_format: str
+    :param compression: Compression mode, either "zlib" or "none".
+    :type compression: str
+    :param encoding: Encoding bit mode, either "64" or "32"
+    :type encoding: int
+    :param mz_encoding: Encoding bit mode of the m/z array. Defaults to encoding.
+    :type mz_encoding: int | None
+    :param intensity_encoding: Encoding bit mode of the intensity array. Defaults to encoding.
+    :type intensity_encoding: int | None
+    :param mz_numpress: MS-Numpress compression mode of the m/z array, either "linear" or None.
+    :type mz_numpress: str | None
+    :param intensity_numpress: MS-Numpress compression mode of the intensity array, either "slof", "pic", or None.
+    :type intensity_numpress: str | None
+    :return: Tuple of dictionaries containing array names as keys and numpy dtypes and psims compression names as
+        values.
+    :rtype: tuple[dict]
+    """
+    zlib = compression == 'zlib' and output_format != 'mzmlb'
+    encoding_dict = {}
+    compression_dict = {}
+    for array, array_encoding, numpress in [('m/z array', mz_encoding, mz_numpress),
+                                            ('intensity array', intensity_encoding, intensity_numpress)]:
+        if numpress is not None:
+            encoding_dict[array] = get_encoding_dtype(64)
+            compression_dict[array] = NUMPRESS_COMPRESSION[numpress] + (' followed by zlib compression' if zlib
+                                                                        else '')
+        else:
+            encoding_dict[array] = get_encoding_dtype(array_encoding if array_encoding is not None else encoding)
+            compression_dict[array] = 'zlib' if zlib else 'none'
+    return encoding_dict, compression_dict
+
+
+def get_writer(output, output_format, compression):
+    """
+    Get a psims writer for the output format. For mzMLb, binary arrays are written to chunked HDF5 datasets that are
+    gzip compressed by HDF5 if compression is "zlib".
+
+    :param output: Path to output mzML or mzMLb file.
+    :type output: str
+    :param output_format: Output format, either "mzml" or "mzmlb".
+    :type output_format: str
+    :param compression: Compression mode, either "zlib" or "none".
+    :type compression: str
+    :return: Writer for the output file.
+    :rtype: psims.mzml.MzMLWriter
+    """
+    if output_format == 'mzmlb':
+        # h5py is only required for mzMLb output
+        from psims.mzmlb import MzMLbWriter
+        writer = MzMLbWriter(output,
+                             close=True,
+                             h5_compression='gzip' if compression == 'zlib' else None,
+                             h5_compression_opts=MZMLB_COMPRESSION_LEVEL if compression == 'zlib' else None,
+                             h5_blocksize=MZMLB_BLOCK_SIZE)
+        return writer
+    return MzMLWriter(output, close=True)
 
 
 def write_fusion_mzml_metadata(writer, dlist, filenames, mode, barebones_metadata):
@@ -239,10 +821,193 @@ def write_fusion_mzml_metadata(writer, dlist, filenames, mode, barebones_metadat
     writer.instrument_configuration_list([inst_config])
 
 
-def write_fusion_mzml(dlist, sorted_dlist_lower, filenames, output, mode, compression, encoding, barebones_metadata):
+def get_checkpoint_settings(sorted_filenames, frames, mode, encoding, checkpoint_interval):
+    """
+    Get the settings that part files in a checkpoint directory depend on. A checkpoint can only be resumed with the
+    same settings.
+
+    :param sorted_filenames: Paths to the Bruker .d directories sorted by MzAcqRangeLower from lowest to highest.
+    :type sorted_filenames: list[str]
+    :param frames: IDs of the frames to convert.
+    :type frames: list[int]
+    :param mode: Data array mode, either "profile", "centroid", or "raw".
+    :type mode: str
+    :param encoding: Encoding bit mode, either "64" or "32"
+    :type encoding: int
+    :param checkpoint_interval: Number of frames per part file.
+    :type checkpoint_interval: int
+    :return: Dictionary containing the checkpoint settings.
+    :rtype: dict
+    """
+    return {'inputs': [os.path.abspath(filename) for filename in sorted_filenames],
+            'frames': hashlib.sha256(json.dumps(frames).encode()).hexdigest(),
+            'mode': mode,
+            'encoding': encoding,
+            'checkpoint_interval': checkpoint_interval}
+
+
+def write_checkpoint_journal(checkpoint_dir, settings, parts):
+    """
+    Write the progress journal of a checkpoint directory, replacing any existing journal.
+
+    :param checkpoint_dir: Path to the checkpoint directory.
+    :type checkpoint_dir: str
+    :param settings: Checkpoint settings from get_checkpoint_settings().
+    :type settings: dict
+    :param parts: Journal entries of the completed part files.
+    :type parts: list[dict]
+    """
+    journal_path = os.path.join(checkpoint_dir, CHECKPOINT_JOURNAL)
+    with open(journal_path + '.tmp', 'w') as journal_file:
+        for entry in [{'settings': settings}] + parts:
+            journal_file.write(json.dumps(entry) + '\n')
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+    os.replace(journal_path + '.tmp', journal_path)
+
+
+def read_checkpoint_journal(checkpoint_dir, settings):
+    """
+    Get the completed part files from the progress journal of a checkpoint directory. A new checkpoint directory is
+    created if it does not exist. Entries after the first incomplete entry or missing part file are discarded.
+
+    :param checkpoint_dir: Path to the checkpoint directory.
+    :type checkpoint_dir: str
+    :param settings: Checkpoint settings from get_checkpoint_settings().
+    :type settings: dict
+    :return: Journal entries of the completed part files in order.
+    :rtype: list[dict]
+    """
+    journal_path = os.path.join(checkpoint_dir, CHECKPOINT_JOURNAL)
+    parts = []
+    if os.path.isfile(journal_path):
+        with open(journal_path) as journal_file:
+            lines = journal_file.read().splitlines()
+        try:
+            journal_settings = json.loads(lines[0])['settings']
+        except (IndexError, KeyError, json.JSONDecodeError):
+            journal_settings = None
+        if journal_settings != settings:
+            raise ValueError(f'{checkpoint_dir} was created with different input files or settings. Delete it to '
+                             f'start the conversion over.')
+        for line in lines[1:]:
+            try:
+                part = json.loads(line)
+            except json.JSONDecodeError:
+                # entry interrupted while being written
+                break
+            if part['part'] != len(parts) or not os.path.isfile(os.path.join(checkpoint_dir, part['file'])):
+                break
+            parts.append(part)
+    else:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    write_checkpoint_journal(checkpoint_dir, settings, parts)
+    return parts
+
+
+def write_checkpoint_part(checkpoint_dir, part, frames, mz_arrays, intensity_arrays):
+    """
+    Write stitched spectra to a part file and add it to the progress journal. The part file is written to a temporary
+    file first so that a part file in the journal is always complete.
+
+    :param checkpoint_dir: Path to the checkpoint directory.
+    :type checkpoint_dir: str
+    :param part: Index of the part file.
+    :type part: int
+    :param frames: Frame IDs of the spectra.
+    :type frames: list[int]
+    :param mz_arrays: Stitched m/z arrays.
+    :type mz_arrays: list[numpy.array]
+    :param intensity_arrays: Stitched intensity arrays.
+    :type intensity_arrays: list[numpy.array]
+    :return: Journal entry of the part file.
+    :rtype: dict
+    """
+    filename = f'part_{part:06d}.npz'
+    path = os.path.join(checkpoint_dir, filename)
+    with open(path + '.tmp', 'wb') as part_file:
+        np.savez(part_file,
+                 frames=np.array(frames),
+                 lengths=np.array([array.size for array in mz_arrays]),
+                 mz_array=np.concatenate(mz_arrays),
+                 intensity_array=np.concatenate(intensity_arrays))
+        part_file.flush()
+        os.fsync(part_file.fileno())
+    os.replace(path + '.tmp', path)
+    entry = {'part': part, 'file': filename, 'first_frame': frames[0], 'last_frame': frames[-1], 'spectra': len(frames)}
+    with open(os.path.join(checkpoint_dir, CHECKPOINT_JOURNAL), 'a') as journal_file:
+        journal_file.write(json.dumps(entry) + '\n')
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+    return entry
+
+
+def write_checkpoint_parts(checkpoint_dir, fusion_spectra, first_part, checkpoint_interval):
+    """
+    Write stitched spectra to part files of checkpoint_interval spectra each.
+
+    :param checkpoint_dir: Path to the checkpoint directory.
+    :type checkpoint_dir: str
+    :param fusion_spectra: Iterable of tuples of the frame ID, stitched m/z array, and stitched intensity array.
+    :param first_part: Index of the first part file to write.
+    :type first_part: int
+    :param checkpoint_interval: Number of spectra per part file.
+    :type checkpoint_interval: int
+    :return: Journal entries of the part files written.
+    :rtype: list[dict]
+    """
+    parts = []
+    frames = []
+    mz_arrays = []
+    intensity_arrays = []
+    for frame, fusion_mz_array, fusion_intensity_array in fusion_spectra:
+        # stitched arrays may be views of a buffer that is reused for the next frame
+        frames.append(frame)
+        mz_arrays.append(fusion_mz_array.copy())
+        intensity_arrays.append(fusion_intensity_array.copy())
+        if len(frames) == checkpoint_interval:
+            parts.append(write_checkpoint_part(checkpoint_dir, first_part + len(parts), frames, mz_arrays,
+                                               intensity_arrays))
+            frames = []
+            mz_arrays = []
+            intensity_arrays = []
+    if frames:
+        parts.append(write_checkpoint_part(checkpoint_dir, first_part + len(parts), frames, mz_arrays,
+                                           intensity_arrays))
+    return parts
+
+
+def iter_checkpoint_spectra(checkpoint_dir, parts):
+    """
+    Read stitched spectra from the part files of a checkpoint directory in frame order.
+
+    :param checkpoint_dir: Path to the checkpoint directory.
+    :type checkpoint_dir: str
+    :param parts: Journal entries of the part files.
+    :type parts: list[dict]
+    :return: Generator of tuples of the frame ID, stitched m/z array, and stitched intensity array.
+    """
+    for part in parts:
+        with np.load(os.path.join(checkpoint_dir, part['file'])) as part_data:
+            offsets = np.concatenate([[0], np.cumsum(part_data['lengths'])])
+            mz_array = part_data['mz_array']
+            intensity_array = part_data['intensity_array']
+            for i, frame in enumerate(part_data['frames'].tolist()):
+                yield frame, mz_array[offsets[i]:offsets[i + 1]], intensity_array[offsets[i]:offsets[i + 1]]
+
+
+def write_fusion_mzml(dlist, sorted_dlist_lower, filenames, output, mode, compression, encoding, barebones_metadata,
+                      processes=1, chunk_size=64, prefetch_depth=0, output_format='mzml', mz_encoding=None,
+                      intensity_encoding=None, mz_numpress=None, intensity_numpress=None, frames=None,
+                      checkpoint_dir=None, checkpoint_interval=500):
     """
     Combine and write multiple spectra with staggered non-overlapping mass range windows to a single spectrum in an
-    mzML file.
+    mzML or mzMLb file. If more than one process is used, spectra are read, trimmed, and stitched by worker processes and
+    written in frame order by this process. Otherwise, if prefetch_depth is greater than 0, each dataset is read ahead
+    by a background reader thread, and whether the run was I/O-bound or CPU-bound is printed. If a checkpoint directory
+    is given, stitched spectra are first written to part files in the checkpoint directory, resuming after the last
+    completed part file, and the output file is then assembled from the part files and the checkpoint directory is
+    removed. If spectra are stitched in this process, the number of stitching buffer allocations is printed.
 
     :param dlist: List of PartialTsfData objects.
     :type dlist: list[PartialTsfData]
@@ -250,7 +1015,7 @@ def write_fusion_mzml(dlist, sorted_dlist_lower, filenames, output, mode, compre
     :type sorted_dlist_lower: list[PartialTsfData]
     :param filenames: Names of the files being combined in this workflow.
     :type filenames: list[str]
-    :param output: Path to output mzML file.
+    :param output: Path to output mzML or mzMLb file.
     :type output: str
     :param mode: Data array mode, either "profile", "centroid", or "raw".
     :type mode: str
@@ -262,9 +1027,63 @@ def write_fusion_mzml(dlist, sorted_dlist_lower, filenames, output, mode, compre
         for compatibility with downstream analysis software that does not have support for newer CV params or
         UserParams.
     :type barebones_metadata: bool
+    :param processes: Number of worker processes used to read, trim, and stitch spectra.
+    :type processes: int
+    :param chunk_size: Number of frames processed by a worker process at a time.
+    :type chunk_size: int
+    :param prefetch_depth: Number of frames each background reader thread reads ahead.
+    :type prefetch_depth: int
+    :param output_format: Output format, either "mzml" or "mzmlb".
+    :type output_format: str
+    :param mz_encoding: Encoding bit mode of the m/z array. Defaults to encoding.
+    :type mz_encoding: int | None
+    :param intensity_encoding: Encoding bit mode of the intensity array. Defaults to encoding.
+    :type intensity_encoding: int | None
+    :param mz_numpress: MS-Numpress compression mode of the m/z array, either "linear" or None.
+    :type mz_numpress: str | None
+    :param intensity_numpress: MS-Numpress compression mode of the intensity array, either "slof", "pic", or None.
+    :type intensity_numpress: str | None
+    :param frames: IDs of the frames to convert. Defaults to all frames.
+    :type frames: list[int] | None
+    :param checkpoint_dir: Path to the checkpoint directory. If None, spectra are written directly to the output file.
+    :type checkpoint_dir: str | None
+    :param checkpoint_interval: Number of frames per part file.
+    :type checkpoint_interval: int
     """
+    if frames is None:
+        frames = list(range(1, dlist[0].analysis['Frames'].shape[0] + 1))
+    # per run metadata so that the metadata lookup for each frame does not scan the MaldiFrameInfo and Frames tables
+    spot_identifiers = get_maldi_spot_identifiers(dlist[0])
+    polarity = get_polarity(dlist[0])
+    encoding_dict, compression_dict = get_binary_array_params(output_format, compression, encoding, mz_encoding,
+                                                              intensity_encoding, mz_numpress, intensity_numpress)
+    centroided = get_centroid_status(mode)[0]
+    sorted_filenames = [filenames[dlist.index(data)] for data in sorted_dlist_lower]
+    stitch_frames = frames
+    if checkpoint_dir is not None:
+        checkpoint_settings = get_checkpoint_settings(sorted_filenames, frames, mode, encoding, checkpoint_interval)
+        parts = read_checkpoint_journal(checkpoint_dir, checkpoint_settings)
+        stitch_frames = frames[sum(part['spectra'] for part in parts):]
+        if parts:
+            print(f'Resuming from {checkpoint_dir} after frame {parts[-1]["last_frame"]}.')
+    buffer = FusionBuffer()
+    if processes > 1:
+        fusion_spectra = iter_fusion_spectra_parallel(sorted_filenames, stitch_frames, mode, encoding, processes,
+                                                      chunk_size)
+    elif prefetch_depth > 0:
+        prefetch_stats = {}
+        fusion_spectra = iter_fusion_spectra_prefetch(sorted_dlist_lower, stitch_frames, mode, encoding,
+                                                      prefetch_depth, prefetch_stats, buffer)
+    else:
+        fusion_spectra = iter_fusion_spectra(sorted_dlist_lower, stitch_frames, mode, encoding, buffer)
+    if checkpoint_dir is not None:
+        parts += write_checkpoint_parts(checkpoint_dir, fusion_spectra, len(parts), checkpoint_interval)
+        if sum(part['spectra'] for part in parts) != len(frames):
+            raise ValueError(f'Part files in {checkpoint_dir} do not contain all {len(frames)} spectra. Delete it to '
+                             f'start the conversion over.')
+        fusion_spectra = iter_checkpoint_spectra(checkpoint_dir, parts)
     # initialize mzml writer
-    writer = MzMLWriter(output, close=True)
+    writer = get_writer(output, output_format, compression)
     with writer:
         # Write mzML metadata.
         write_fusion_mzml_metadata(writer, dlist, filenames, mode, barebones_metadata)
@@ -272,104 +1091,359 @@ def write_fusion_mzml(dlist, sorted_dlist_lower, filenames, output, mode, compre
         with writer.run(id='run',
                         instrument_configuration='instrument',
                         start_time=dlist[0].analysis['GlobalMetadata']['AcquisitionDateTime']):
-            scan_count = 0
-            with writer.spectrum_list(count=dlist[0].analysis['Frames'].shape[0]):
-                # code to parse datasets into TsfSpectrum and append numpy arrays
-                for frame in range(1, dlist[0].analysis['Frames'].shape[0] + 1):
-                    # get a maldiframeinfo dict
-                    maldiframeinfo_dict = \
-                        dlist[0].analysis['MaldiFrameInfo'][dlist[0].analysis['MaldiFrameInfo']['Frame'] ==
-                                                            frame].to_dict(orient='records')[0]
-                    # get, trim, and stitch spectra
-                    fusion_mz_array, fusion_intensity_array = i_activate_the_magic_card_polymerization(
-                        sorted_dlist_lower,
-                        frame,
-                        mode,
-                        encoding)
+            with writer.spectrum_list(count=len(frames)):
+                # get, trim, and stitch spectra
+                for frame, fusion_mz_array, fusion_intensity_array in fusion_spectra:
                     # Build params list for spectrum.
-                    scan_count += 1
-                    base_peak_index = np.where(fusion_intensity_array == np.max(fusion_intensity_array))
+                    base_peak_index = np.argmax(fusion_intensity_array)
                     params = ['MS1 spectrum',
                               {'ms level': 1},
-                              {'total ion current': sum(fusion_intensity_array)},
-                              {'base peak m/z': fusion_mz_array[base_peak_index][0].astype(float)},
+                              {'total ion current': float(np.sum(fusion_intensity_array))},
+                              {'base peak m/z': float(fusion_mz_array[base_peak_index])},
                               ({'name': 'base peak intensity',
                                 'unit_name': 'number of detector counts',
-                                'value': fusion_intensity_array[base_peak_index][0].astype(float)}),
-                              {'highest observed m/z': float(max(fusion_mz_array))},
-                              {'lowest observed m/z': float(max(fusion_mz_array))},
-                              {'maldi spot identifier': get_maldi_coords(dlist[0],
-                                                                         maldiframeinfo_dict)}]
-                    encoding_dict = {'m/z array': get_encoding_dtype(encoding),
-                                     'intensity array': get_encoding_dtype(encoding)}
+                                'value': float(fusion_intensity_array[base_peak_index])}),
+                              {'highest observed m/z': float(np.max(fusion_mz_array))},
+                              {'lowest observed m/z': float(np.min(fusion_mz_array))},
+                              {'maldi spot identifier': spot_identifiers[frame]}]
                     # Write MS1 spectrum
                     writer.write_spectrum(fusion_mz_array,
                                           fusion_intensity_array,
-                                          id='scan=' + str(scan_count),
-                                          polarity=list(set(dlist[0].analysis['Frames']['Polarity'].values.tolist()))[
-                                              0],
-                                          centroided=get_centroid_status(mode)[0],
+                                          id='scan=' + str(frame),
+                                          polarity=polarity,
+                                          centroided=centroided,
                                           scan_start_time=0,
                                           # other_arrays=None
                                           params=params,
                                           encoding=encoding_dict,
-                                          compression=compression)
+                                          compression=compression_dict)
+    if processes <= 1:
+        if prefetch_depth > 0:
+            print(get_prefetch_report(prefetch_stats))
+        print(get_buffer_report(buffer, len(stitch_frames)))
+    if checkpoint_dir is not None:
+        shutil.rmtree(checkpoint_dir)
 
 
-def run():
+def convert_window_set(filenames, output, args, headers=None):
     """
-    Combine and write multiple spectra with staggered non-overlapping mass range windows to a single spectrum in an
-    mzML file. Performs 3 checks to ensure mass ranges don't overlap:
+    Combine and write the spectra of a single window set to an mzML or mzMLb file. The mass ranges and frame counts
+    are checked with check_headers() before the datasets are loaded.
 
-    1. Make sure order of lists sorted by both lower and upper mass range are the same.
-    2. Make sure the mass ranges do not overlap.
-    3. Make sure the first lower mass range is the lowest value of all mass ranges and the last upper mass range is the
-        largest of all mass ranges.
+    :param filenames: Paths to the Bruker .d directories in the window set.
+    :type filenames: list[str]
+    :param output: Path to output mzML or mzMLb file.
+    :type output: str
+    :param args: Arguments from get_args().
+    :type args: dict
+    :param headers: Headers from read_header() of the datasets if they have already been read.
+    :type headers: list[dict] | None
+    :return: Number of spectra written.
+    :rtype: int
     """
-    # get args
-    args = get_args()
-    if not args['output'].endswith('.mzML'):
-        args['output'] = args['output'] + '.mzML'
-
+    # check mass ranges and frame counts before loading datasets
+    check_headers(filenames, headers)
     # read in datasets
     dll = init_tdf_sdk_api()
-    dlist = [PartialTsfData(dfile, dll) for dfile in args['input']]
-    # group dataset into a list (random order)
-    masses = [x.MzAcqRangeLower for x in dlist] + [x.MzAcqRangeUpper for x in dlist]
+    dlist = [PartialTsfData(dfile, dll) for dfile in filenames]
+    # select frames to convert
+    spots = (args['spots'] or []) + (get_plate_map_spots(args['plate_map']) if args['plate_map'] else [])
+    frames, missing_spots, missing_frames = get_selected_frames(dlist[0],
+                                                                spots,
+                                                                parse_frame_ids(args['frames'] or []))
+    if missing_spots or missing_frames:
+        raise ValueError('Spots or frames not found in input files: ' +
+                         ', '.join([str(i) for i in missing_spots + missing_frames]))
     sorted_dlist_lower = sorted(dlist, key=lambda x: x.MzAcqRangeLower)  # sort by low to high lower mass range
-    sorted_dlist_upper = sorted(dlist, key=lambda x: x.MzAcqRangeUpper)  # sort by low to high upper mass range
-
-    # logic check to make sure mass ranges don't overlap
-    # first check: make sure order of sorted lists are the same
-    if sorted_dlist_lower == sorted_dlist_upper:
-        # second check: make sure mass ranges don't overlap
-        for i in range(0, len(dlist) - 1):
-            if (not sorted_dlist_lower[i].MzAcqRangeUpper <= sorted_dlist_lower[i + 1].MzAcqRangeLower or
-                    not sorted_dlist_upper[i].MzAcqRangeUpper <= sorted_dlist_upper[i + 1].MzAcqRangeLower):
-                print('Overlapping mass range detected. Check input files.')
-                sys.exit(1)
-            else:
-                # third check: make sure the first lower mass range is the lowest value of all and the last upper mass
-                # range is the largest
-                if (not sorted_dlist_lower[0].MzAcqRangeLower == min(masses) or
-                        not sorted_dlist_upper[0].MzAcqRangeLower == min(masses) or
-                        not sorted_dlist_lower[-1].MzAcqRangeUpper == max(masses) or
-                        not sorted_dlist_upper[-1].MzAcqRangeUpper == max(masses)):
-                    print('Overlapping mass range detected. Check input files.')
-                    sys.exit(1)
-                else:
-                    # run the workflow
-                    write_fusion_mzml(dlist,
-                                      sorted_dlist_lower,
-                                      args['input'],
-                                      args['output'],
-                                      args['mode'],
-                                      args['compression'],
-                                      args['encoding'],
-                                      args['barebones_metadata'])
+    # run the workflow
+    write_fusion_mzml(dlist,
+                      sorted_dlist_lower,
+                      filenames,
+                      output,
+                      args['mode'],
+                      args['compression'],
+                      args['encoding'],
+                      args['barebones_metadata'],
+                      args['processes'],
+                      args['chunk_size'],
+                      args['prefetch_depth'],
+                      args['format'],
+                      args['mz_encoding'],
+                      args['intensity_encoding'],
+                      args['mz_numpress'],
+                      args['intensity_numpress'],
+                      frames,
+                      output + CHECKPOINT_EXTENSION if args['checkpoint'] else None,
+                      args['checkpoint_interval'])
+    return len(frames)
 
-    else:
-        print('Overlapping mass range detected. Check input files.')
+
+def read_header(bruker_d_folder_name):
+    """
+    Read the acquisition mass range from the GlobalMetadata table of analysis.tsf and the number of frames without
+    loading the rest of the dataset.
+
+    :param bruker_d_folder_name: Path to a Bruker .d directory containing analysis.tsf.
+    :type bruker_d_folder_name: str
+    :return: Dictionary containing the path, MzAcqRangeLower, MzAcqRangeUpper, and number of frames.
+    :rtype: dict
+    :raises ValueError: If analysis.tsf is missing, cannot be read, or does not contain the acquisition mass range.
+    """
+    tsf_file = os.path.join(bruker_d_folder_name, 'analysis.tsf')
+    if not os.path.isfile(tsf_file):
+        raise ValueError(f'{tsf_file} not found. Check input files.')
+    try:
+        connection = sqlite3.connect(pathlib.Path(tsf_file).absolute().as_uri() + '?mode=ro', uri=True)
+        try:
+            metadata = dict(connection.execute('SELECT Key, Value FROM GlobalMetadata WHERE Key IN (?, ?)',
+                                               ('MzAcqRangeLower', 'MzAcqRangeUpper')).fetchall())
+            frame_count = connection.execute('SELECT COUNT(*) FROM Frames').fetchone()[0]
+        finally:
+            connection.close()
+        return {'path': bruker_d_folder_name,
+                'MzAcqRangeLower': float(metadata['MzAcqRangeLower']),
+                'MzAcqRangeUpper': float(metadata['MzAcqRangeUpper']),
+                'frames': frame_count}
+    except sqlite3.DatabaseError as exception:
+        raise ValueError(f'{tsf_file} could not be read: {exception}. Check input files.')
+    except KeyError as exception:
+        raise ValueError(f'{exception.args[0]} not found in the GlobalMetadata table of {tsf_file}. Check input '
+                         f'files.')
+    except (TypeError, ValueError) as exception:
+        raise ValueError(f'Invalid acquisition mass range in {tsf_file}: {exception}. Check input files.')
+
+
+def check_headers(filenames, headers=None):
+    """
+    Check that the datasets can be combined before loading them. The datasets are sorted by MzAcqRangeLower, and in a
+    single pass each mass range must start after the previous mass range ends and each dataset must have the same
+    number of frames.
+
+    :param filenames: Paths to the Bruker .d directories.
+    :type filenames: list[str]
+    :param headers: Headers from read_header() of the datasets. If None, the headers are read from the datasets.
+    :type headers: list[dict] | None
+    :return: Headers from read_header() sorted by MzAcqRangeLower from lowest to highest.
+    :rtype: list[dict]
+    """
+    if headers is None:
+        headers = [read_header(filename) for filename in filenames]
+    headers = sorted(headers, key=lambda x: x['MzAcqRangeLower'])
+    previous = None
+    for header in headers:
+        if header['MzAcqRangeLower'] >= header['MzAcqRangeUpper'] or \
+                (previous is not None and previous['MzAcqRangeUpper'] > header['MzAcqRangeLower']):
+            raise ValueError('Overlapping mass range detected. Check input files.')
+        if header['frames'] != headers[0]['frames']:
+            raise ValueError(f'{header["path"]} has {header["frames"]} frames, but {headers[0]["path"]} has '
+                             f'{headers[0]["frames"]} frames. Check input files.')
+        previous = header
+    return headers
+
+
+def find_datasets(directory):
+    """
+    Find all Bruker .d directories containing analysis.tsf in a directory tree.
+
+    :param directory: Directory to search.
+    :type directory: str
+    :return: Sorted paths to the .d directories.
+    :rtype: list[str]
+    """
+    datasets = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        if dirpath.endswith('.d'):
+            if 'analysis.tsf' in filenames:
+                datasets.append(dirpath)
+            # do not search inside .d directories
+            dirnames.clear()
+    return sorted(datasets)
+
+
+def split_window_sets(headers):
+    """
+    Split datasets with the same sample name into window sets with non-overlapping mass ranges. Datasets are sorted by
+    mass range and each dataset is added to the first window set whose last mass range ends before it starts and
+    whose datasets have the same number of frames, so replicates acquired with the same mass ranges form separate
+    window sets.
+
+    :param headers: Headers from read_header() of the datasets with the same sample name.
+    :type headers: list[dict]
+    :return: List of window sets as lists of headers sorted by MzAcqRangeLower from lowest to highest.
+    :rtype: list[list[dict]]
+    """
+    window_sets = []
+    for header in sorted(headers, key=lambda x: (x['MzAcqRangeLower'], x['MzAcqRangeUpper'], x['path'])):
+        for window_set in window_sets:
+            if window_set[-1]['MzAcqRangeUpper'] <= header['MzAcqRangeLower'] and \
+                    window_set[-1]['frames'] == header['frames']:
+                window_set.append(header)
+                break
+        else:
+            window_sets.append([header])
+    return window_sets
+
+
+def get_window_sets(directory, sample_pattern=SAMPLE_PATTERN):
+    """
+    Group the datasets in a directory tree into window sets. Datasets in the same directory with the same sample name
+    are split into window sets with non-overlapping mass ranges with split_window_sets(). Window sets are named after
+    the sample, prefixed by the path of their directory relative to the searched directory and suffixed by a number if
+    the sample has more than one window set. Window sets of the same sample are replicates and must have the same mass
+    ranges, otherwise the mass ranges of the sample overlap and none of its datasets are placed in a window set. Window
+    sets with fewer datasets than the largest window set of the same sample are incomplete, and their datasets are not
+    placed in a window set. Datasets whose header cannot be read are not placed in a window set either.
+
+    :param directory: Directory to search.
+    :type directory: str
+    :param sample_pattern: Regular expression used to get the sample name from the name of a .d directory without the
+        extension. The sample name is the "sample" group or the first group. Names that do not match are used as is.
+    :type sample_pattern: str
+    :return: Tuple of a dictionary containing window set names as keys and headers from read_header() of the .d
+        directories sorted by MzAcqRangeLower as values, and a list of dictionaries containing the path of each dataset that was not placed
+        in a window set and the reason.
+    :rtype: tuple[dict, list[dict]]
+    """
+    pattern = re.compile(sample_pattern)
+    samples = {}
+    unplaced = []
+    for dataset in find_datasets(directory):
+        parent, name = os.path.split(dataset)
+        name = os.path.splitext(name)[0]
+        match = pattern.match(name)
+        if match:
+            sample = match.groupdict().get('sample') or match.group(1)
+        else:
+            sample = name
+        relative_parent = os.path.relpath(parent, directory)
+        if relative_parent != os.curdir:
+            sample = relative_parent.replace(os.sep, '_') + '_' + sample
+        try:
+            header = read_header(dataset)
+        except ValueError as exception:
+            unplaced.append({'path': dataset, 'error': str(exception)})
+            continue
+        samples.setdefault(sample, []).append(header)
+    window_sets = {}
+    for sample, headers in samples.items():
+        sample_window_sets = split_window_sets(headers)
+        largest = max(len(window_set) for window_set in sample_window_sets)
+        complete = [window_set for window_set in sample_window_sets if len(window_set) == largest]
+        mass_ranges = [[(header['MzAcqRangeLower'], header['MzAcqRangeUpper']) for header in window_set]
+                       for window_set in complete]
+        if any(i != mass_ranges[0] for i in mass_ranges):
+            unplaced += [{'path': header['path'],
+                          'error': f'Overlapping mass ranges detected in {sample}. Check input files.'}
+                         for header in headers]
+            continue
+        for count, window_set in enumerate(complete, start=1):
+            window_sets[f'{sample}_{count}' if len(complete) > 1 else sample] = window_set
+        for window_set in sample_window_sets:
+            if len(window_set) < largest:
+                unplaced += [{'path': header['path'],
+                              'error': f'Only {len(window_set)} of {largest} mass range windows of {sample} found '
+                                       f'with non-overlapping mass ranges and the same number of frames.'}
+                             for header in window_set]
+    return window_sets, sorted(unplaced, key=lambda x: x['path'])
+
+
+def convert_window_set_task(sample, headers, output, args):
+    """
+    Convert a window set in a batch worker process and record the result for the manifest. The headers read when the
+    window sets were found are reused instead of reading them again.
+
+    :param sample: Name of the window set.
+    :type sample: str
+    :param headers: Headers from read_header() of the Bruker .d directories in the window set.
+    :type headers: list[dict]
+    :param output: Path to output mzML or mzMLb file.
+    :type output: str
+    :param args: Arguments from get_args().
+    :type args: dict
+    :return: Dictionary containing the window set name, inputs, output, status, error message, number of spectra, and
+        conversion time in seconds.
+    :rtype: dict
+    """
+    filenames = [header['path'] for header in headers]
+    result = {'sample': sample,
+              'inputs': filenames,
+              'mass_ranges': [[header['MzAcqRangeLower'], header['MzAcqRangeUpper']] for header in headers],
+              'output': output,
+              'status': 'converted',
+              'error': '',
+              'spectra': 0,
+              'seconds': 0.0}
+    start = time.perf_counter()
+    try:
+        result['spectra'] = convert_window_set(filenames, output, args, headers)
+    except Exception as exception:
+        result['status'] = 'failed'
+        result['error'] = str(exception)
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(args):
+    """
+    Find and convert all window sets in a directory tree and write a manifest of the outputs and timings. Window sets
+    are converted in parallel by up to args["workers"] worker processes, and each window set is converted with a
+    single process.
+
+    :param args: Arguments from get_args().
+    :type args: dict
+    :return: Manifest dictionary.
+    :rtype: dict
+    """
+    outdir = args['output'] if args['output'] else args['batch']
+    os.makedirs(outdir, exist_ok=True)
+    args = dict(args, processes=1)
+    start = time.perf_counter()
+    window_sets, unplaced = get_window_sets(args['batch'], args['sample_pattern'])
+    print(f'Found {sum(len(i) for i in window_sets.values())} datasets in {len(window_sets)} window sets.')
+    for dataset in unplaced:
+        print(f'{dataset["path"]}: not placed in a window set ({dataset["error"]})')
+    results = []
+    with ProcessPoolExecutor(max_workers=max(args['workers'], 1)) as executor:
+        futures = [executor.submit(convert_window_set_task,
+                                   sample,
+                                   headers,
+                                   os.path.join(outdir, sample + OUTPUT_EXTENSIONS[args['format']]),
+                                   args)
+                   for sample, headers in window_sets.items()]
+        for future in as_completed(futures):
+            result = future.result()
+            print(f'{result["sample"]}: {result["status"]} in {result["seconds"]:.1f} s' +
+                  (f' ({result["error"]})' if result['error'] else ''))
+            results.append(result)
+    manifest = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'batch': os.path.abspath(args['batch']),
+                'workers': args['workers'],
+                'seconds': round(time.perf_counter() - start, 3),
+                'window_sets': sorted(results, key=lambda x: x['sample']),
+                'unplaced': unplaced}
+    with open(os.path.join(outdir, MANIFEST_FILENAME), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+    return manifest
+
+
+def run():
+    """
+    Combine and write multiple spectra with staggered non-overlapping mass range windows to a single spectrum in an
+    mzML file. If --batch is used, each window set found in the directory is converted to its own file.
+    """
+    # get args
+    args = get_args()
+    if args['batch'] is not None:
+        manifest = run_batch(args)
+        if manifest['unplaced'] or any(result['status'] == 'failed' for result in manifest['window_sets']):
+            sys.exit(1)
+        return
+    if not args['output'].endswith(OUTPUT_EXTENSIONS[args['format']]):
+        args['output'] = args['output'] + OUTPUT_EXTENSIONS[args['format']]
+    try:
+        convert_window_set(args['input'], args['output'], args)
+    except ValueError as exception:
+        print(exception)
         sys.exit(1)
 
 
@@ -0,0 +1,192 @@
+import os
+from autox_geometry import METHOD_LOAD_TIME, STAGE_SPEED, get_method_load_time, get_travel_time
+
+# Acquisition order strategies for the spot groups in AutoXecute sequences generated by fleX MS1 AutoXecute Generator.
+
+ORDER_STRATEGIES = {'method_major': 'Method-Major',
+                    'spot_major': 'Spot-Major with Batched Method Changes',
+                    'cost': 'Minimize Estimated Overhead'}
+# Default time in seconds spent at the start and end of each spot group, i.e. creating its dataset.
+SPOT_GROUP_OVERHEAD = 1.0
+# Batch sizes tried by the cost minimizing strategy in addition to whole conditions.
+COST_BATCH_SIZES = [1, 4, 16, 64, 256, 1024]
+
+
+def get_method_basename(method_path):
+    """
+    Get the method name used in spot group sample names from the path to a method.
+
+    :param method_path: Path to a method (*.m directory).
+    :type method_path: str
+    :return: Method name without the *.m extension.
+    :rtype: str
+    """
+    return os.path.splitext(os.path.split(method_path)[-1])[0]
+
+
+def get_method_major_order(conditions_dict, methods, serpentine=False):
+    """
+    Get the spot groups in method-major order: every condition is acquired with the first method before moving on to
+    the next method. Each method is only loaded once, but the stage travels across the plate once per method.
+
+    :param conditions_dict: Dictionary containing sample names as keys and a tuple of MALDI plate coordinates found on
+        the geometry as values.
+    :type conditions_dict: dict
+    :param methods: Dictionary of methods where the key is the method name and the value is the full path to the method.
+    :type methods: dict
+    :param serpentine: Whether to reverse the order of conditions and spots for every other method so that the stage
+        does not have to travel back across the plate between methods.
+    :type serpentine: bool
+    :return: List of spot groups as dictionaries containing the sample name, method path, and spots.
+    :rtype: list[dict]
+    """
+    order = []
+    conditions = list(conditions_dict.items())
+    reversed_conditions = [(condition, spots[::-1]) for condition, spots in reversed(conditions)]
+    for count, method_path in enumerate(methods.values()):
+        method_basename = get_method_basename(method_path)
+        for condition, spots in (reversed_conditions if serpentine and count % 2 else conditions):
+            order.append({'sampleName': f'{condition}_{method_basename}',
+                          'acqMethod': method_path,
+                          'spots': spots})
+    return order
+
+
+def get_spot_major_order(conditions_dict, methods, batch_size=0):
+    """
+    Get the spot groups in spot-major order: each batch of spots from a condition is acquired with every method before
+    moving on to the next batch. The method order alternates between batches so that the last method of one batch is
+    the first method of the next, and the spot order alternates between methods so that the stage does not have to
+    travel back across the batch. Smaller batches reduce stage travel at the cost of more method loads.
+
+    :param conditions_dict: Dictionary containing sample names as keys and a tuple of MALDI plate coordinates found on
+        the geometry as values.
+    :type conditions_dict: dict
+    :param methods: Dictionary of methods where the key is the method name and the value is the full path to the method.
+    :type methods: dict
+    :param batch_size: Maximum number of spots per batch. If 0, each condition is a single batch. If a condition is
+        split into multiple batches, the batch number is appended to the sample name.
+    :type batch_size: int
+    :return: List of spot groups as dictionaries containing the sample name, method path, and spots.
+    :rtype: list[dict]
+    """
+    order = []
+    method_paths = list(methods.values())
+    method_count = 0
+    for condition, spots in conditions_dict.items():
+        if batch_size and batch_size < len(spots):
+            batches = [spots[i:i + batch_size] for i in range(0, len(spots), batch_size)]
+        else:
+            batches = [spots]
+        for batch_count, batch in enumerate(batches, start=1):
+            suffix = f'_{batch_count}' if len(batches) > 1 else ''
+            reversed_batch = batch[::-1]
+            for method_path in (method_paths[::-1] if method_count % 2 else method_paths):
+                order.append({'sampleName': f'{condition}_{get_method_basename(method_path)}{suffix}',
+                              'acqMethod': method_path,
+                              'spots': reversed_batch if len(order) % 2 else batch})
+            method_count += 1
+    return order
+
+
+def estimate_acquisition_overhead(order, geometry=None, method_load_time=METHOD_LOAD_TIME, stage_speed=STAGE_SPEED,
+                                  spot_group_overhead=SPOT_GROUP_OVERHEAD):
+    """
+    Estimate the method load, spot group, and stage travel overhead of an acquisition order. A method load is counted
+    whenever a spot group uses a different method from the previous spot group, and every spot group adds a fixed
+    overhead so that splitting conditions into many small batches is not free. Stage travel is the straight line
+    distance between consecutive spots.
+
+    :param order: List of spot groups returned by get_acquisition_order().
+    :type order: list[dict]
+    :param geometry: Plate geometry used to look up spot coordinates. If None, stage travel is not estimated.
+    :type geometry: autox_geometry.PlateGeometry | None
+    :param method_load_time: Time in seconds to load a method.
+    :type method_load_time: float
+    :param stage_speed: Stage speed in µm per second.
+    :type stage_speed: float
+    :param spot_group_overhead: Time in seconds spent at the start and end of each spot group.
+    :type spot_group_overhead: float
+    :return: Dictionary containing the number of spot groups, method loads, stage travel distance in µm, and the
+        estimated method load, spot group, stage travel, and total overhead in seconds.
+    :rtype: dict
+    """
+    method_loads = 0
+    travel_distance = 0.0
+    previous_method = None
+    previous_spot = None
+    # Travel within a spot group only depends on its spots, which are shared between many spot groups.
+    group_distances = {}
+    for group in order:
+        if group['acqMethod'] != previous_method:
+            method_loads += 1
+            previous_method = group['acqMethod']
+        spots = group['spots']
+        if geometry is None or not spots:
+            continue
+        if previous_spot is not None:
+            travel_distance += geometry.get_distance(previous_spot, spots[0])
+        if spots not in group_distances:
+            group_distances[spots] = sum(geometry.get_distance(spots[i], spots[i + 1]) for i in range(len(spots) - 1))
+            group_distances[spots[::-1]] = group_distances[spots]
+        travel_distance += group_distances[spots]
+        previous_spot = spots[-1]
+    overhead = {'spot_groups': len(order),
+                'method_loads': method_loads,
+                'travel_distance': travel_distance,
+                'method_load_time': get_method_load_time(method_loads, method_load_time),
+                'spot_group_time': len(order) * spot_group_overhead,
+                'travel_time': get_travel_time(travel_distance, stage_speed)}
+    overhead['total_time'] = overhead['method_load_time'] + overhead['spot_group_time'] + overhead['travel_time']
+    return overhead
+
+
+def get_acquisition_order(conditions_dict, methods, strategy='method_major', batch_size=0, geometry=None,
+                          method_load_time=METHOD_LOAD_TIME, stage_speed=STAGE_SPEED,
+                          spot_group_overhead=SPOT_GROUP_OVERHEAD):
+    """
+    Get the order in which spot groups are written to an AutoXecute sequence.
+
+    :param conditions_dict: Dictionary containing sample names as keys and a tuple of MALDI plate coordinates found on
+        the geometry as values.
+    :type conditions_dict: dict
+    :param methods: Dictionary of methods where the key is the method name and the value is the full path to the method.
+    :type methods: dict
+    :param strategy: Acquisition order strategy. Either "method_major", "spot_major", or "cost". The "cost" strategy
+        estimates the overhead of method-major (with and without reversing direction between methods) and spot-major
+        orders with a range of batch sizes and returns the order with the lowest estimated overhead.
+    :type strategy: str
+    :param batch_size: Maximum number of spots per batch for the "spot_major" strategy. If 0, each condition is a
+        single batch.
+    :type batch_size: int
+    :param geometry: Plate geometry used to estimate stage travel for the "cost" strategy.
+    :type geometry: autox_geometry.PlateGeometry | None
+    :param method_load_time: Time in seconds to load a method.
+    :type method_load_time: float
+    :param stage_speed: Stage speed in µm per second.
+    :type stage_speed: float
+    :param spot_group_overhead: Time in seconds spent at the start and end of each spot group.
+    :type spot_group_overhead: float
+    :return: Tuple of the list of spot groups as dictionaries containing the sample name, method path, and spots, and
+        the strategy that was used including the batch size if applicable.
+    :rtype: tuple[list[dict], str]
+    """
+    if strategy == 'method_major':
+        return get_method_major_order(conditions_dict, methods), 'method_major'
+    elif strategy == 'spot_major':
+        return (get_spot_major_order(conditions_dict, methods, batch_size),
+                f'spot_major (batch size {batch_size})' if batch_size else 'spot_major')
+    elif strategy == 'cost':
+        largest_condition = max([len(spots) for spots in conditions_dict.values()], default=0)
+        candidates = [(get_method_major_order(conditions_dict, methods), 'method_major'),
+                      (get_method_major_order(conditions_dict, methods, serpentine=True), 'method_major (serpentine)'),
+                      (get_spot_major_order(conditions_dict, methods), 'spot_major')]
+        candidates += [(get_spot_major_order(conditions_dict, methods, size), f'spot_major (batch size {size})')
+                       for size in COST_BATCH_SIZES if size < largest_condition]
+        return min(candidates,
+                   key=lambda candidate: estimate_acquisition_overhead(candidate[0],
+                                                                       geometry,
+                                                                       method_load_time,
+                                                                       stage_speed,
+                                                                       spot_group_overhead)['total_time'])
+    raise ValueError(f'Unknown acquisition order strategy {strategy}. Choose from {", ".join(ORDER_STRATEGIES)}.')
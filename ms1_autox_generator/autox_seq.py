@@ -0,0 +1,252 @@
+# The following code has been modified from TIMSCONVERT.
+# For more information see: https://github.com/gtluu/timsconvert
+
+import os
+import sys
+import configparser
+import datetime
+import pytz
+import tzlocal
+import pandas as pd
+import lxml.etree as et
+
+# Allow the shared geometry registry to be imported when running this script directly from the repository.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from autox_geometry import METHOD_LOAD_TIME, STAGE_SPEED, get_geometry_registry, get_plate_geometry, get_overhead_params
+from acquisition_order import SPOT_GROUP_OVERHEAD, get_acquisition_order, estimate_acquisition_overhead
+
+# AutoXecute sequence generation for fleX MS1 AutoXecute Generator. Kept separate from the GUI so that sequences can be
+# generated without importing Qt.
+
+VERSION = '0.1.0'
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'etc', 'ms1_autox_generator.cfg')
+
+
+def iter_methods(methods_path):
+    """
+    Find timsControl methods (*.m directories) in a directory, yielding the methods found in each directory as it is
+    walked so that callers can show results before the walk finishes. A *.m directory is not searched any further
+    since methods are not nested inside other methods. If methods_path is itself a method, it is yielded as the only
+    method.
+
+    :param methods_path: Path to a method (*.m directory) or a directory containing methods.
+    :type methods_path: str
+    :return: Generator of lists of paths to methods found in each directory.
+    :rtype: collections.abc.Iterator[list[str]]
+    """
+    if methods_path.endswith('.m'):
+        yield [methods_path]
+        return
+    for dirpath, dirnames, filenames in os.walk(methods_path):
+        methods = [os.path.join(dirpath, directory) for directory in dirnames if directory.endswith('.m')]
+        # Prune *.m directories from the walk.
+        dirnames[:] = [directory for directory in dirnames if not directory.endswith('.m')]
+        if methods:
+            yield methods
+
+
+def get_methods(methods_path):
+    """
+    Find timsControl methods (*.m directories) in a directory.
+
+    :param methods_path: Path to a method (*.m directory) or a directory containing methods.
+    :type methods_path: str
+    :return: List of paths to methods.
+    :rtype: list[str]
+    """
+    return [method for methods in iter_methods(methods_path) for method in methods]
+
+
+def get_acquisition_order_params():
+    """
+    Obtain the acquisition order strategy, batch size, and spot group overhead from the [AcquisitionOrder] section of
+    the config file. The method load time and stage speed are read from etc/acquisition_time.cfg, which is shared with
+    the fleX MS/MS AutoXecute Generator acquisition time estimate. Defaults are used for any missing parameters.
+
+    :return: Dictionary containing the order strategy, batch size, method load time in seconds, stage speed in µm per
+        second, and spot group overhead in seconds.
+    :rtype: dict
+    """
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+    if 'AcquisitionOrder' not in config:
+        config['AcquisitionOrder'] = {}
+    section = config['AcquisitionOrder']
+    return dict(get_overhead_params(),
+                order=section.get('order', 'method_major'),
+                batch_size=section.getint('batch_size', 0),
+                spot_group_overhead=section.getfloat('spot_group_overhead', SPOT_GROUP_OVERHEAD))
+
+
+def parse_maldi_plate_map(plate_map_filename):
+    """
+    Parse MALDI plate maps from *.csv files. Example plate maps for 48, 96, 384, 1536, and 6144 format plates are
+    provided.
+
+    :param plate_map_filename: Path to *.csv file containing plate map information.
+    :type plate_map_filename: str
+    :return: Dictionary containing sample names as keys and a list of MALDI plate coordinates as values.
+    :rtype: dict
+    """
+    plate_map = pd.read_csv(plate_map_filename, index_col=0, dtype=str)
+    # Columns are numbered by position rather than by header to match the plate coordinate convention.
+    plate_map.columns = range(1, plate_map.shape[1] + 1)
+    # Stack the plate map into a single row-major Series of conditions indexed by (row, column); empty wells are
+    # dropped.
+    plate_map = plate_map.stack().dropna()
+    spots = (plate_map.index.get_level_values(0).astype(str) +
+             plate_map.index.get_level_values(1).astype(str))
+    # Group coordinates by condition while preserving the order in which conditions first appear on the plate.
+    return {condition: list(group)
+            for condition, group in pd.Series(spots).groupby(plate_map.values, sort=False)}
+
+
+def get_geometry_files(geometry_path):
+    """
+    Obtain the list of MALDI plate geometries to be selected from.
+
+    :param geometry_path: Path to the directory containing MALDI plate geometry (*.xeo) files.
+    :type geometry_path: str
+    :return: Dictionary containing the geometry name as keys and the path to the corresponding geometry files as values.
+    :rtype: dict
+    """
+    return get_geometry_registry(CONFIG_PATH).get_geometry_files(geometry_path)
+
+
+def write_autox_seq(conditions_dict, methods, output_path, geometry, geometry_path, order='method_major', batch_size=0,
+                    method_load_time=METHOD_LOAD_TIME, stage_speed=STAGE_SPEED,
+                    spot_group_overhead=SPOT_GROUP_OVERHEAD):
+    """
+    Generate an AutoXecute sequence (*.run) file.
+
+    :param conditions_dict: Dictionary containing sample names as keys and a list of MALDI plate coordinates as values.
+    :type conditions_dict: dict
+    :param methods: Dictionary of methods (*.m files) to be used in the AutoXecute run where the key is the method name
+        and the value is the full path to the method. Each method is passed to each
+        coordinate to ensure that all each sample is run with each method.
+    :type methods: dict
+    :param output_path: Path to the *.run file that will be output.
+    :type output_path: str
+    :param geometry: Geometry name that this AutoXecute sequence will use.
+    :type geometry: str
+    :param geometry_path: Path to the geometry (*.xeo) file that this AutoXecute sequence will use.
+    :type geometry_path: str
+    :param order: Acquisition order strategy. Either "method_major", "spot_major", or "cost". See
+        acquisition_order.get_acquisition_order().
+    :type order: str
+    :param batch_size: Maximum number of spots per batch for the "spot_major" strategy. If 0, each condition is a
+        single batch.
+    :type batch_size: int
+    :param method_load_time: Time in seconds to load a method used to estimate overhead.
+    :type method_load_time: float
+    :param stage_speed: Stage speed in µm per second used to estimate overhead.
+    :type stage_speed: float
+    :param spot_group_overhead: Time in seconds spent at the start and end of each spot group used to estimate overhead.
+    :type spot_group_overhead: float
+    :return: Tuple of the list of messages for any missed coordinates to be written to a log file and a dictionary
+        containing the estimated method load, spot group, and stage travel overhead of the acquisition order.
+    :rtype: tuple[list[str], dict]
+    """
+    # Stores any error_messages.
+    messages = []
+    # Write out log.
+    log_info = f'Version: {VERSION}\nMALDI Plate Map: {output_path}\nMALDI Plate Geometry: {geometry_path}\n\nMethods\n'
+
+    # Get AutoXecute attribute dict.
+    autox_attrib = {'AnalysisSpectraType': 'Single_Spectra',
+                    'DataStorage': 'Container',
+                    'appname': 'timsControl',
+                    # Initializes with hardcoded version but checks against currently installed timsControl version if
+                    # available.
+                    # Defaults to Compass 2024b SR1
+                    'appVersion': '5.1.6_67f5008_1',
+                    'cleanSourceAfterMeasurement': 'Off',
+                    'date': datetime.datetime.now(pytz.timezone(tzlocal.get_localzone_name())).isoformat(),
+                    'directory': os.path.split(output_path)[0],
+                    'doBaselineSub': 'false',
+                    'doSmoothing': 'false',
+                    'ejectTargetAfterMeasurement': 'false',
+                    'fragmentMass': '0.0',
+                    'geometry': geometry,
+                    'parentMass': '0.0',
+                    'stopAfterMsMeasurement': 'false',
+                    'targetID': '',
+                    'type': 'SpotList',
+                    'use1to1Preteaching': 'false',
+                    'version': '2.0',
+                    'executeExternalCalibration': 'true'}
+
+    # Update timsControl version attribute if installed on the current system.
+    if os.path.isfile('C:\\Program Files\\Bruker\\timsControl\\buildver.txt'):
+        with open('C:\\Program Files\\Bruker\\timsControl\\buildver.txt', 'r') as timscontrol_build_ver:
+            autox_attrib['appVersion'] = timscontrol_build_ver.read().strip()
+
+    # Get spot position names from selected geometry file.
+    plate_geometry = get_plate_geometry(geometry_path)
+    position_names = plate_geometry.position_names
+
+    # Validate spots against the geometry once for all methods.
+    valid_conditions = {}
+    for condition, list_of_spots in conditions_dict.items():
+        spots = tuple(spot for spot in list_of_spots if spot in position_names)
+        if spots:
+            valid_conditions[condition] = spots
+            messages += [f'{spot} not found on selected geometry and not added to the AutoXecute Sequence.'
+                         for spot in list_of_spots if spot not in position_names]
+        else:
+            messages.append(f'All spots for {condition} not found on selected geometry and not added to the '
+                            f'Autoxecute Sequence.')
+
+    acquisition_order, strategy = get_acquisition_order(valid_conditions,
+                                                        methods,
+                                                        order,
+                                                        batch_size,
+                                                        plate_geometry,
+                                                        method_load_time,
+                                                        stage_speed,
+                                                        spot_group_overhead)
+    overhead = estimate_acquisition_overhead(acquisition_order,
+                                             plate_geometry,
+                                             method_load_time,
+                                             stage_speed,
+                                             spot_group_overhead)
+    overhead['strategy'] = strategy
+
+    # Write new AutoXecute *.run file.
+    # Stream the XML tree to the *.run file one spot_group at a time instead of building the full tree in memory. A
+    # spot_group template is built once for each distinct set of spots so that only the sample name and method have to
+    # be set for each spot group.
+    spot_groups = {}
+    with et.xmlfile(output_path, encoding='UTF-8') as autox:
+        autox.write_declaration()
+        with autox.element('table', attrib=autox_attrib):
+            for group in acquisition_order:
+                spot_group = spot_groups.get(group['spots'])
+                if spot_group is None:
+                    spot_group = et.Element('spot_group', attrib={'sampleName': '', 'acqMethod': ''})
+                    for spot in group['spots']:
+                        et.SubElement(spot_group,
+                                      'cont',
+                                      attrib={'Chip_on_Scout': '0',
+                                              'Pos_on_Scout': spot,
+                                              'acqJobMode': 'MS'})
+                    et.indent(spot_group, space='  ', level=1)
+                    spot_groups[group['spots']] = spot_group
+                spot_group.set('sampleName', group['sampleName'])
+                spot_group.set('acqMethod', group['acqMethod'])
+                autox.write('\n  ')
+                autox.write(spot_group)
+            autox.write('\n')
+    # Write out basic log file.
+    for method_name, method_path in methods.items():
+        log_info += method_path + '\n'
+    log_info += (f'\nAcquisition Order: {strategy}\n'
+                 f'Spot Groups: {overhead["spot_groups"]}\n'
+                 f'Method Loads: {overhead["method_loads"]}\n'
+                 f'Estimated Stage Travel: {overhead["travel_distance"] / 1000:.1f} mm\n'
+                 f'Estimated Overhead: {overhead["total_time"]:.0f} s (method loads {overhead["method_load_time"]:.0f} '
+                 f's, spot groups {overhead["spot_group_time"]:.0f} s, stage travel {overhead["travel_time"]:.0f} s)\n')
+    with open(os.path.splitext(output_path)[0] + '.log', 'w') as logfile:
+        logfile.write(log_info)
+
+    return messages, overhead
@@ -0,0 +1,318 @@
+# The following code has been modified from TIMSCONVERT.
+# For more information see: https://github.com/gtluu/timsconvert
+
+import os
+import sys
+import argparse
+import datetime
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from autox_seq import VERSION, CONFIG_PATH, parse_maldi_plate_map, get_geometry_files, get_methods, write_autox_seq, \
+    get_acquisition_order_params
+from acquisition_order import ORDER_STRATEGIES
+
+# Headless batch generation of AutoXecute sequences for fleX MS1 AutoXecute Generator. Qt is never imported.
+
+MANIFEST_COLUMNS = ['plate_map', 'methods', 'output', 'geometry']
+
+
+def get_args():
+    """
+    Parse command line parameters, including required and optional parameters.
+
+    :return: Arguments with default or user specified values.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--plate_map',
+                        help='One or more MALDI plate maps (*.csv files). An AutoXecute sequence is generated for each '
+                             'plate map.',
+                        default=[],
+                        type=str,
+                        nargs='+')
+    parser.add_argument('--methods',
+                        help='One or more timsControl methods (*.m directories) or directories containing methods to '
+                             'be used for every plate map.',
+                        default=[],
+                        type=str,
+                        nargs='+')
+    parser.add_argument('--geometry',
+                        help='Name of the MALDI plate geometry found in the GeometryFiles directory. Used for every '
+                             'plate map unless specified in the manifest. Required unless every manifest row has a '
+                             'geometry.',
+                        default='',
+                        type=str)
+    parser.add_argument('--output',
+                        help='Directory to write AutoXecute sequences (*.run files) to. Defaults to the directory '
+                             'containing each plate map.',
+                        default='',
+                        type=str)
+    parser.add_argument('--manifest',
+                        help='CSV file with the columns "plate_map", "methods", "output", and "geometry" with one '
+                             'AutoXecute sequence per row. Multiple methods are separated by ";". Empty "output" and '
+                             '"geometry" values fall back to --output and --geometry. Relative paths are relative to '
+                             'the manifest.',
+                        default='',
+                        type=str)
+    parser.add_argument('--order',
+                        help='Acquisition order of spot groups: method-major (method_major), spot-major with batched '
+                             'method changes (spot_major), or the order with the lowest estimated method load and stage '
+                             'travel overhead (cost). Defaults to the order in the config file.',
+                        default='',
+                        type=str,
+                        choices=list(ORDER_STRATEGIES.keys()))
+    parser.add_argument('--batch_size',
+                        help='Maximum number of spots per batch for spot-major order. 0 uses each condition as a '
+                             'single batch. Defaults to the batch size in the config file.',
+                        default=-1,
+                        type=int)
+    parser.add_argument('--processes',
+                        help='Number of AutoXecute sequences to generate in parallel. Defaults to the number of CPUs.',
+                        default=os.cpu_count(),
+                        type=int)
+    parser.add_argument('--log',
+                        help='Path to the consolidated log file. Defaults to ms1_autox_batch.log in the --output '
+                             'directory or the current directory.',
+                        default='',
+                        type=str)
+
+    arguments = parser.parse_args()
+    return vars(arguments)
+
+
+def get_output_path(plate_map, output):
+    """
+    Get the path to the AutoXecute sequence (*.run) file for a plate map.
+
+    :param plate_map: Path to the MALDI plate map (*.csv file).
+    :type plate_map: str
+    :param output: Path to the output *.run file or to a directory to write it to. If empty, the *.run file is written
+        next to the plate map.
+    :type output: str
+    :return: Path to the *.run file.
+    :rtype: str
+    """
+    if output.endswith('.run'):
+        return output
+    filename = os.path.splitext(os.path.split(plate_map)[-1])[0] + '.run'
+    if output:
+        return os.path.join(output, filename)
+    return os.path.join(os.path.dirname(plate_map), filename)
+
+
+def get_jobs_from_args(plate_maps, methods, geometry, output):
+    """
+    Get the list of AutoXecute sequences to generate when plate maps and methods are given on the command line.
+
+    :param plate_maps: Paths to MALDI plate maps (*.csv files).
+    :type plate_maps: list[str]
+    :param methods: Paths to methods (*.m directories) or directories containing methods.
+    :type methods: list[str]
+    :param geometry: MALDI plate geometry name.
+    :type geometry: str
+    :param output: Directory to write AutoXecute sequences to.
+    :type output: str
+    :return: List of dictionaries containing the plate map, methods, output path, and geometry for each sequence.
+    :rtype: list[dict]
+    """
+    method_paths = [os.path.abspath(method) for path in methods for method in get_methods(path)]
+    return [{'plate_map': os.path.abspath(plate_map),
+             'methods': method_paths,
+             'output': os.path.abspath(get_output_path(plate_map, output)),
+             'geometry': geometry}
+            for plate_map in plate_maps]
+
+
+def get_jobs_from_manifest(manifest, geometry, output):
+    """
+    Get the list of AutoXecute sequences to generate from a manifest CSV file.
+
+    :param manifest: Path to the manifest (*.csv file).
+    :type manifest: str
+    :param geometry: Default MALDI plate geometry name for rows without a geometry.
+    :type geometry: str
+    :param output: Default output directory for rows without an output.
+    :type output: str
+    :return: List of dictionaries containing the plate map, methods, output path, and geometry for each sequence.
+    :rtype: list[dict]
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest))
+    df = pd.read_csv(manifest, dtype=str).fillna('')
+    missing = [i for i in ['plate_map', 'methods'] if i not in df.columns]
+    if missing:
+        raise ValueError(f'Manifest {manifest} is missing the following columns: {", ".join(missing)}')
+    for column in MANIFEST_COLUMNS:
+        if column not in df.columns:
+            df[column] = ''
+
+    jobs = []
+    for plate_map, methods, row_output, row_geometry in df[MANIFEST_COLUMNS].itertuples(index=False):
+        plate_map = os.path.join(manifest_dir, plate_map.strip())
+        method_paths = [os.path.abspath(method)
+                        for path in methods.split(';') if path.strip()
+                        for method in get_methods(os.path.join(manifest_dir, path.strip()))]
+        row_output = os.path.join(manifest_dir, row_output.strip()) if row_output.strip() else output
+        jobs.append({'plate_map': os.path.abspath(plate_map),
+                     'methods': method_paths,
+                     'output': os.path.abspath(get_output_path(plate_map, row_output)),
+                     'geometry': row_geometry.strip() or geometry})
+    return jobs
+
+
+def validate_jobs(jobs, geometry_names):
+    """
+    Check the list of AutoXecute sequences to generate before any sequences are generated. Every sequence must have a
+    geometry that is found in the GeometryFiles directory, and no two sequences may be written to the same file.
+
+    :param jobs: List of dictionaries containing the plate map, methods, output path, and geometry for each sequence.
+    :type jobs: list[dict]
+    :param geometry_names: Names of the MALDI plate geometries found in the GeometryFiles directory.
+    :type geometry_names: list[str]
+    :return: List of error messages. Empty if all sequences can be generated.
+    :rtype: list[str]
+    """
+    errors = []
+    missing = [job['plate_map'] for job in jobs if not job['geometry']]
+    if missing:
+        errors.append(f'--geometry is required for plate maps without a geometry in the manifest: {", ".join(missing)}')
+    unknown = sorted(set(job['geometry'] for job in jobs if job['geometry'] and job['geometry'] not in geometry_names))
+    if unknown:
+        errors.append(f'MALDI plate geometry not found in GeometryFiles directory: {", ".join(unknown)}')
+    outputs = {}
+    for job in jobs:
+        outputs.setdefault(os.path.normcase(job['output']), []).append(job['plate_map'])
+    for output, plate_maps in outputs.items():
+        if len(plate_maps) > 1:
+            errors.append(f'Multiple plate maps would be written to {output}: {", ".join(plate_maps)}')
+    return errors
+
+
+def generate_autox_seq(job, order_params):
+    """
+    Generate a single AutoXecute sequence. Errors are caught and returned so that a single bad plate map does not stop
+    the rest of the batch.
+
+    :param job: Dictionary containing the plate map, methods, output path, geometry, and geometry path.
+    :type job: dict
+    :param order_params: Acquisition order strategy and overhead estimate parameters.
+    :type order_params: dict
+    :return: The job dictionary updated with any messages, the estimated acquisition overhead, and errors.
+    :rtype: dict
+    """
+    result = dict(job, messages=[], overhead={}, error='')
+    try:
+        if not job['methods']:
+            raise ValueError('No methods found.')
+        if not job['geometry_path']:
+            raise ValueError(f'MALDI plate geometry {job["geometry"]} not found in GeometryFiles directory.')
+        os.makedirs(os.path.dirname(job['output']), exist_ok=True)
+        result['messages'], result['overhead'] = write_autox_seq(parse_maldi_plate_map(job['plate_map']),
+                                                                 {method: method for method in job['methods']},
+                                                                 job['output'],
+                                                                 job['geometry'],
+                                                                 job['geometry_path'],
+                                                                 **order_params)
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+
+def generate_autox_seqs(jobs, processes=None, order_params=None):
+    """
+    Generate AutoXecute sequences in parallel. Geometry file paths are resolved once from the GeometryFiles directory in
+    the config file before any sequences are generated.
+
+    :param jobs: List of dictionaries containing the plate map, methods, output path, and geometry for each sequence.
+    :type jobs: list[dict]
+    :param processes: Number of worker processes. Defaults to the number of CPUs.
+    :type processes: int | None
+    :param order_params: Acquisition order strategy and overhead estimate parameters. Defaults to the parameters in the
+        config file.
+    :type order_params: dict | None
+    :return: List of job dictionaries updated with any messages and errors in the same order as jobs.
+    :rtype: list[dict]
+    """
+    if order_params is None:
+        order_params = get_acquisition_order_params()
+    geometry_paths = get_geometry_files(None)
+    jobs = [dict(job, geometry_path=geometry_paths.get(job['geometry'], '')) for job in jobs]
+    if processes == 1 or len(jobs) <= 1:
+        return [generate_autox_seq(job, order_params) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(processes or os.cpu_count(), len(jobs))) as executor:
+        return list(executor.map(generate_autox_seq, jobs, [order_params] * len(jobs)))
+
+
+def write_batch_log(results, log_path):
+    """
+    Write a consolidated log for all AutoXecute sequences generated in a batch.
+
+    :param results: List of job dictionaries returned by generate_autox_seqs().
+    :type results: list[dict]
+    :param log_path: Path to the log file.
+    :type log_path: str
+    """
+    with open(log_path, 'w') as logfile:
+        logfile.write(f'Version: {VERSION}\nDate: {datetime.datetime.now().isoformat()}\n'
+                      f'Config: {CONFIG_PATH}\nSequences: {len(results)}\n'
+                      f'Failed: {len([i for i in results if i["error"]])}\n')
+        for result in results:
+            logfile.write(f'\nMALDI Plate Map: {result["plate_map"]}\n'
+                          f'AutoXecute Sequence: {result["output"]}\n'
+                          f'MALDI Plate Geometry: {result["geometry"]} ({result["geometry_path"]})\n'
+                          f'Methods: {len(result["methods"])}\n')
+            for method in result['methods']:
+                logfile.write(f'    {method}\n')
+            if result['overhead']:
+                logfile.write(f'Acquisition Order: {result["overhead"]["strategy"]}\n'
+                              f'Spot Groups: {result["overhead"]["spot_groups"]}\n'
+                              f'Method Loads: {result["overhead"]["method_loads"]}\n'
+                              f'Estimated Stage Travel: {result["overhead"]["travel_distance"] / 1000:.1f} mm\n'
+                              f'Estimated Overhead: {result["overhead"]["total_time"]:.0f} s\n')
+            logfile.write(f'Status: {"Failed - " + result["error"] if result["error"] else "OK"}\n')
+            for message in result['messages']:
+                logfile.write(f'    {message}\n')
+
+
+def run():
+    """
+    Generate AutoXecute sequences for multiple MALDI plate maps from the command line.
+    """
+    args = get_args()
+    if args['manifest']:
+        jobs = get_jobs_from_manifest(args['manifest'], args['geometry'], args['output'])
+    elif args['plate_map'] and args['methods']:
+        jobs = get_jobs_from_args(args['plate_map'], args['methods'], args['geometry'], args['output'])
+    else:
+        print('Either --manifest or both --plate_map and --methods are required.')
+        sys.exit(1)
+    errors = validate_jobs(jobs, list(get_geometry_files(None).keys()))
+    if errors:
+        for error in errors:
+            print(error)
+        sys.exit(1)
+    if not args['log']:
+        args['log'] = os.path.join(args['output'], 'ms1_autox_batch.log')
+    if args['output']:
+        os.makedirs(args['output'], exist_ok=True)
+
+    order_params = get_acquisition_order_params()
+    if args['order']:
+        order_params['order'] = args['order']
+    if args['batch_size'] >= 0:
+        order_params['batch_size'] = args['batch_size']
+
+    results = generate_autox_seqs(jobs, args['processes'], order_params)
+    write_batch_log(results, args['log'])
+
+    for result in results:
+        if result['error']:
+            print(f'Failed: {result["plate_map"]} - {result["error"]}')
+        else:
+            print(f'{result["output"]} ({len(result["messages"])} messages)')
+    print(f'Log written to {args["log"]}')
+    if any(result['error'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
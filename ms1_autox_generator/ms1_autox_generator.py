@@ -3,85 +3,59 @@
 
 import os
 import configparser
-import datetime
-import pytz
-import tzlocal
-import pandas as pd
-import lxml.etree as et
+from PySide6.QtCore import QObject, QRunnable, QThread, QThreadPool, Signal
+from PySide6.QtGui import QAction, QActionGroup
 from PySide6.QtWidgets import QApplication, QMainWindow, QFileDialog, QTableWidgetItem, QSizePolicy, QHeaderView, \
     QAbstractItemView, QMessageBox
 from ms1_autox_generator_template import Ui_MainWindow
+from autox_seq import CONFIG_PATH, parse_maldi_plate_map, get_geometry_files, iter_methods, write_autox_seq, \
+    get_acquisition_order_params
+from acquisition_order import ORDER_STRATEGIES
 
-VERSION = '0.1.0'
 
-
-def parse_maldi_plate_map(plate_map_filename):
+class MethodDiscoveryWorker(QObject):
     """
-    Parse MALDI plate maps from *.csv files. Example plate maps for 48, 96, 384, 1536, and 6144 format plates are
-    provided.
+    Worker that finds timsControl methods (*.m directories) in a directory. Meant to be moved to a QThread so that
+    walking large or network directories does not block the GUI. Methods are emitted per directory as they are found.
 
-    :param plate_map_filename: Path to *.csv file containing plate map information.
-    :type plate_map_filename: str
-    :return: Dictionary containing sample names as keys and a list of MALDI plate coordinates as values.
-    :rtype: dict
+    :param methods_path: Path to a method (*.m directory) or a directory containing methods.
+    :type methods_path: str
     """
-    plate_map = pd.read_csv(plate_map_filename, index_col=0)
-    plate_dict = {}
-    for index, row in plate_map.iterrows():
-        for count, value in enumerate(row, start=1):
-            plate_dict[f'{index}{str(count)}'] = value
-    conditions = list(dict.fromkeys([str(value) for key, value in plate_dict.items()]))
-    conditions_dict = {i: [] for i in conditions}
-    for key, value in plate_dict.items():
-        try:
-            conditions_dict[value].append(key)
-        except KeyError:
-            pass
-    return conditions_dict
+    found = Signal(list)
+    finished = Signal()
 
+    def __init__(self, methods_path):
+        """
+        Constructor Method
+        """
+        super(MethodDiscoveryWorker, self).__init__()
+        self.methods_path = methods_path
 
-def get_geometry_files(geometry_path):
-    """
-    Obtain the list of MALDI plate geometries to be selected from.
+    def run(self):
+        """
+        Walk the methods directory and emit the methods found in each directory.
+        """
+        for methods in iter_methods(self.methods_path):
+            self.found.emit([i.replace('/', '\\') for i in methods])
+        self.finished.emit()
 
-    :param geometry_path: Path to the directory containing MALDI plate geometry (*.xeo) files.
-    :type geometry_path: str
-    :return: Dictionary containing the geometry name as keys and the path to the corresponding geometry files as values.
-    :rtype: dict
+
+class AutoXecuteWorkerSignals(QObject):
     """
-    # Parse config file for inclusion list of acceptable geometries.
-    config = configparser.ConfigParser()
-    config.read(os.path.join(os.path.dirname(__file__), 'etc', 'ms1_autox_generator.cfg'))
-    defaults = config['GeometryFiles']['defaults'].split(',')
-
-    # Get list of .xeo geometry files from the GeometryFiles path.
-    geometry_files = [os.path.join(dirpath, filename).replace('/', '\\')
-                      for dirpath, dirnames, filenames in os.walk(geometry_path)
-                      for filename in filenames
-                      if os.path.splitext(filename)[1] == '.xeo']
-
-    # Only keep geometry files that are not imaging geometries from flexImaging.
-    # Discard geometry files not found in inclusion list.
-    geometry_files_subset = []
-    for geometry in geometry_files:
-        if os.path.splitext(os.path.split(geometry)[-1])[0] in defaults:
-            with open(geometry, 'r') as geometry_object:
-                if 'flexImaging' not in geometry_object.read():
-                    geometry_files_subset.append(geometry)
-    geometry_files_subset = {os.path.splitext(os.path.split(i)[-1])[0]: i for i in geometry_files_subset}
-
-    return geometry_files_subset
-
-
-def write_autox_seq(conditions_dict, methods, output_path, geometry, geometry_path):
+    Signals emitted by AutoXecuteWorker. QRunnable is not a QObject and cannot define signals itself.
     """
-    Generate an AutoXecute sequence (*.run) file.
+    finished = Signal(str, list, dict)
+    error = Signal(str)
+
 
-    :param conditions_dict: Dictionary containing sample names as keys and a list of MALDI plate coordinates as values.
-    :type conditions_dict: dict
+class AutoXecuteWorker(QRunnable):
+    """
+    Worker that parses the MALDI plate map and writes the AutoXecute sequence in a QThreadPool thread.
+
+    :param maldi_plate_map_path: Path to *.csv file containing plate map information.
+    :type maldi_plate_map_path: str
     :param methods: Dictionary of methods (*.m files) to be used in the AutoXecute run where the key is the method name
-        and the value is the full path to the method. Each method is passed to each
-        coordinate to ensure that all each sample is run with each method.
+        and the value is the full path to the method.
     :type methods: dict
     :param output_path: Path to the *.run file that will be output.
     :type output_path: str
@@ -89,82 +63,39 @@ def write_autox_seq(conditions_dict, methods, output_path, geometry, geometry_pa
     :type geometry: str
     :param geometry_path: Path to the geometry (*.xeo) file that this AutoXecute sequence will use.
     :type geometry_path: str
-    :return: String containing any missed coordinates to be written to a log file.
-    :rtype: str
+    :param order_params: Acquisition order strategy and overhead estimate parameters from
+        autox_seq.get_acquisition_order_params().
+    :type order_params: dict
     """
-    # Stores any error_messages.
-    messages = ''
-    # Write out log.
-    log_info = f'Version: {VERSION}\nMALDI Plate Map: {output_path}\nMALDI Plate Geometry: {geometry_path}\n\nMethods\n'
-
-    # Get AutoXecute attribute dict.
-    autox_attrib = {'AnalysisSpectraType': 'Single_Spectra',
-                    'DataStorage': 'Container',
-                    'appname': 'timsControl',
-                    # Initializes with hardcoded version but checks against currently installed timsControl version if
-                    # available.
-                    # Defaults to Compass 2024b SR1
-                    'appVersion': '5.1.6_67f5008_1',
-                    'cleanSourceAfterMeasurement': 'Off',
-                    'date': datetime.datetime.now(pytz.timezone(tzlocal.get_localzone_name())).isoformat(),
-                    'directory': os.path.split(output_path)[0],
-                    'doBaselineSub': 'false',
-                    'doSmoothing': 'false',
-                    'ejectTargetAfterMeasurement': 'false',
-                    'fragmentMass': '0.0',
-                    'geometry': geometry,
-                    'parentMass': '0.0',
-                    'stopAfterMsMeasurement': 'false',
-                    'targetID': '',
-                    'type': 'SpotList',
-                    'use1to1Preteaching': 'false',
-                    'version': '2.0',
-                    'executeExternalCalibration': 'true'}
-
-    # Update timsControl version attribute if installed on the current system.
-    if os.path.isfile('C:\\Program Files\\Bruker\\timsControl\\buildver.txt'):
-        with open('C:\\Program Files\\Bruker\\timsControl\\buildver.txt', 'r') as timscontrol_build_ver:
-            autox_attrib['appVersion'] = timscontrol_build_ver.read().strip()
-
-    # Get spot position names from selected geometry file.
-    geometree = et.parse(geometry_path)
-    position_names = [element.get('PositionName') for element in geometree.xpath('//PlateSpots//*[@PositionName]')]
-
-    # Write new AutoXecute *.run file.
-    # Generate XML tree
-    autox = et.Element('table', attrib=autox_attrib)
-    for method_name, method_path in methods.items():
-        log_info += method_path + '\n'
-        for condition, list_of_spots in conditions_dict.items():
-            spots_exist = [True if spot in position_names else False for spot in list_of_spots]
-            if any(spots_exist):
-                spot_group = et.SubElement(autox,
-                                           'spot_group',
-                                           attrib={'sampleName': f'{condition}_{os.path.splitext(os.path.split(method_path)[-1])[0]}',
-                                                   'acqMethod': method_path})
-                for spot in list_of_spots:
-                    if spot in position_names:
-                        cont = et.SubElement(spot_group,
-                                             'cont',
-                                             attrib={'Chip_on_Scout': '0',
-                                                     'Pos_on_Scout': spot,
-                                                     'acqJobMode': 'MS'})
-                    else:
-                        messages += f'{spot} not found on selected geometry and not added to the AutoXecute Sequence.\n'
-            else:
-                messages += (f'All spots for {condition} not found on selected geometry and not added to the '
-                             f'Autoxecute Sequence.\n')
-    # Write to *.run file.
-    autox_tree = et.ElementTree(autox)
-    autox_tree.write(output_path,
-                     encoding='utf-8',
-                     xml_declaration=True,
-                     pretty_print=True)
-    # Write out basic log file.
-    with open(os.path.splitext(output_path)[0] + '.log', 'w') as logfile:
-        logfile.write(log_info)
-
-    return messages
+    def __init__(self, maldi_plate_map_path, methods, output_path, geometry, geometry_path, order_params):
+        """
+        Constructor Method
+        """
+        super(AutoXecuteWorker, self).__init__()
+        self.signals = AutoXecuteWorkerSignals()
+        self.maldi_plate_map_path = maldi_plate_map_path
+        self.methods = methods
+        self.output_path = output_path
+        self.geometry = geometry
+        self.geometry_path = geometry_path
+        self.order_params = order_params
+
+    def run(self):
+        """
+        Generate the AutoXecute sequence and emit the output path, any messages, and the estimated acquisition overhead,
+        or the error if it failed.
+        """
+        try:
+            messages, overhead = write_autox_seq(parse_maldi_plate_map(self.maldi_plate_map_path),
+                                                 self.methods,
+                                                 self.output_path,
+                                                 self.geometry,
+                                                 self.geometry_path,
+                                                 **self.order_params)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+            return
+        self.signals.finished.emit(self.output_path, messages, overhead)
 
 
 class Gui(QMainWindow, Ui_MainWindow):
@@ -191,14 +122,28 @@ class Gui(QMainWindow, Ui_MainWindow):
         self.maldi_plate_map_path = ''
         self.methods = {}
         self.selected_row_from_table = ''
+        self.method_discovery_thread = None
+        self.method_discovery_worker = None
 
         # Populate dropdown with plate geometries.
         config = configparser.ConfigParser()
-        config.read(os.path.join(os.path.dirname(__file__), 'etc', 'ms1_autox_generator.cfg'))
+        config.read(CONFIG_PATH)
         self.geometry_paths = get_geometry_files(geometry_path=config['GeometryFiles']['path'].replace('/', '\\'))
         for key, value in self.geometry_paths.items():
             self.MaldiPlateGeometryCombo.addItem(key)
 
+        # Add acquisition order strategies to the Settings menu.
+        self.order_params = get_acquisition_order_params()
+        self.AcquisitionOrderMenu = self.Settings.addMenu('Acquisition Order')
+        self.AcquisitionOrderGroup = QActionGroup(self)
+        for key, value in ORDER_STRATEGIES.items():
+            action = QAction(value, self, checkable=True)
+            action.setData(key)
+            action.setChecked(key == self.order_params['order'])
+            self.AcquisitionOrderGroup.addAction(action)
+            self.AcquisitionOrderMenu.addAction(action)
+        self.AcquisitionOrderGroup.triggered.connect(self.change_acquisition_order)
+
         # Connect buttons to methods.
         self.MaldiPlateMapButton.clicked.connect(self.select_maldi_plate_map)
         self.MethodsButton.clicked.connect(self.browse_methods)
@@ -226,24 +171,46 @@ class Gui(QMainWindow, Ui_MainWindow):
                                                           'Select Directory...',
                                                           '')
         if os.path.isdir(methods_path):
-            if not methods_path.endswith('.m'):
-                methods = [os.path.join(dirpath, directory)
-                           for dirpath, dirnames, filenames in os.walk(methods_path)
-                           for directory in dirnames
-                           if directory.endswith('.m')]
-            elif methods_path.endswith('.m'):
-                methods = [methods_path]
-            methods = [i.replace('/', '\\') for i in methods]
-            old_row_count = self.MethodsTable.rowCount()
-            self.MethodsTable.setRowCount(self.MethodsTable.rowCount() + len(methods))
-            for row, i in enumerate(methods, start=old_row_count):
-                new_key = os.path.split(i)[-1]
-                if new_key in self.methods.keys():
-                    copy_count = len([i for i in self.methods.keys() if i.startswith(new_key)])
-                    new_key += f'({str(copy_count)})'
-                self.methods[new_key] = i
-                text_item = QTableWidgetItem(new_key)
-                self.MethodsTable.setItem(row, 0, text_item)
+            self.MethodsButton.setEnabled(False)
+            self.statusbar.showMessage(f'Searching for methods in {methods_path}...')
+            self.method_discovery_thread = QThread(self)
+            self.method_discovery_worker = MethodDiscoveryWorker(methods_path)
+            self.method_discovery_worker.moveToThread(self.method_discovery_thread)
+            self.method_discovery_thread.started.connect(self.method_discovery_worker.run)
+            self.method_discovery_worker.found.connect(self.add_methods)
+            self.method_discovery_worker.finished.connect(self.method_discovery_thread.quit)
+            self.method_discovery_worker.finished.connect(self.method_discovery_worker.deleteLater)
+            self.method_discovery_thread.finished.connect(self.method_discovery_thread.deleteLater)
+            self.method_discovery_thread.finished.connect(self.method_discovery_finished)
+            self.method_discovery_thread.start()
+
+    def add_methods(self, methods):
+        """
+        Add methods found by the MethodDiscoveryWorker to the Methods table.
+
+        :param methods: List of paths to methods.
+        :type methods: list[str]
+        """
+        old_row_count = self.MethodsTable.rowCount()
+        self.MethodsTable.setRowCount(self.MethodsTable.rowCount() + len(methods))
+        for row, i in enumerate(methods, start=old_row_count):
+            new_key = os.path.split(i)[-1]
+            if new_key in self.methods.keys():
+                copy_count = len([i for i in self.methods.keys() if i.startswith(new_key)])
+                new_key += f'({str(copy_count)})'
+            self.methods[new_key] = i
+            text_item = QTableWidgetItem(new_key)
+            self.MethodsTable.setItem(row, 0, text_item)
+        self.statusbar.showMessage(f'{len(self.methods)} methods loaded. Searching for more methods...')
+
+    def method_discovery_finished(self):
+        """
+        Re-enable method selection once the MethodDiscoveryWorker has finished.
+        """
+        self.method_discovery_thread = None
+        self.method_discovery_worker = None
+        self.MethodsButton.setEnabled(True)
+        self.statusbar.showMessage(f'{len(self.methods)} methods loaded.', 5000)
 
     def select_from_methods_table(self):
         """
@@ -268,17 +235,30 @@ class Gui(QMainWindow, Ui_MainWindow):
                                                                       'Select GeometryFiles Path...',
                                                                       '').replace('/', '\\')
         config = configparser.ConfigParser()
-        config.read(os.path.join(os.path.dirname(__file__), 'etc', 'ms1_autox_generator.cfg'))
+        config.read(CONFIG_PATH)
         config['GeometryFiles']['path'] = geometry_files_directory
-        with open(os.path.join(os.path.dirname(__file__),
-                               'etc',
-                               'ms1_autox_generator.cfg'),
-                  'w') as config_file:
+        with open(CONFIG_PATH, 'w') as config_file:
             config.write(config_file)
         self.geometry_paths = get_geometry_files(geometry_path=geometry_files_directory)
         for key, value in self.geometry_paths.items():
             self.MaldiPlateGeometryCombo.addItem(key)
 
+    def change_acquisition_order(self, action):
+        """
+        Change the acquisition order strategy and save it to the config file.
+
+        :param action: Selected acquisition order action from the Settings menu.
+        :type action: PySide6.QtGui.QAction
+        """
+        self.order_params['order'] = action.data()
+        config = configparser.ConfigParser()
+        config.read(CONFIG_PATH)
+        if 'AcquisitionOrder' not in config:
+            config['AcquisitionOrder'] = {}
+        config['AcquisitionOrder']['order'] = action.data()
+        with open(CONFIG_PATH, 'w') as config_file:
+            config.write(config_file)
+
     def run(self):
         """
         Generate the AutoXecute sequence.
@@ -301,27 +281,67 @@ class Gui(QMainWindow, Ui_MainWindow):
                                                     'Save AutoXecute Sequence...',
                                                     '',
                                                     filter='AutoXecute Sequence (*.run)')[0]
-            messages = write_autox_seq(parse_maldi_plate_map(self.maldi_plate_map_path),
-                                       self.methods,
-                                       outfile,
-                                       str(self.MaldiPlateGeometryCombo.currentText()),
-                                       self.geometry_paths[str(self.MaldiPlateGeometryCombo.currentText())])
-
-            # Completion dialog box and any errors.
-            finished = QMessageBox(self)
-            finished.setWindowTitle('AutoXecute Sequence Generator')
-            finished.setText(f'The following AutoXecute Sequence has been created:\n{outfile}')
-            finished.exec()
-            if messages != '':
-                messages_outfile = os.path.splitext(outfile)[0] + '.error'
-                with open(messages_outfile, 'w') as logfile:
-                    logfile.write(messages)
-                error_msg_box = QMessageBox(self)
-                error_msg_box.setWindowTitle('Error')
-                error_msg_box.setText(f'Unable to write some samples from the provided plate map whose plate '
-                                      f'coordinates were not found in the selected MALDI plate geometry. See '
-                                      f'{messages_outfile} for more details')
-                error_msg_box.exec()
+            if outfile == '':
+                return
+            worker = AutoXecuteWorker(self.maldi_plate_map_path,
+                                      dict(self.methods),
+                                      outfile,
+                                      str(self.MaldiPlateGeometryCombo.currentText()),
+                                      self.geometry_paths[str(self.MaldiPlateGeometryCombo.currentText())],
+                                      dict(self.order_params))
+            worker.signals.finished.connect(self.run_finished)
+            worker.signals.error.connect(self.run_error)
+            self.GenerateAutoXecuteButton.setEnabled(False)
+            self.statusbar.showMessage(f'Generating AutoXecute Sequence {outfile}...')
+            QThreadPool.globalInstance().start(worker)
+
+    def run_finished(self, outfile, messages, overhead):
+        """
+        Show the completion dialog box and any errors once the AutoXecuteWorker has finished.
+
+        :param outfile: Path to the *.run file that was created.
+        :type outfile: str
+        :param messages: List of messages for any missed coordinates.
+        :type messages: list[str]
+        :param overhead: Estimated method load, spot group, and stage travel overhead of the acquisition order.
+        :type overhead: dict
+        """
+        self.GenerateAutoXecuteButton.setEnabled(True)
+        self.statusbar.clearMessage()
+        # Completion dialog box and any errors.
+        finished = QMessageBox(self)
+        finished.setWindowTitle('AutoXecute Sequence Generator')
+        finished.setText(f'The following AutoXecute Sequence has been created:\n{outfile}\n\n'
+                         f'Acquisition Order: {overhead["strategy"]}\n'
+                         f'Spot Groups: {overhead["spot_groups"]}\n'
+                         f'Method Loads: {overhead["method_loads"]}\n'
+                         f'Estimated Stage Travel: {overhead["travel_distance"] / 1000:.1f} mm\n'
+                         f'Estimated Overhead: {overhead["total_time"]:.0f} s')
+        finished.exec()
+        if messages:
+            messages_outfile = os.path.splitext(outfile)[0] + '.error'
+            with open(messages_outfile, 'w') as logfile:
+                logfile.write('\n'.join(messages) + '\n')
+            error_msg_box = QMessageBox(self)
+            error_msg_box.setWindowTitle('Error')
+            error_msg_box.setText(f'Unable to write some samples from the provided plate map whose plate '
+                                  f'coordinates were not found in the selected MALDI plate geometry. See '
+                                  f'{messages_outfile} for more details')
+            error_msg_box.exec()
+
+    def run_error(self, err_msg):
+        """
+        Show an error dialog box if the AutoXecuteWorker failed.
+
+        :param err_msg: Error message.
+        :type err_msg: str
+        """
+        self.GenerateAutoXecuteButton.setEnabled(True)
+        self.statusbar.clearMessage()
+        error_msg_box = QMessageBox(self)
+        error_msg_box.setWindowTitle('Error')
+        error_msg_box.setText(f'Unable to generate the AutoXecute Sequence:\n{err_msg}')
+        error_msg_box.exec()
 
 
 def load_ui():
@@ -3,9 +3,9 @@
 
 a = Analysis(
     ['ms1_autox_generator.py'],
-    pathex=[],
+    pathex=['..'],
     binaries=[],
-    datas=[('./etc/ms1_autox_generator.cfg', 'etc')],
+    datas=[('./etc/ms1_autox_generator.cfg', 'etc'), ('../etc/acquisition_time.cfg', 'etc')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -1,37 +1,8 @@
-import os
-import gc
-import copy
-import random
-import tempfile
-import configparser
-import numpy as np
-import pandas as pd
-from lxml import etree as et
-from contextlib import redirect_stdout
-from io import StringIO
-import toml
+# The following code has been modified from pyMALDIproc and pyMALDIviz.
+# For more infromation, see: https://github.com/gtluu/pyMALDIproc
 
-import plotly.express as px
-from plotly_resampler import FigureResampler
 
-from dash import dcc, html, State, callback_context, no_update, dash_table, MATCH, ALL
-from dash_extensions.enrich import (Input, Output, DashProxy, MultiplexerTransform, Serverside,
-                                    ServersideOutputTransform, FileSystemBackend)
-import dash_bootstrap_components as dbc
-import webview
-
-import tkinter
-from tkinter.filedialog import askopenfilename, askdirectory, asksaveasfilename
-
-import plotly.graph_objects as go
-from plotly_resampler import FigureResampler
-
-from pymaldiproc.data_import import import_timstof_raw_data
-from pymaldiproc.preprocessing import get_feature_matrix
-from pymaldiviz.tmpdir import *
-from pymaldiviz.util import *
-
-from msms_autox_generator.layout import *
-from msms_autox_generator.util import *
+# Submodules are intentionally not imported here. Importing msms_autox_generator.gui should not pull in pyMALDIproc,
+# pyopenms, plotly_resampler, or pandas before the window has been shown.
 
 VERSION = '0.4.1'
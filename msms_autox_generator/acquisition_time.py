@@ -0,0 +1,379 @@
+import os
+import sqlite3
+import argparse
+import datetime
+import threading
+import configparser
+from lxml import etree as et
+from autox_geometry import METHOD_LOAD_TIME, STAGE_SPEED, get_method_load_time, get_travel_time
+from autox_geometry.overhead import ACQUISITION_TIME_CONFIG_PATH
+from msms_autox_generator.util import get_plate_geometry
+
+# Method parameter names (permname attributes in timsControl *.method files) used for the number of laser shots per
+# acquisition and the laser frequency in Hz, in order of preference.
+SHOTS_PARAMETERS = ['MALDI_NumberOfShots', 'Maldi_NumberOfShots', 'MALDI_Shots', 'Maldi_Laser_Shots', 'NumberOfShots']
+LASER_FREQUENCY_PARAMETERS = ['MALDI_LaserFrequency', 'Maldi_LaserFrequency', 'Maldi_Laser_Frequency',
+                              'LaserFrequency']
+# Method parameter names for the quadrupole isolation width in m/z used for MS/MS, in order of preference.
+ISOLATION_WIDTH_PARAMETERS = ['Quadrupole_IsolationWidth', 'MSMS_IsolationWidth', 'Maldi_IsolationWidth',
+                              'IsolationWidth']
+# Overhead parameters that are fit when calibrating from past runs.
+OVERHEAD_PARAMETERS = ['method_load_time', 'spot_overhead', 'precursor_overhead']
+
+_METHOD_PARAMS_CACHE = {}
+_METHOD_PARAMS_CACHE_LOCK = threading.Lock()
+
+
+def get_args():
+    """
+    Parse command line parameters, including required and optional parameters.
+
+    :return: Arguments with default or user specified values.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--run',
+                        help='One or more AutoXecute sequences (*.run files) to estimate the acquisition time for.',
+                        default=[],
+                        type=str,
+                        nargs='+')
+    parser.add_argument('--calibrate',
+                        help='One or more previously acquired AutoXecute sequences (*.run files) whose acquired data '
+                             'is used to calibrate the method load, spot, and precursor overheads. The calibrated '
+                             'overheads are saved to etc/acquisition_time.cfg.',
+                        default=[],
+                        type=str,
+                        nargs='+')
+
+    arguments = parser.parse_args()
+    return vars(arguments)
+
+
+def get_acquisition_time_params():
+    """
+    Parse acquisition time estimate parameters from the configuration file.
+
+    :return: Dictionary containing default shots, laser frequency, and isolation width, method load time, spot and
+        precursor overheads in seconds, and stage speed in µm per second. An isolation width of 0 means that precursors
+        are not merged for methods whose isolation width could not be read.
+    :rtype: dict
+    """
+    config = configparser.ConfigParser()
+    config.read(ACQUISITION_TIME_CONFIG_PATH)
+    return {'shots': config.getint('Method', 'shots', fallback=500),
+            'laser_frequency': config.getfloat('Method', 'laser_frequency', fallback=10000.0),
+            'isolation_width': config.getfloat('Method', 'isolation_width', fallback=0.0),
+            'method_load_time': config.getfloat('Overheads', 'method_load_time', fallback=METHOD_LOAD_TIME),
+            'spot_overhead': config.getfloat('Overheads', 'spot_overhead', fallback=1.0),
+            'precursor_overhead': config.getfloat('Overheads', 'precursor_overhead', fallback=0.5),
+            'stage_speed': config.getfloat('Overheads', 'stage_speed', fallback=STAGE_SPEED)}
+
+
+def save_acquisition_time_params(params):
+    """
+    Save calibrated overhead parameters to the configuration file.
+
+    :param params: Dictionary containing acquisition time estimate parameters.
+    :type params: dict
+    """
+    config = configparser.ConfigParser()
+    config.read(ACQUISITION_TIME_CONFIG_PATH)
+    if 'Overheads' not in config:
+        config['Overheads'] = {}
+    for key in OVERHEAD_PARAMETERS:
+        config['Overheads'][key] = str(round(params[key], 4))
+    with open(ACQUISITION_TIME_CONFIG_PATH, 'w') as config_file:
+        config.write(config_file)
+
+
+def _get_method_files(method_path):
+    """
+    List the *.method and *.xml files in a method with their modification times and sizes.
+
+    :param method_path: Path to the method (*.m directory).
+    :type method_path: str
+    :return: Tuple of file name, modification time, and size for each method file.
+    :rtype: tuple[tuple[str, float, int]]
+    """
+    method_files = []
+    if os.path.isdir(method_path):
+        for filename in sorted(os.listdir(method_path)):
+            if os.path.splitext(filename)[1].lower() not in ['.method', '.xml']:
+                continue
+            try:
+                stat = os.stat(os.path.join(method_path, filename))
+            except OSError:
+                continue
+            method_files.append((filename, stat.st_mtime, stat.st_size))
+    return tuple(method_files)
+
+
+def get_method_acquisition_params(method_path):
+    """
+    Read the number of laser shots per acquisition, the laser frequency, and the MS/MS isolation width from a timsControl
+    method (*.m directory). All *.method and *.xml files in the method are searched for the parameters. Parameters are
+    cached per method and only read again if a method file is added, removed, or modified.
+
+    :param method_path: Path to the method (*.m directory).
+    :type method_path: str
+    :return: Dictionary containing the number of shots, laser frequency, and isolation width. Parameters that could not
+        be found are None.
+    :rtype: dict
+    """
+    method_files = _get_method_files(method_path)
+    cache_key = os.path.abspath(method_path)
+    with _METHOD_PARAMS_CACHE_LOCK:
+        cached = _METHOD_PARAMS_CACHE.get(cache_key)
+        if cached is not None and cached[0] == method_files:
+            return dict(cached[1])
+    found = {}
+    for filename, _, _ in method_files:
+        try:
+            root = et.parse(os.path.join(method_path, filename), et.XMLParser(recover=True)).getroot()
+        except (OSError, et.XMLSyntaxError):
+            continue
+        if root is None:
+            continue
+        for element in root.iter():
+            name = element.get('permname')
+            if name is not None and element.get('value') is not None and name not in found:
+                found[name] = element.get('value')
+    params = {'shots': None, 'laser_frequency': None, 'isolation_width': None}
+    for key, parameters, cast in [('shots', SHOTS_PARAMETERS, int),
+                                  ('laser_frequency', LASER_FREQUENCY_PARAMETERS, float),
+                                  ('isolation_width', ISOLATION_WIDTH_PARAMETERS, float)]:
+        for parameter in parameters:
+            if parameter in found:
+                try:
+                    params[key] = cast(float(found[parameter]))
+                    break
+                except ValueError:
+                    continue
+    with _METHOD_PARAMS_CACHE_LOCK:
+        _METHOD_PARAMS_CACHE[cache_key] = (method_files, params)
+    return dict(params)
+
+
+def get_acquisition_features(autox, params, geometry=None):
+    """
+    Count the method loads, spots, acquisitions, and precursors in each spot group of an AutoXecute sequence and compute
+    the laser shot time and stage travel time. These are the quantities the acquisition time estimate is built from.
+
+    :param autox: AutoXecute sequence XML element object.
+    :param params: Dictionary containing acquisition time estimate parameters.
+    :type params: dict
+    :param geometry: Plate geometry used to estimate stage travel. If None, stage travel is not included.
+    :type geometry: autox_geometry.PlateGeometry | None
+    :return: List of dictionaries containing the features of each spot group.
+    :rtype: list[dict]
+    """
+    groups = []
+    previous_method = None
+    previous_spot = None
+    for spot_group in autox:
+        method_path = spot_group.attrib.get('acqMethod', '')
+        method_params = get_method_acquisition_params(method_path)
+        shots = method_params['shots'] or params['shots']
+        laser_frequency = method_params['laser_frequency'] or params['laser_frequency']
+        spots = 0
+        precursors = 0
+        travel_distance = 0.0
+        for cont in spot_group:
+            spot = cont.attrib.get('Pos_on_Scout')
+            if spot != previous_spot:
+                spots += 1
+                if geometry is not None and previous_spot in geometry and spot in geometry:
+                    travel_distance += geometry.get_distance(previous_spot, spot)
+                previous_spot = spot
+            if cont.attrib.get('acqJobMode') == 'MSMS':
+                precursors += 1
+        groups.append({'sampleName': spot_group.attrib.get('sampleName', ''),
+                       'acqMethod': method_path,
+                       'method_loads': int(method_path != previous_method),
+                       'spots': spots,
+                       'acquisitions': len(spot_group),
+                       'precursors': precursors,
+                       'shot_time': len(spot_group) * shots / laser_frequency,
+                       'travel_time': get_travel_time(travel_distance, params['stage_speed'])})
+        previous_method = method_path
+    return groups
+
+
+def estimate_acquisition_time(autox, params=None, geometry=None):
+    """
+    Estimate how long an AutoXecute sequence will take to acquire. Each acquisition takes the number of laser shots in
+    its method divided by the laser frequency, and overheads are added for each method load, spot, and MS/MS precursor.
+    Stage travel between spots is added if a plate geometry is given.
+
+    :param autox: AutoXecute sequence XML element object.
+    :param params: Dictionary containing acquisition time estimate parameters. Defaults to the parameters in
+        etc/acquisition_time.cfg.
+    :type params: dict | None
+    :param geometry: Plate geometry used to estimate stage travel.
+    :type geometry: autox_geometry.PlateGeometry | None
+    :return: Dictionary containing the total estimated time in seconds, the summed features, and per spot group
+        estimates.
+    :rtype: dict
+    """
+    if params is None:
+        params = get_acquisition_time_params()
+    groups = get_acquisition_features(autox, params, geometry)
+    for group in groups:
+        group['overhead_time'] = (get_method_load_time(group['method_loads'], params['method_load_time']) +
+                                  group['spots'] * params['spot_overhead'] +
+                                  group['precursors'] * params['precursor_overhead'])
+        group['total_time'] = group['shot_time'] + group['travel_time'] + group['overhead_time']
+    estimate = {key: sum(group[key] for group in groups)
+                for key in ['method_loads', 'spots', 'acquisitions', 'precursors', 'shot_time', 'travel_time',
+                            'overhead_time', 'total_time']}
+    estimate['groups'] = groups
+    return estimate
+
+
+def format_time(seconds):
+    """
+    Format a duration in seconds as hours, minutes, and seconds.
+
+    :param seconds: Duration in seconds.
+    :type seconds: float
+    :return: Formatted duration.
+    :rtype: str
+    """
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+
+def format_acquisition_time_estimate(estimate):
+    """
+    Format an acquisition time estimate for log files.
+
+    :param estimate: Acquisition time estimate from estimate_acquisition_time().
+    :type estimate: dict
+    :return: Acquisition time estimate summary followed by the estimate for each spot group.
+    :rtype: str
+    """
+    text = (f'Estimated Acquisition Time: {format_time(estimate["total_time"])}\n'
+            f'Method Loads: {estimate["method_loads"]}\n'
+            f'Spots: {estimate["spots"]}\n'
+            f'Acquisitions: {estimate["acquisitions"]}\n'
+            f'MS/MS Precursors: {estimate["precursors"]}\n'
+            f'Laser Shot Time: {format_time(estimate["shot_time"])}\n'
+            f'Stage Travel Time: {format_time(estimate["travel_time"])}\n'
+            f'Overhead Time: {format_time(estimate["overhead_time"])}\n\n')
+    for group in estimate['groups']:
+        text += f'{group["sampleName"]}: {format_time(group["total_time"])}\n'
+    return text
+
+
+def get_actual_acquisition_time(autox):
+    """
+    Obtain the actual acquisition time of a previously acquired AutoXecute sequence from the acquired data. The
+    acquisition start time and the time of the last frame are read from the analysis.tsf/analysis.tdf SQLite database of
+    each spot group's *.d directory.
+
+    :param autox: AutoXecute sequence XML element object.
+    :return: Time in seconds between the start of the first and the end of the last acquisition, or None if no acquired
+        data was found.
+    :rtype: float | None
+    """
+    starts = []
+    ends = []
+    for spot_group in autox:
+        dot_d = os.path.join(autox.attrib['directory'], spot_group.attrib['sampleName'] + '.d')
+        for filename in ['analysis.tsf', 'analysis.tdf']:
+            if os.path.isfile(os.path.join(dot_d, filename)):
+                break
+        else:
+            continue
+        connection = sqlite3.connect(f'file:{os.path.join(dot_d, filename)}?mode=ro', uri=True)
+        try:
+            start = connection.execute('SELECT Value FROM GlobalMetadata WHERE Key = ?',
+                                       ('AcquisitionDateTime',)).fetchone()
+            last_frame = connection.execute('SELECT MAX(Time) FROM Frames').fetchone()
+        except sqlite3.Error:
+            continue
+        finally:
+            connection.close()
+        if start is None or last_frame is None or last_frame[0] is None:
+            continue
+        start = datetime.datetime.fromisoformat(start[0]).timestamp()
+        starts.append(start)
+        ends.append(start + last_frame[0])
+    if not starts:
+        return None
+    return max(ends) - min(starts)
+
+
+def calibrate_acquisition_time(autox_list, params=None):
+    """
+    Fit the method load, spot, and precursor overheads to previously acquired AutoXecute sequences with a non-negative
+    least squares fit of the difference between the actual acquisition time and the laser shot and stage travel time.
+    Stage travel is estimated from the plate geometry of each sequence if it can be found. At least as many sequences
+    with acquired data as overheads are required, and the sequences must differ in their numbers of method loads,
+    spots, and precursors so that each overhead can be determined.
+
+    :param autox_list: List of previously acquired AutoXecute sequence XML element objects.
+    :type autox_list: list
+    :param params: Dictionary containing acquisition time estimate parameters. Defaults to the parameters in
+        etc/acquisition_time.cfg.
+    :type params: dict | None
+    :return: Tuple of the acquisition time estimate parameters with calibrated overheads and the number of sequences
+        with acquired data that were used for calibration.
+    :rtype: tuple[dict, int]
+    :raises ValueError: If too few sequences with acquired data were found or the overheads cannot be determined from
+        them.
+    """
+    import numpy as np
+    from scipy.optimize import nnls
+
+    if params is None:
+        params = get_acquisition_time_params()
+    features = []
+    residuals = []
+    for autox in autox_list:
+        actual = get_actual_acquisition_time(autox)
+        if actual is None:
+            continue
+        groups = get_acquisition_features(autox, params, get_plate_geometry(autox))
+        features.append([sum(group['method_loads'] for group in groups),
+                         sum(group['spots'] for group in groups),
+                         sum(group['precursors'] for group in groups)])
+        residuals.append(actual - sum(group['shot_time'] + group['travel_time'] for group in groups))
+    if len(features) < len(OVERHEAD_PARAMETERS):
+        raise ValueError(f'Acquired data was found for {len(features)} of the AutoXecute sequences provided, but at '
+                         f'least {len(OVERHEAD_PARAMETERS)} are required to calibrate the overheads.')
+    features = np.array(features, dtype=float)
+    residuals = np.array(residuals, dtype=float)
+    rank = np.linalg.lstsq(features, residuals, rcond=None)[2]
+    if rank < len(OVERHEAD_PARAMETERS):
+        raise ValueError('The overheads cannot be calibrated because the acquired AutoXecute sequences do not differ '
+                         'enough in their numbers of method loads, spots, and precursors.')
+    coefficients = nnls(features, residuals)[0]
+    calibrated = dict(params)
+    for key, coefficient in zip(OVERHEAD_PARAMETERS, coefficients):
+        calibrated[key] = float(coefficient)
+    return calibrated, len(features)
+
+
+def run():
+    """
+    Estimate acquisition times for AutoXecute sequences and/or calibrate the estimate from previously acquired runs.
+    """
+    args = get_args()
+    params = get_acquisition_time_params()
+    if args['calibrate']:
+        try:
+            params, count = calibrate_acquisition_time([et.parse(i).getroot() for i in args['calibrate']], params)
+        except ValueError as error:
+            print(f'{error} Overheads were not calibrated.')
+        else:
+            save_acquisition_time_params(params)
+            print(f'Calibrated overheads from {count} acquired AutoXecute sequences: ' +
+                  ', '.join(f'{key} = {params[key]:.3f} s' for key in OVERHEAD_PARAMETERS))
+    for autox_seq in args['run']:
+        print(f'{autox_seq}\n')
+        autox = et.parse(autox_seq).getroot()
+        print(format_acquisition_time_estimate(estimate_acquisition_time(autox, params, get_plate_geometry(autox))))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,240 @@
+import os
+import json
+import sqlite3
+import hashlib
+import datetime
+from msms_autox_generator.util import get_user_data_dir
+
+# Local library of exclusion lists stored in a SQLite database so that exclusion lists generated from blank spots can be
+# reused across plates and sessions without regenerating them.
+
+EXCLUSION_LIBRARY_PATH = os.path.join(get_user_data_dir(), 'exclusion_library.sqlite')
+# Preprocessing steps that affect exclusion list generation and are included in the preprocessing parameter hash.
+HASHED_PREPROCESSING_STEPS = ['TRIM_SPECTRUM', 'TRANSFORM_INTENSITY', 'SMOOTH_BASELINE', 'REMOVE_BASELINE',
+                              'NORMALIZE_INTENSITY', 'BIN_SPECTRUM', 'PEAK_PICKING']
+LIBRARY_COLUMNS = ['id', 'matrix', 'method', 'params_hash', 'source', 'autox_seq', 'blank_spots', 'created', 'count']
+
+
+def get_params_hash(params):
+    """
+    Get a hash of the preprocessing parameters used to generate an exclusion list. Only preprocessing steps used to
+    generate exclusion lists are included so that changes to precursor selection parameters do not change the hash.
+
+    :param params: Nested dictionaries containing preprocessing parameters for each preprocessing step.
+    :type params: dict
+    :return: First 16 characters of the SHA-256 hash of the preprocessing parameters.
+    :rtype: str
+    """
+    hashed_params = {step: params[step] for step in HASHED_PREPROCESSING_STEPS if step in params}
+    return hashlib.sha256(json.dumps(hashed_params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def get_method_key(method_paths):
+    """
+    Get the method key for an exclusion list from the paths to the methods used to acquire the blank spots.
+
+    :param method_paths: Paths to methods (*.m directories).
+    :type method_paths: list[str]
+    :return: Sorted method names separated by ";".
+    :rtype: str
+    """
+    # method paths in AutoXecute sequences are Windows paths
+    return ';'.join(sorted(set(path.replace('\\', '/').rstrip('/').split('/')[-1] for path in method_paths if path)))
+
+
+def get_exclusion_list_method(blank_spots, indexed_data, autox_path_dict):
+    """
+    Get the method key for an exclusion list generated in the current session. The methods used to acquire the blank
+    spots are used if blank spots have been marked. Otherwise, all methods in the AutoXecute sequence are used.
+
+    :param blank_spots: Blank spots marked on the plate map.
+    :type blank_spots: list[str]
+    :param indexed_data: Dictionary containing spots as keys and raw data paths as values.
+    :type indexed_data: dict
+    :param autox_path_dict: Nested dictionary containing spot group sample names, raw data paths, and method paths.
+    :type autox_path_dict: dict
+    :return: Method key from get_method_key().
+    :rtype: str
+    """
+    blank_paths = {indexed_data[spot] for spot in blank_spots if spot in indexed_data}
+    method_paths = [value['method_path'] for value in autox_path_dict.values() if value['raw_data_path'] in blank_paths]
+    if not method_paths:
+        method_paths = [value['method_path'] for value in autox_path_dict.values()]
+    return get_method_key(method_paths)
+
+
+def connect_exclusion_library(path=EXCLUSION_LIBRARY_PATH):
+    """
+    Open the exclusion library database, creating the database directory and tables if they do not exist.
+
+    :param path: Path to the exclusion library SQLite database.
+    :type path: str
+    :return: Database connection.
+    :rtype: sqlite3.Connection
+    :raises sqlite3.Error: If the database cannot be opened or created.
+    """
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    except OSError as e:
+        raise sqlite3.OperationalError(f'Exclusion library directory could not be created: {e}')
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS ExclusionLists (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                matrix TEXT NOT NULL,
+                method TEXT NOT NULL,
+                params_hash TEXT NOT NULL,
+                params TEXT NOT NULL,
+                source TEXT NOT NULL,
+                autox_seq TEXT NOT NULL,
+                blank_spots TEXT NOT NULL,
+                created TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS ExclusionListPeaks (
+                list_id INTEGER NOT NULL REFERENCES ExclusionLists(id),
+                mz REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ExclusionListKeys ON ExclusionLists (matrix, method, params_hash);
+            CREATE INDEX IF NOT EXISTS ExclusionListPeaksListId ON ExclusionListPeaks (list_id);
+        """)
+    except sqlite3.Error:
+        connection.close()
+        raise
+    return connection
+
+
+def save_exclusion_list(mz_values, matrix, method, params, source='', autox_seq='', blank_spots=None,
+                        path=EXCLUSION_LIBRARY_PATH):
+    """
+    Save an exclusion list to the exclusion library along with its provenance.
+
+    :param mz_values: Exclusion list m/z values.
+    :type mz_values: list[float]
+    :param matrix: Name of the MALDI matrix.
+    :type matrix: str
+    :param method: Method key from get_method_key().
+    :type method: str
+    :param params: Nested dictionaries containing the preprocessing parameters used to generate the exclusion list.
+    :type params: dict
+    :param source: Description of where the exclusion list came from (i.e. "Blank Spots" or "CSV").
+    :type source: str
+    :param autox_seq: Path to the AutoXecute sequence the exclusion list was generated from.
+    :type autox_seq: str
+    :param blank_spots: Blank spots used to generate the exclusion list.
+    :type blank_spots: list[str] | None
+    :param path: Path to the exclusion library SQLite database.
+    :type path: str
+    :return: ID of the saved exclusion list.
+    :rtype: int
+    """
+    connection = connect_exclusion_library(path)
+    try:
+        with connection:
+            cursor = connection.execute('INSERT INTO ExclusionLists (matrix, method, params_hash, params, source, '
+                                        'autox_seq, blank_spots, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                        (matrix,
+                                         method,
+                                         get_params_hash(params),
+                                         json.dumps(params, sort_keys=True, default=str),
+                                         source,
+                                         autox_seq,
+                                         ';'.join(blank_spots or []),
+                                         datetime.datetime.now().isoformat(timespec='seconds')))
+            list_id = cursor.lastrowid
+            connection.executemany('INSERT INTO ExclusionListPeaks (list_id, mz) VALUES (?, ?)',
+                                   [(list_id, float(mz)) for mz in mz_values])
+    finally:
+        connection.close()
+    return list_id
+
+
+def get_exclusion_lists(matrix=None, method=None, params_hash=None, path=EXCLUSION_LIBRARY_PATH):
+    """
+    Get the exclusion lists stored in the exclusion library, optionally filtered by matrix, method, and preprocessing
+    parameter hash.
+
+    :param matrix: Name of the MALDI matrix.
+    :type matrix: str | None
+    :param method: Method key from get_method_key().
+    :type method: str | None
+    :param params_hash: Preprocessing parameter hash from get_params_hash().
+    :type params_hash: str | None
+    :param path: Path to the exclusion library SQLite database.
+    :type path: str
+    :return: List of dictionaries containing the ID, matrix, method, preprocessing parameter hash, provenance, and
+        number of peaks of each exclusion list, newest first.
+    :rtype: list[dict]
+    """
+    if not os.path.isfile(path):
+        return []
+    conditions = []
+    values = []
+    for column, value in [('matrix', matrix), ('method', method), ('params_hash', params_hash)]:
+        if value is not None:
+            conditions.append(f'ExclusionLists.{column} = ?')
+            values.append(value)
+    query = ('SELECT ExclusionLists.id, matrix, method, params_hash, source, autox_seq, blank_spots, created, '
+             'COUNT(ExclusionListPeaks.mz) FROM ExclusionLists '
+             'LEFT JOIN ExclusionListPeaks ON ExclusionListPeaks.list_id = ExclusionLists.id ' +
+             (f'WHERE {" AND ".join(conditions)} ' if conditions else '') +
+             'GROUP BY ExclusionLists.id ORDER BY ExclusionLists.id DESC')
+    connection = connect_exclusion_library(path)
+    try:
+        return [dict(zip(LIBRARY_COLUMNS, row)) for row in connection.execute(query, values)]
+    finally:
+        connection.close()
+
+
+def merge_exclusion_lists(mz_lists, tolerance):
+    """
+    Merge exclusion lists, removing duplicate peaks. Peaks are clustered in order of m/z, and a peak is added to the
+    current cluster as long as the m/z range of the cluster does not exceed the tolerance. Each cluster is replaced by
+    the center of its m/z range.
+
+    :param mz_lists: Lists of exclusion list m/z values.
+    :type mz_lists: list[list[float]]
+    :param tolerance: m/z tolerance used to determine whether peaks are duplicates.
+    :type tolerance: float
+    :return: Sorted merged exclusion list m/z values.
+    :rtype: list[float]
+    """
+    mz_values = sorted(float(mz) for mz_list in mz_lists for mz in mz_list)
+    merged = []
+    cluster_start = None
+    cluster_end = None
+    for mz in mz_values:
+        if cluster_start is not None and mz - cluster_start <= tolerance:
+            cluster_end = mz
+            continue
+        if cluster_start is not None:
+            merged.append(round((cluster_start + cluster_end) / 2, 4))
+        cluster_start = mz
+        cluster_end = mz
+    if cluster_start is not None:
+        merged.append(round((cluster_start + cluster_end) / 2, 4))
+    return merged
+
+
+def load_exclusion_lists(list_ids, tolerance, path=EXCLUSION_LIBRARY_PATH):
+    """
+    Load one or more exclusion lists from the exclusion library and merge them.
+
+    :param list_ids: IDs of the exclusion lists to load.
+    :type list_ids: list[int]
+    :param tolerance: m/z tolerance used to determine whether peaks are duplicates.
+    :type tolerance: float
+    :param path: Path to the exclusion library SQLite database.
+    :type path: str
+    :return: Sorted merged exclusion list m/z values.
+    :rtype: list[float]
+    """
+    if not list_ids or not os.path.isfile(path):
+        return []
+    connection = connect_exclusion_library(path)
+    try:
+        rows = connection.execute(f'SELECT mz FROM ExclusionListPeaks WHERE list_id IN '
+                                  f'({", ".join("?" * len(list_ids))})', [int(i) for i in list_ids]).fetchall()
+    finally:
+        connection.close()
+    return merge_exclusion_lists([[row[0] for row in rows]], tolerance)
@@ -4,43 +4,138 @@
 
 import os
 import copy
+import sqlite3
 import toml
-import numpy as np
-import pandas as pd
 from lxml import etree as et
-from pymaldiproc.classes import PMP3DTdfSpectrum
-from pymaldiproc.data_import import import_timstof_raw_data
-from pymaldiproc.preprocessing import get_feature_matrix
 from pymaldiviz.tmpdir import FILE_SYSTEM_BACKEND
-from pymaldiviz.util import (blank_figure, get_spectrum, SHOWN, HIDDEN, toggle_rebin_style, toggle_apodization_style,
-                             toggle_cwt_style, toggle_snip_style, toggle_locmax_style, toggle_tophat_style,
-                             toggle_smoothing_median_style, toggle_modpoly_style, toggle_imodpoly_style,
-                             toggle_zhangfit_style, toggle_deisotope_on_style, toggle_deisotope_off_style,
-                             toggle_fast_change_style, toggle_savitzky_golay_style, toggle_removal_median_style,
-                             cleanup_file_system_backend, get_peakmap)
-from msms_autox_generator.layout import get_dashboard_layout
+from msms_autox_generator.layout import (get_startup_layout, get_dashboard_layout, get_autox_validation_modal_layout,
+                                         get_preprocessing_parameters_layout, get_run_layout)
 from msms_autox_generator.util import (get_autox_sequence_filename, get_maldi_dda_preprocessing_params,
-                                       get_geometry_format, get_autox_path_dict, get_path_name, get_rgb_color,
-                                       get_plate_map, get_plate_map_legend, get_plate_map_style)
+                                       get_path_name, get_rgb_color, get_plate_map, get_plate_map_legend,
+                                       get_plate_map_style, get_plate_geometry, optimize_spot_group_order,
+                                       merge_precursors)
+from msms_autox_generator.acquisition_time import (estimate_acquisition_time, format_acquisition_time_estimate,
+                                                   format_time, get_acquisition_time_params,
+                                                   get_method_acquisition_params)
+from msms_autox_generator.precursor_scheduler import schedule_precursors
+from msms_autox_generator.exclusion_library import (get_exclusion_list_method, get_exclusion_lists, get_params_hash,
+                                                    load_exclusion_lists, merge_exclusion_lists, save_exclusion_list)
+from msms_autox_generator.session import (AUTOSAVE_SESSION_PATH, SESSION_EXTENSION, get_session, load_session,
+                                          save_session)
+from msms_autox_generator.precursor_cache import (get_precursor_cache_key, get_cached_precursor_data,
+                                                  cache_precursor_data)
 from dash import State, callback_context, no_update, MATCH, ALL
 from dash_extensions.enrich import (Input, Output, DashProxy, MultiplexerTransform, Serverside,
                                     ServersideOutputTransform, FileSystemBackend)
 import dash_bootstrap_components as dbc
-from plotly_resampler import FigureResampler
 import tkinter
-from tkinter.filedialog import askopenfilename
-
-# get AutoXecute sequence path
-AUTOX_SEQ = get_autox_sequence_filename()
+from tkinter.filedialog import askopenfilename, asksaveasfilename
 
+# pymaldiproc, pyopenms, plotly_resampler, pandas, and numpy are imported within the callbacks that use them so that
+# the window can be shown before any of the heavy scientific modules are loaded. The AutoXecute sequence is selected
+# from within the app after the startup layout has been painted.
 app = DashProxy(prevent_initial_callbacks=True,
+                suppress_callback_exceptions=True,
                 transforms=[MultiplexerTransform(),
                             ServersideOutputTransform(backends=[FileSystemBackend(cache_dir=FILE_SYSTEM_BACKEND)])],
                 external_stylesheets=[dbc.themes.SPACELAB])
-app.layout = get_dashboard_layout(get_maldi_dda_preprocessing_params(),
-                                  get_geometry_format(et.parse(AUTOX_SEQ).getroot()),
-                                  get_autox_path_dict(AUTOX_SEQ),
-                                  AUTOX_SEQ)
+app.layout = get_startup_layout()
+# Spot index and precursor selection results of restored session snapshots by path, kept on the server until they are
+# written to their serverside stores so that they are not sent to the browser as part of the dashboard layout.
+restored_session_data = {}
+
+
+@app.callback([Output('dashboard', 'children'),
+               Output('load_autox_seq_div', 'style')],
+              Input('load_autox_seq', 'n_clicks'))
+def load_autox_sequence(n_clicks):
+    """
+    Dash callback to select the AutoXecute sequence (*.run file) and build the main dashboard layout from it.
+
+    :param n_clicks: Input signal if the load_autox_seq button is clicked.
+    :return: Tuple of the main dashboard layout and style data to hide the load_autox_seq_div div.
+    """
+    autox_seq = get_autox_sequence_filename()
+    if not autox_seq or not os.path.isfile(autox_seq):
+        return no_update, no_update
+    return get_dashboard_layout(get_maldi_dda_preprocessing_params(), autox_seq), {'display': 'none'}
+
+
+@app.callback([Output('dashboard', 'children'),
+               Output('load_autox_seq_div', 'style'),
+               Output('restore_session_error', 'children')],
+              Input('restore_session', 'n_clicks'))
+def restore_session(n_clicks):
+    """
+    Dash callback to select a saved session snapshot and rebuild the main dashboard layout from it. If the raw data has
+    not changed since the session was saved, the spot index and precursor selection results are restored and the raw
+    data is not imported again.
+
+    :param n_clicks: Input signal if the restore_session button is clicked.
+    :return: Tuple of the main dashboard layout, style data to hide the load_autox_seq_div div, and an error message.
+    """
+    main_tk_window = tkinter.Tk()
+    main_tk_window.attributes('-topmost', True, '-alpha', 0)
+    filename = askopenfilename(filetypes=[('Session Snapshot', f'*{SESSION_EXTENSION}')],
+                               initialdir=os.path.dirname(AUTOSAVE_SESSION_PATH))
+    main_tk_window.destroy()
+    if not filename or not os.path.isfile(filename):
+        return no_update, no_update, no_update
+    try:
+        session = load_session(filename)
+    except Exception as e:
+        return no_update, no_update, f'Session snapshot could not be loaded: {e}'
+    if not os.path.isfile(session['autox_seq']):
+        return no_update, no_update, f'AutoXecute sequence {session["autox_seq"]} from the session could not be found.'
+    if session.get('indexed_data') or session.get('precursor_data'):
+        session['path'] = filename
+        restored_session_data[filename] = {'indexed_data': session.get('indexed_data', {}),
+                                           'precursor_data': session.get('precursor_data', {})}
+    return (get_dashboard_layout(session['preprocessing_params'], session['autox_seq'], session),
+            {'display': 'none'},
+            '')
+
+
+@app.callback([Output('store_indexed_data', 'data'),
+               Output('store_precursor_data', 'data')],
+              Input('store_restored_session', 'data'),
+              prevent_initial_call=False)
+def load_restored_session_data(session_path):
+    """
+    Dash callback to load the spot index and precursor selection results of a restored session snapshot into their
+    serverside stores once the main dashboard has been rendered. The session snapshot is only read again if the data is
+    no longer held on the server.
+
+    :param session_path: Input signal containing the path to the restored session snapshot from store_restored_session.
+    :return: Tuple of the spot index and precursor selection results.
+    """
+    if not session_path:
+        return no_update, no_update
+    data = restored_session_data.pop(session_path, None)
+    if data is None:
+        try:
+            data = load_session(session_path)
+        except Exception:
+            return no_update, no_update
+    return Serverside(data.get('indexed_data', {})), Serverside(data.get('precursor_data', {}))
+
+
+@app.callback(Output('autox_validation_modal_body', 'children'),
+              Input('store_autox_path_dict', 'data'),
+              State('autox_validation_modal_body', 'children'),
+              prevent_initial_call=False)
+def render_autox_validation_modal_body(autox_path_dict, children):
+    """
+    Dash callback to render the AutoXecute sequence data/method validation modal window body once the main dashboard
+    has been loaded. The body is only rendered once.
+
+    :param autox_path_dict: Input signal containing data from store_autox_path_dict.
+    :param children: State signal containing the current autox_validation_modal_body children.
+    :return: List of divs containing the layout for the validation modal window.
+    """
+    if children:
+        return no_update
+    return get_autox_validation_modal_layout(autox_path_dict)
 
 
 @app.callback([Output({'type': 'raw_data_path_input', 'index': MATCH}, 'value'),
@@ -113,6 +208,8 @@ def toggle_autox_validation_modal_close(n_clicks, indexed_data, raw_data_path_in
     :param is_open: State signal to determine whether the autox_validation_modal modal window is open.
     :return: Output signal to determine whether the autox_validation_modal modal window is open.
     """
+    from pymaldiproc.data_import import import_timstof_raw_data
+
     if n_clicks:
         for i, j in zip(raw_data_path_input_valid, method_path_input_valid):
             if not i or not j:
@@ -121,8 +218,8 @@ def toggle_autox_validation_modal_close(n_clicks, indexed_data, raw_data_path_in
             data = import_timstof_raw_data(path, mode='profile')
             for spectrum in data:
                 indexed_data[spectrum.coord] = path
-        return not is_open, indexed_data
-    return is_open, indexed_data
+        return not is_open, Serverside(indexed_data)
+    return is_open, no_update
 
 
 @app.callback([Output('new_group_name_modal', 'is_open'),
@@ -206,6 +303,8 @@ def group_spots(n_clicks, spot_groups, spots, plate_map_cell_style, plate_map_da
         input value, resetting the selected and active cells in the plate_map, and containing the updated spot group
         data.
     """
+    import pandas as pd
+
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'new_group_name_modal_save.n_clicks' and new_group_name_valid and \
             new_group_name not in pd.DataFrame(plate_map_legend_data)['Category'].values.tolist():
@@ -266,6 +365,8 @@ def check_if_new_group_name_valid(input_value, state_value, plate_map_legend_dat
     :param plate_map_legend_data: State signal containing the plate map legend data.
     :return: Output signal to determine whether the new group name entered is valid or not.
     """
+    import pandas as pd
+
     if state_value != '' and state_value not in pd.DataFrame(plate_map_legend_data)['Category'].values.tolist():
         return True, False
     return False, True
@@ -433,6 +534,12 @@ def generate_exclusion_list_from_blank_spots(n_clicks, preprocessing_params, bla
     :return: Tuple of updated exclusion list data table data, style data to make the view_exclusion_list_spectra button
         visible, and data from blank_params_log.
     """
+    import numpy as np
+    import pandas as pd
+    from pymaldiproc.classes import PMP3DTdfSpectrum
+    from pymaldiproc.data_import import import_timstof_raw_data
+    from pymaldiproc.preprocessing import get_feature_matrix
+
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'generate_exclusion_list_from_blank_spots.n_clicks':
         blank_spectra = []
@@ -518,6 +625,8 @@ def view_exclusion_list_spectra(n_clicks, blank_spots, indexed_data, is_open):
         open, the list of blank spectra IDs to populate the dropdown menu options, the list of blank spectra IDs to
         populate the dropdown menu values, and a blank figure to serve as a placeholder in the modal window body.
     """
+    from pymaldiviz.util import blank_figure
+
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'view_exclusion_list_spectra.n_clicks':
         # populate dropdown menu
@@ -542,6 +651,8 @@ def close_view_exclusion_list_spectra_modal(n_clicks, is_open):
         open, the list of blank spectra IDs to populate the dropdown menu options, the list of blank spectra IDs to
         populate the dropdown menu values, and a blank figure to serve as a placeholder in the modal window body.
     """
+    from pymaldiviz.util import blank_figure
+
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'exclusion_list_blank_spectra_modal_close.n_clicks':
         return not is_open, [], [], blank_figure()
@@ -564,6 +675,9 @@ def update_blank_spectrum(value, blank_spots, blank_params_log, indexed_data):
     :param indexed_data: Input signal containing data from store_indexed_data.
     :return: Tuple of spectrum figure as a plotly.express.line plot and data store for plotly_resampler.
     """
+    from pymaldiproc.data_import import import_timstof_raw_data
+    from pymaldiviz.util import get_spectrum, cleanup_file_system_backend
+
     blank_spectra = []
     for spot in blank_spots['spots']:
         data = import_timstof_raw_data(indexed_data[spot], mode='profile')
@@ -612,6 +726,8 @@ def upload_exclusion_list_from_csv(n_clicks, exclusion_list, exclusion_list_csv_
     :return: Tuple of exclusion list data and output signal to determine whether the exclusion_list_csv_error_modal
         modal window is open.
     """
+    import pandas as pd
+
     # TODO: add compatibility for exclusion list with 1/K0 values
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'upload_exclusion_list_from_csv.n_clicks':
@@ -652,15 +768,338 @@ def clear_exclusion_list(n_clicks):
     :param n_clicks: Input signal if the clear_exclusion_list button is clicked.
     :return: Tuple of exclusion list data and style data to hide the view_exclusion_list_spectra button.
     """
+    import pandas as pd
+
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'clear_exclusion_list.n_clicks':
         return pd.DataFrame(columns=['m/z']).to_dict('records'), {'margin': '20px', 'display': 'none'}
 
 
+@app.callback(Output('save_exclusion_library_modal', 'is_open'),
+              Input('save_exclusion_list_to_library', 'n_clicks'),
+              State('save_exclusion_library_modal', 'is_open'))
+def toggle_save_exclusion_library_modal(n_clicks, is_open):
+    """
+    Dash callback to toggle the modal window for entering the matrix of an exclusion list saved to the exclusion
+    library.
+
+    :param n_clicks: Input signal if the save_exclusion_list_to_library button is clicked.
+    :param is_open: State signal to determine whether the save_exclusion_library_modal modal window is open.
+    :return: Output signal to determine whether the save_exclusion_library_modal modal window is open.
+    """
+    if n_clicks:
+        return not is_open
+    return is_open
+
+
+@app.callback([Output('save_exclusion_library_modal', 'is_open'),
+               Output('save_exclusion_library_matrix_value', 'invalid'),
+               Output('exclusion_library_error_modal', 'is_open'),
+               Output('exclusion_library_error_modal_body', 'children')],
+              Input('save_exclusion_library_save', 'n_clicks'),
+              [State('save_exclusion_library_matrix_value', 'value'),
+               State('exclusion_list', 'data'),
+               State('store_blank_params_log', 'data'),
+               State('store_preprocessing_params', 'data'),
+               State('store_autox_seq', 'data'),
+               State('store_autox_path_dict', 'data'),
+               State('store_blank_spots', 'data'),
+               State('store_indexed_data', 'data'),
+               State('save_exclusion_library_modal', 'is_open')])
+def save_exclusion_list_to_library(n_clicks, matrix, exclusion_list, blank_params_log, preprocessing_params, autox_seq,
+                                   autox_path_dict, blank_spots, indexed_data, is_open):
+    """
+    Dash callback to save the current exclusion list to the exclusion library, keyed by matrix, method, and
+    preprocessing parameter hash.
+
+    :param n_clicks: Input signal if the save_exclusion_library_save button is clicked.
+    :param matrix: State signal containing the name of the matrix entered.
+    :param exclusion_list: State signal to provide the current exclusion list data.
+    :param blank_params_log: State signal containing data from store_blank_params_log.
+    :param preprocessing_params: State signal containing data from store_preprocessing_params.
+    :param autox_seq: State signal containing data from store_autox_seq.
+    :param autox_path_dict: State signal containing data from store_autox_path_dict.
+    :param blank_spots: State signal containing data from store_blank_spots.
+    :param indexed_data: State signal containing data from store_indexed_data.
+    :param is_open: State signal to determine whether the save_exclusion_library_modal modal window is open.
+    :return: Tuple of output signal to determine whether the save_exclusion_library_modal modal window is open,
+        whether the matrix entered is invalid, whether the exclusion_library_error_modal modal window is open, and the
+        exclusion library error message.
+    """
+    if not matrix or not matrix.strip():
+        return is_open, True, False, no_update
+    # exclusion lists generated from blank spots are keyed by the parameters used to generate them
+    if blank_params_log:
+        params = blank_params_log
+        source = 'Blank Spots'
+    else:
+        params = preprocessing_params
+        source = 'Uploaded'
+    try:
+        save_exclusion_list([row['m/z'] for row in exclusion_list if row.get('m/z') is not None],
+                            matrix.strip(),
+                            get_exclusion_list_method(blank_spots['spots'], indexed_data, autox_path_dict),
+                            params,
+                            source,
+                            autox_seq,
+                            blank_spots['spots'] if blank_params_log else [])
+    except sqlite3.Error as e:
+        return not is_open, False, True, f'Exclusion list could not be saved to the exclusion library: {e}'
+    return not is_open, False, False, no_update
+
+
+@app.callback([Output('load_exclusion_library_modal', 'is_open'),
+               Output('exclusion_library_table', 'data'),
+               Output('exclusion_library_table', 'selected_rows'),
+               Output('exclusion_library_error_modal', 'is_open'),
+               Output('exclusion_library_error_modal_body', 'children')],
+              Input('load_exclusion_list_from_library', 'n_clicks'),
+              [State('store_preprocessing_params', 'data'),
+               State('store_autox_path_dict', 'data'),
+               State('store_blank_spots', 'data'),
+               State('store_indexed_data', 'data'),
+               State('load_exclusion_library_modal', 'is_open')])
+def open_load_exclusion_library_modal(n_clicks, preprocessing_params, autox_path_dict, blank_spots, indexed_data,
+                                      is_open):
+    """
+    Dash callback to open the modal window listing the exclusion lists stored in the exclusion library. Exclusion lists
+    matching the methods and preprocessing parameters of the current session are listed first.
+
+    :param n_clicks: Input signal if the load_exclusion_list_from_library button is clicked.
+    :param preprocessing_params: State signal containing data from store_preprocessing_params.
+    :param autox_path_dict: State signal containing data from store_autox_path_dict.
+    :param blank_spots: State signal containing data from store_blank_spots.
+    :param indexed_data: State signal containing data from store_indexed_data.
+    :param is_open: State signal to determine whether the load_exclusion_library_modal modal window is open.
+    :return: Tuple of output signal to determine whether the load_exclusion_library_modal modal window is open, the
+        exclusion library table data, the selected rows of the exclusion library table, whether the
+        exclusion_library_error_modal modal window is open, and the exclusion library error message.
+    """
+    method = get_exclusion_list_method(blank_spots['spots'], indexed_data, autox_path_dict)
+    params_hash = get_params_hash(preprocessing_params)
+    try:
+        exclusion_lists = get_exclusion_lists()
+    except sqlite3.Error as e:
+        return is_open, no_update, no_update, True, f'Exclusion library could not be opened: {e}'
+    for exclusion_list in exclusion_lists:
+        exclusion_list['match'] = ('Yes' if exclusion_list['method'] == method and
+                                   exclusion_list['params_hash'] == params_hash else 'No')
+    exclusion_lists = sorted(exclusion_lists, key=lambda x: x['match'] != 'Yes')
+    return not is_open, exclusion_lists, [], False, no_update
+
+
+@app.callback([Output('exclusion_list', 'data'),
+               Output('load_exclusion_library_modal', 'is_open'),
+               Output('exclusion_library_error_modal', 'is_open'),
+               Output('exclusion_library_error_modal_body', 'children')],
+              Input('load_exclusion_library_load', 'n_clicks'),
+              [State('exclusion_library_table', 'data'),
+               State('exclusion_library_table', 'selected_rows'),
+               State('exclusion_list', 'data'),
+               State('store_preprocessing_params', 'data'),
+               State('load_exclusion_library_modal', 'is_open')])
+def load_exclusion_lists_from_library(n_clicks, library_data, selected_rows, exclusion_list, preprocessing_params,
+                                      is_open):
+    """
+    Dash callback to load the selected exclusion lists from the exclusion library and merge them with the current
+    exclusion list. Peaks within the exclusion list tolerance of each other are merged.
+
+    :param n_clicks: Input signal if the load_exclusion_library_load button is clicked.
+    :param library_data: State signal containing the exclusion library table data.
+    :param selected_rows: State signal containing the indices of the selected rows in the exclusion library table.
+    :param exclusion_list: State signal to provide the current exclusion list data.
+    :param preprocessing_params: State signal containing data from store_preprocessing_params.
+    :param is_open: State signal to determine whether the load_exclusion_library_modal modal window is open.
+    :return: Tuple of exclusion list data, output signal to determine whether the load_exclusion_library_modal modal
+        window is open, whether the exclusion_library_error_modal modal window is open, and the exclusion library error
+        message.
+    """
+    if not selected_rows:
+        return exclusion_list, not is_open, False, no_update
+    tolerance = preprocessing_params['PRECURSOR_SELECTION']['exclusion_list_tolerance']
+    try:
+        library_mz = load_exclusion_lists([library_data[i]['id'] for i in selected_rows], tolerance)
+    except sqlite3.Error as e:
+        return exclusion_list, not is_open, True, f'Exclusion lists could not be loaded from the exclusion library: {e}'
+    current_mz = [row['m/z'] for row in exclusion_list if row.get('m/z') is not None]
+    return ([{'m/z': mz} for mz in merge_exclusion_lists([library_mz, current_mz], tolerance)],
+            not is_open,
+            False,
+            no_update)
+
+
+@app.callback(Output('exclusion_library_error_modal', 'is_open'),
+              Input('exclusion_library_error_modal_close', 'n_clicks'),
+              State('exclusion_library_error_modal', 'is_open'))
+def toggle_exclusion_library_error_modal(n_clicks, is_open):
+    """
+    Dash callback to toggle the exclusion library error message modal window.
+
+    :param n_clicks: Input signal if the exclusion_library_error_modal_close button is clicked.
+    :param is_open: State signal to determine whether the exclusion_library_error_modal modal window is open.
+    :return: Output signal to determine whether the exclusion_library_error_modal modal window is open.
+    """
+    if n_clicks:
+        return not is_open
+    return is_open
+
+
+@app.callback(Output('save_session', 'n_clicks'),
+              Input('save_session', 'n_clicks'),
+              [State('store_autox_seq', 'data'),
+               State('store_autox_path_dict', 'data'),
+               State('store_preprocessing_params', 'data'),
+               State('plate_map', 'style_data_conditional'),
+               State('plate_map_legend', 'data'),
+               State('plate_map_legend', 'style_data_conditional'),
+               State('store_blank_spots', 'data'),
+               State('store_spot_groups', 'data'),
+               State('exclusion_list', 'data'),
+               State('store_blank_params_log', 'data'),
+               State('store_sample_params_log', 'data'),
+               State('store_indexed_data', 'data'),
+               State('store_precursor_data', 'data')])
+def save_session_snapshot(n_clicks, autox_seq, autox_path_dict, preprocessing_params, plate_map_style,
+                          plate_map_legend_data, plate_map_legend_style, blank_spots, spot_groups, exclusion_list,
+                          blank_params_log, sample_params_log, indexed_data, precursor_data):
+    """
+    Dash callback to save the current session to a session snapshot file selected by the user.
+
+    :param n_clicks: Input signal if the save_session button is clicked.
+    :param autox_seq: State signal containing data from store_autox_seq.
+    :param autox_path_dict: State signal containing data from store_autox_path_dict.
+    :param preprocessing_params: State signal containing data from store_preprocessing_params.
+    :param plate_map_style: State signal containing the current style of the cells in the plate map.
+    :param plate_map_legend_data: State signal containing the plate map legend data.
+    :param plate_map_legend_style: State signal containing the current style of the cells in the plate map legend.
+    :param blank_spots: State signal containing data from store_blank_spots.
+    :param spot_groups: State signal containing data from store_spot_groups.
+    :param exclusion_list: State signal to provide the current exclusion list data.
+    :param blank_params_log: State signal containing data from store_blank_params_log.
+    :param sample_params_log: State signal containing data from store_sample_params_log.
+    :param indexed_data: State signal containing data from store_indexed_data.
+    :param precursor_data: State signal containing data from store_precursor_data.
+    :return: Unchanged n_clicks.
+    """
+    main_tk_window = tkinter.Tk()
+    main_tk_window.attributes('-topmost', True, '-alpha', 0)
+    filename = asksaveasfilename(filetypes=[('Session Snapshot', f'*{SESSION_EXTENSION}')],
+                                 defaultextension=SESSION_EXTENSION,
+                                 initialfile=os.path.splitext(os.path.split(autox_seq)[-1])[0] + SESSION_EXTENSION)
+    main_tk_window.destroy()
+    if filename:
+        save_session(filename, get_session(autox_seq, autox_path_dict, preprocessing_params, plate_map_style,
+                                           plate_map_legend_data, plate_map_legend_style, blank_spots, spot_groups,
+                                           exclusion_list, blank_params_log, sample_params_log, indexed_data,
+                                           precursor_data))
+    return no_update
+
+
+@app.callback(Output('session_autosave_interval', 'disabled'),
+              [Input('store_preprocessing_params', 'modified_timestamp'),
+               Input('store_blank_spots', 'modified_timestamp'),
+               Input('store_spot_groups', 'modified_timestamp'),
+               Input('exclusion_list', 'data'),
+               Input('store_blank_params_log', 'modified_timestamp'),
+               Input('store_sample_params_log', 'modified_timestamp'),
+               Input('store_indexed_data', 'modified_timestamp'),
+               Input('store_precursor_data', 'modified_timestamp')])
+def schedule_session_autosave(preprocessing_params_timestamp, blank_spots_timestamp, spot_groups_timestamp,
+                              exclusion_list, blank_params_log_timestamp, sample_params_log_timestamp,
+                              indexed_data_timestamp, precursor_data_timestamp):
+    """
+    Dash callback to mark the session as changed by starting the autosave interval. Only the modification timestamps
+    of the stores are used so that the session data is not sent to the server on every change.
+
+    :param preprocessing_params_timestamp: Input signal containing the modification time of store_preprocessing_params.
+    :param blank_spots_timestamp: Input signal containing the modification time of store_blank_spots.
+    :param spot_groups_timestamp: Input signal containing the modification time of store_spot_groups.
+    :param exclusion_list: Input signal to provide the current exclusion list data.
+    :param blank_params_log_timestamp: Input signal containing the modification time of store_blank_params_log.
+    :param sample_params_log_timestamp: Input signal containing the modification time of store_sample_params_log.
+    :param indexed_data_timestamp: Input signal containing the modification time of store_indexed_data.
+    :param precursor_data_timestamp: Input signal containing the modification time of store_precursor_data.
+    :return: Output signal to enable the session_autosave_interval interval.
+    """
+    return False
+
+
+@app.callback([Output('store_session_autosave', 'data'),
+               Output('session_autosave_interval', 'disabled')],
+              Input('session_autosave_interval', 'n_intervals'),
+              [State('store_autox_seq', 'data'),
+               State('store_autox_path_dict', 'data'),
+               State('store_preprocessing_params', 'data'),
+               State('plate_map', 'style_data_conditional'),
+               State('plate_map_legend', 'data'),
+               State('plate_map_legend', 'style_data_conditional'),
+               State('store_blank_spots', 'data'),
+               State('store_spot_groups', 'data'),
+               State('exclusion_list', 'data'),
+               State('store_blank_params_log', 'data'),
+               State('store_sample_params_log', 'data'),
+               State('store_indexed_data', 'data'),
+               State('store_precursor_data', 'data')])
+def autosave_session_snapshot(n_intervals, autox_seq, autox_path_dict, preprocessing_params, plate_map_style,
+                              plate_map_legend_data, plate_map_legend_style, blank_spots, spot_groups, exclusion_list,
+                              blank_params_log, sample_params_log, indexed_data, precursor_data):
+    """
+    Dash callback to save the current session to the autosave session snapshot once the autosave interval has passed
+    since the session changed, so that the session can be restored if the window is closed or crashes. All changes made
+    during the interval are saved at once, and the interval is stopped until the session changes again.
+
+    :param n_intervals: Input signal containing the number of times the session_autosave_interval interval has passed.
+    :param autox_seq: State signal containing data from store_autox_seq.
+    :param autox_path_dict: State signal containing data from store_autox_path_dict.
+    :param preprocessing_params: State signal containing data from store_preprocessing_params.
+    :param plate_map_style: State signal containing the current style of the cells in the plate map.
+    :param plate_map_legend_data: State signal containing the plate map legend data.
+    :param plate_map_legend_style: State signal containing the current style of the cells in the plate map legend.
+    :param blank_spots: State signal containing data from store_blank_spots.
+    :param spot_groups: State signal containing data from store_spot_groups.
+    :param exclusion_list: State signal to provide the current exclusion list data.
+    :param blank_params_log: State signal containing data from store_blank_params_log.
+    :param sample_params_log: State signal containing data from store_sample_params_log.
+    :param indexed_data: State signal containing data from store_indexed_data.
+    :param precursor_data: State signal containing data from store_precursor_data.
+    :return: Tuple of the path to the autosave session snapshot or an empty string if it could not be saved and output
+        signal to disable the session_autosave_interval interval.
+    """
+    try:
+        save_session(AUTOSAVE_SESSION_PATH, get_session(autox_seq, autox_path_dict, preprocessing_params,
+                                                        plate_map_style, plate_map_legend_data, plate_map_legend_style,
+                                                        blank_spots, spot_groups, exclusion_list, blank_params_log,
+                                                        sample_params_log, indexed_data, precursor_data))
+    except OSError:
+        return '', True
+    return AUTOSAVE_SESSION_PATH, True
+
+
+@app.callback([Output('edit_processing_parameters_modal_body', 'children'),
+               Output('edit_processing_parameters_modal', 'is_open')],
+              Input('edit_preprocessing_parameters', 'n_clicks'),
+              [State('edit_processing_parameters_modal_body', 'children'),
+               State('store_preprocessing_params', 'data')])
+def open_edit_preprocessing_parameters_modal(n_clicks, children, preprocessing_params):
+    """
+    Dash callback to open the preprocessing parameters modal window. The modal window body is rendered from the
+    preprocessing parameters saved in the dcc.Store store_preprocessing_params the first time it is opened and reused
+    afterwards.
+
+    :param n_clicks: Input signal if the edit_preprocessing_parameters button is clicked.
+    :param children: State signal containing the current edit_processing_parameters_modal_body children.
+    :param preprocessing_params: State signal containing data from store_preprocessing_params.
+    :return: Tuple of the preprocessing parameters modal window body and output signal to open the
+        edit_preprocessing_parameters_modal modal window.
+    """
+    if children:
+        return no_update, True
+    return get_preprocessing_parameters_layout(preprocessing_params), True
+
+
 @app.callback([Output('edit_processing_parameters_modal', 'is_open'),
                Output('store_preprocessing_params', 'data')],
-              [Input('edit_preprocessing_parameters', 'n_clicks'),
-               Input('edit_processing_parameters_save', 'n_clicks'),
+              [Input('edit_processing_parameters_save', 'n_clicks'),
                Input('edit_processing_parameters_cancel', 'n_clicks'),
                Input('trim_spectrum_checkbox', 'value'),
                Input('trim_spectrum_lower_mass_range_value', 'value'),
@@ -721,8 +1160,7 @@ def clear_exclusion_list(n_clicks):
                Input('precursor_selection_exclusion_list_tolerance_value', 'value'),
                Input('store_preprocessing_params', 'data')],
               State('edit_processing_parameters_modal', 'is_open'))
-def toggle_edit_preprocessing_parameters_modal(n_clicks_button,
-                                               n_clicks_save,
+def toggle_edit_preprocessing_parameters_modal(n_clicks_save,
                                                n_clicks_cancel,
                                                trim_spectrum_checkbox,
                                                trim_spectrum_lower_mass_range,
@@ -784,11 +1222,9 @@ def toggle_edit_preprocessing_parameters_modal(n_clicks_button,
                                                preprocessing_params,
                                                is_open):
     """
-    Dash callback to toggle the preprocessing parameters modal window, populate the current preprocessing parameters
-    saved in the dcc.Store store_preprocessing_params, and save any modified preprocessing parameters to
-    store_preprocessing_params if the Save button is clicked.
+    Dash callback to close the preprocessing parameters modal window and save any modified preprocessing parameters to
+    the dcc.Store store_preprocessing_params if the Save button is clicked.
 
-    :param n_clicks_button: Input signal if the edit_preprocessing_parameters button is clicked.
     :param n_clicks_save: Input signal if the edit_preprocessing_parameters_save button is clicked.
     :param n_clicks_cancel: Input signal if the edit_preprocessing_parameters_cancel button is clicked.
     :param trim_spectrum_checkbox: Whether to perform spectrum trimming during preprocessing.
@@ -888,8 +1324,7 @@ def toggle_edit_preprocessing_parameters_modal(n_clicks_button,
         signal containing data from store_preprocessing_params.
     """
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
-    if (changed_id == 'edit_preprocessing_parameters.n_clicks' or
-            changed_id == 'edit_processing_parameters_save.n_clicks' or
+    if (changed_id == 'edit_processing_parameters_save.n_clicks' or
             changed_id == 'edit_processing_parameters_cancel.n_clicks'):
         if changed_id == 'edit_processing_parameters_save.n_clicks':
             preprocessing_params['TRIM_SPECTRUM']['run'] = trim_spectrum_checkbox
@@ -975,7 +1410,8 @@ def toggle_edit_processing_parameters_saved_modal(n_clicks_save, n_clicks_close,
 @app.callback([Output('trim_spectrum_lower_mass_range', 'style'),
                Output('trim_spectrum_upper_mass_range', 'style')],
               [Input('edit_preprocessing_parameters', 'n_clicks'),
-               Input('trim_spectrum_checkbox', 'value')])
+               Input('trim_spectrum_checkbox', 'value')],
+              prevent_initial_call=False)
 def toggle_trim_spectrum_parameters(n_clicks, value):
     """
     Dash callback to toggle whether spectrum trimming parameters are visible depending on whether spectrum trimming is
@@ -985,6 +1421,8 @@ def toggle_trim_spectrum_parameters(n_clicks, value):
     :param value: Input signal to determine whether spectrum trimming is enabled or disabled.
     :return: List of dictionaries containing style template to show or hide parameters.
     """
+    from pymaldiviz.util import SHOWN, HIDDEN
+
     if value:
         return [copy.deepcopy(SHOWN),
                 copy.deepcopy(SHOWN)]
@@ -996,7 +1434,8 @@ def toggle_trim_spectrum_parameters(n_clicks, value):
 @app.callback([Output('transform_intensity_method_label', 'style'),
                Output('transform_intensity_method', 'style')],
               [Input('edit_preprocessing_parameters', 'n_clicks'),
-               Input('transform_intensity_checkbox', 'value')])
+               Input('transform_intensity_checkbox', 'value')],
+              prevent_initial_call=False)
 def toggle_transform_intensity_parameters(n_clicks, value):
     """
     Dash callback to toggle whether intensity transformation parameters are visible depending on whether intensity
@@ -1006,6 +1445,8 @@ def toggle_transform_intensity_parameters(n_clicks, value):
     :param value: Input signal to determine whether intensity transformation is enabled or disabled.
     :return: List of dictionaries containing style template to show or hide parameters.
     """
+    from pymaldiviz.util import SHOWN, HIDDEN
+
     if value:
         return [copy.deepcopy(SHOWN),
                 copy.deepcopy(SHOWN)]
@@ -1022,7 +1463,8 @@ def toggle_transform_intensity_parameters(n_clicks, value):
                Output('smooth_baseline_diff_thresh', 'style')],
               [Input('edit_preprocessing_parameters', 'n_clicks'),
                Input('smooth_baseline_checkbox', 'value'),
-               Input('smooth_baseline_method', 'value')])
+               Input('smooth_baseline_method', 'value')],
+              prevent_initial_call=False)
 def toggle_smooth_baseline_method_parameters(n_clicks, smooth_baseline_checkbox, smooth_baseline_method):
     """
     Dash callback to toggle whether baseline smoothing parameters are visible depending on whether baseline smoothing
@@ -1035,6 +1477,9 @@ def toggle_smooth_baseline_method_parameters(n_clicks, smooth_baseline_checkbox,
     :param smooth_baseline_method: Input signal to obtain the currently selected baseline smoothing method.
     :return: List of dictionaries containing style template to show or hide parameters.
     """
+    from pymaldiviz.util import (SHOWN, HIDDEN, toggle_savitzky_golay_style, toggle_apodization_style,
+                                 toggle_rebin_style, toggle_fast_change_style, toggle_smoothing_median_style)
+
     if smooth_baseline_checkbox:
         if smooth_baseline_method == 'SavitzkyGolay':
             return [copy.deepcopy(SHOWN), copy.deepcopy(SHOWN)] + toggle_savitzky_golay_style()
@@ -1073,7 +1518,8 @@ def toggle_smooth_baseline_method_parameters(n_clicks, smooth_baseline_checkbox,
                Output('remove_baseline_gradient', 'style')],
               [Input('edit_preprocessing_parameters', 'n_clicks'),
                Input('remove_baseline_checkbox', 'value'),
-               Input('remove_baseline_method', 'value')])
+               Input('remove_baseline_method', 'value')],
+              prevent_initial_call=False)
 def toggle_remove_baseline_method_parameters(n_clicks, remove_baseline_checkbox, remove_baseline_method):
     """
     Dash callback to toggle whether baseline removal parameters are visible depending on whether baseline removal
@@ -1086,6 +1532,9 @@ def toggle_remove_baseline_method_parameters(n_clicks, remove_baseline_checkbox,
     :param remove_baseline_method: Input signal to obtain the currently selected baseline removal method.
     :return: List of dictionaries containing style template to show or hide parameters.
     """
+    from pymaldiviz.util import (SHOWN, HIDDEN, toggle_snip_style, toggle_tophat_style, toggle_removal_median_style,
+                                 toggle_zhangfit_style, toggle_modpoly_style, toggle_imodpoly_style)
+
     if remove_baseline_checkbox:
         if remove_baseline_method == 'SNIP':
             return [copy.deepcopy(SHOWN), copy.deepcopy(SHOWN)] + toggle_snip_style()
@@ -1121,7 +1570,8 @@ def toggle_remove_baseline_method_parameters(n_clicks, remove_baseline_checkbox,
 @app.callback([Output('normalize_intensity_method_label', 'style'),
                Output('normalize_intensity_method', 'style')],
               [Input('edit_preprocessing_parameters', 'n_clicks'),
-               Input('normalize_intensity_checkbox', 'value')])
+               Input('normalize_intensity_checkbox', 'value')],
+              prevent_initial_call=False)
 def toggle_normalize_intensity_parameters(n_clicks, value):
     """
     Dash callback to toggle whether intensity normalization parameters are visible depending on whether intensity
@@ -1131,6 +1581,8 @@ def toggle_normalize_intensity_parameters(n_clicks, value):
     :param value: Input signal to determine whether intensity normalization is enabled or disabled.
     :return: List of dictionaries containing style template to show or hide parameters.
     """
+    from pymaldiviz.util import SHOWN, HIDDEN
+
     if value:
         return [copy.deepcopy(SHOWN),
                 copy.deepcopy(SHOWN)]
@@ -1143,7 +1595,8 @@ def toggle_normalize_intensity_parameters(n_clicks, value):
                Output('bin_spectrum_lower_mass_range', 'style'),
                Output('bin_spectrum_upper_mass_range', 'style')],
               [Input('edit_preprocessing_parameters', 'n_clicks'),
-               Input('bin_spectrum_checkbox', 'value')])
+               Input('bin_spectrum_checkbox', 'value')],
+              prevent_initial_call=False)
 def toggle_bin_spectrum_parameters(n_clicks, value):
     """
     Dash callback to toggle whether spectrum binning parameters are visible depending on whether spectrum binning is
@@ -1153,6 +1606,8 @@ def toggle_bin_spectrum_parameters(n_clicks, value):
     :param value: Input signal to determine whether spectrum binning is enabled or disabled.
     :return: List of dictionaries containing style template to show or hide parameters.
     """
+    from pymaldiviz.util import SHOWN, HIDDEN
+
     if value:
         return [copy.deepcopy(SHOWN),
                 copy.deepcopy(SHOWN),
@@ -1166,7 +1621,8 @@ def toggle_bin_spectrum_parameters(n_clicks, value):
 @app.callback([Output('peak_picking_snr', 'style'),
                Output('peak_picking_widths', 'style')],
               [Input('edit_preprocessing_parameters', 'n_clicks'),
-               Input('peak_picking_method', 'value')])
+               Input('peak_picking_method', 'value')],
+              prevent_initial_call=False)
 def toggle_peak_picking_method_parameters(n_clicks, value):
     """
     Dash callback to toggle which peak picking parameters are visible depending on the peak picking method selected in
@@ -1176,6 +1632,8 @@ def toggle_peak_picking_method_parameters(n_clicks, value):
     :param value: Input signal to obtain the currently selected peak picking method.
     :return: List of dictionaries containing style template to show or hide parameters.
     """
+    from pymaldiviz.util import toggle_locmax_style, toggle_cwt_style
+
     if value == 'locmax':
         return toggle_locmax_style()
     elif value == 'cwt':
@@ -1197,7 +1655,8 @@ def toggle_peak_picking_method_parameters(n_clicks, value):
                Output('peak_picking_deisotope_start_intensity_check', 'style'),
                Output('peak_picking_deisotope_add_up_intensity', 'style')],
               [Input('edit_preprocessing_parameters', 'n_clicks'),
-               Input('peak_picking_deisotope', 'value')])
+               Input('peak_picking_deisotope', 'value')],
+              prevent_initial_call=False)
 def toggle_peak_picking_deisotope_parameters(n_clicks, value):
     """
     Dash callback to toggle whether deisotoping parameters are visible.
@@ -1206,6 +1665,8 @@ def toggle_peak_picking_deisotope_parameters(n_clicks, value):
     :param value: Input signal to obtain the current status of whether deisotoping is enabled or disabled.
     :return: List of dictionaries containing style template to show or hide parameters.
     """
+    from pymaldiviz.util import toggle_deisotope_on_style, toggle_deisotope_off_style
+
     if value:
         return toggle_deisotope_on_style()
     elif not value:
@@ -1235,7 +1696,9 @@ def preview_precursor_list(n_clicks,
     """
     Dash callback to preprocess sample spectra based on current preprocessing parameters and view the spectra in a
     modal window. In the modal window, going Back will reset and undo all preprocessing, while continuing to generate
-    the MS/MS AutoXecute sequences closes the preview_precursor_list_modal modal window.
+    the MS/MS AutoXecute sequences closes the preview_precursor_list_modal modal window. Precursor selection results
+    are cached by raw data fingerprints, blank spots, spot groups, preprocessing parameters, and exclusion list, and
+    are reused without processing the raw data if none of these have changed.
 
     :param n_clicks: Input signal if the preview_precursor_list button is clicked.
     :param preprocessing_params: Input signal containing data from store_preprocessing_params.
@@ -1248,8 +1711,24 @@ def preview_precursor_list(n_clicks,
         list of spectra IDs to populate the dropdown menu options, the list of spectra IDs to populate the dropdown
         menu values, and a blank figure to serve as a placeholder in the modal window body.
     """
+    import numpy as np
+    import pandas as pd
+    from pymaldiproc.classes import PMP3DTdfSpectrum
+    from pymaldiproc.data_import import import_timstof_raw_data
+    from pymaldiproc.preprocessing import get_feature_matrix
+    from pymaldiviz.util import blank_figure
+
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'preview_precursor_list.n_clicks':
+        # populate dropdown menu
+        dropdown_options = [{'label': i, 'value': i} for i in indexed_data.keys() if i not in blank_spots['spots']]
+        dropdown_value = [i for i in indexed_data.keys() if i not in blank_spots['spots']]
+        cache_key = get_precursor_cache_key(indexed_data, blank_spots['spots'], spot_groups, preprocessing_params,
+                                            exclusion_list)
+        cached = get_cached_precursor_data(cache_key)
+        if cached is not None:
+            return (not is_open, dropdown_options, dropdown_value, blank_figure(), cached['sample_params_log'],
+                    Serverside(cached['precursor_data']))
         spectra = {}
         precursor_data = {}
         for spot in indexed_data.keys():
@@ -1440,10 +1919,9 @@ def preview_precursor_list(n_clicks,
                         precursor_data[key]['peak_picked_mz_array'] = copy.deepcopy(spectra[key].peak_picked_mz_array)
                         precursor_data[key]['peak_picked_intensity_array'] = copy.deepcopy(spectra[key].peak_picked_intensity_array)
                         precursor_data[key]['peak_picking_indices'] = copy.deepcopy(spectra[key].peak_picking_indices)
-        # populate dropdown menu
-        dropdown_options = [{'label': i, 'value': i} for i in indexed_data.keys() if i not in blank_spots['spots']]
-        dropdown_value = [i for i in indexed_data.keys() if i not in blank_spots['spots']]
-        return not is_open, dropdown_options, dropdown_value, blank_figure(), sample_params_log, precursor_data
+        cache_precursor_data(cache_key, precursor_data, sample_params_log)
+        return (not is_open, dropdown_options, dropdown_value, blank_figure(), sample_params_log,
+                Serverside(precursor_data))
 
 
 @app.callback([Output('preview_precursor_list_modal', 'is_open'),
@@ -1466,6 +1944,8 @@ def close_preview_precursor_list_modal(n_clicks, is_open):
         list of spectra IDs to populate the dropdown menu options, the list of spectra IDs to populate the dropdown
         menu values, and a blank figure to serve as a placeholder in the modal window body.
     """
+    from pymaldiviz.util import blank_figure
+
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'preview_precursor_list_modal_back.n_clicks':
         return not is_open, [], [], blank_figure(), {}, {}
@@ -1492,11 +1972,32 @@ def preview_precursor_list_proceed_with_run(n_clicks, preview_is_open, run_is_op
         list of spectra IDs to populate the dropdown menu options, the list of spectra IDs to populate the dropdown
         menu values, and a blank figure to serve as a placeholder in the modal window body.
     """
+    from pymaldiviz.util import blank_figure
+
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'preview_precursor_list_modal_run.n_clicks':
         return not preview_is_open, not run_is_open, [], [], blank_figure()
 
 
+@app.callback(Output('run_modal_body', 'children'),
+              Input('preview_precursor_list_modal_run', 'n_clicks'),
+              [State('run_modal_body', 'children'),
+               State('store_autox_seq', 'data')])
+def render_run_modal_body(n_clicks, children, autox_seq):
+    """
+    Dash callback to render the MS/MS AutoXecute generation parameters modal window body the first time the run_modal
+    modal window is opened. The body is reused afterwards.
+
+    :param n_clicks: Input signal if the preview_precursor_list_modal_run button is clicked.
+    :param children: State signal containing the current run_modal_body children.
+    :param autox_seq: State signal containing data from store_autox_seq.
+    :return: List of divs containing the layout for the MS/MS AutoXecute generation parameters modal window.
+    """
+    if children:
+        return no_update
+    return get_run_layout(et.parse(autox_seq).getroot().attrib['directory'])
+
+
 @app.callback([Output('preview_figure', 'figure'),
                Output('store_plot', 'data')],
               [Input('preview_id', 'value'),
@@ -1514,6 +2015,11 @@ def update_preview_spectrum(value, indexed_data, sample_params_log, precursor_da
     :param precursor_data: Input signal containing data from store_precursor_data.
     :return: Tuple of spectrum figure as a plotly.express.line plot and data store for plotly_resampler.
     """
+    import pandas as pd
+    from pymaldiproc.classes import PMP3DTdfSpectrum
+    from pymaldiproc.data_import import import_timstof_raw_data
+    from pymaldiviz.util import get_spectrum, get_peakmap, cleanup_file_system_backend
+
     data = import_timstof_raw_data(indexed_data[value], mode='profile')
     spectrum = [i for i in data if i.coord == value][0]
     # preprocessing
@@ -1558,7 +2064,8 @@ def update_preview_spectrum(value, indexed_data, sample_params_log, precursor_da
 
 
 @app.callback([Output('run_modal', 'is_open'),
-               Output('run_success_modal', 'is_open')],
+               Output('run_success_modal', 'is_open'),
+               Output('run_success_modal_body', 'children')],
               [Input('run_button', 'n_clicks'),
                Input('store_blank_params_log', 'data'),
                Input('store_sample_params_log', 'data'),
@@ -1571,10 +2078,14 @@ def update_preview_spectrum(value, indexed_data, sample_params_log, precursor_da
                State('run_output_directory_value', 'value'),
                State('run_method_value', 'value'),
                State('run_method_checkbox', 'value'),
+               State('run_route_checkbox', 'value'),
+               State('run_budget_checkbox', 'value'),
+               State('run_budget_value', 'value'),
+               State('store_spot_groups', 'data'),
                State('exclusion_list', 'data')])
 def generate_msms_autox_sequence(n_clicks, blank_params_log, sample_params_log, autox_seq, autox_path_dict, blank_spots,
                                  precursor_data, run_is_open, success_is_open, outdir, method, method_checkbox,
-                                 exclusion_list):
+                                 route_checkbox, budget_checkbox, budget, spot_groups, exclusion_list):
     """
     Dash callback to toggle the run_modal modal window and create the new MS/MS AutoXecute sequence. A new modal window
     displaying a success message and the output directory of the resulting AutoXecute sequence will be shown upon
@@ -1594,10 +2105,17 @@ def generate_msms_autox_sequence(n_clicks, blank_params_log, sample_params_log,
     :param method: Path to the new Bruker .m directory to be used in the AutoXecute sequence.
     :param method_checkbox: Whether to use user specified Bruker .m directory method file or to use the original
         methods in the new AutoXecute sequence.
+    :param route_checkbox: Whether to reorder spots in the new AutoXecute sequence to minimize stage travel.
+    :param budget_checkbox: Whether to limit the MS/MS precursors in the new AutoXecute sequence to an acquisition time
+        budget.
+    :param budget: Acquisition time budget in hours.
+    :param spot_groups: State signal containing data from store_spot_groups.
     :param exclusion_list: State signal to provide the current exclusion list data.
-    :return: Tuple of output signal to determine whether the run_modal modal window is open and output signal to
-        determine whether the run_modal_success modal window is open.
+    :return: Tuple of output signal to determine whether the run_modal modal window is open, output signal to
+        determine whether the run_modal_success modal window is open, and the run_success_modal body.
     """
+    import pandas as pd
+
     changed_id = [i['prop_id'] for i in callback_context.triggered][0]
     if changed_id == 'run_button.n_clicks':
         log = 'fleX MS/MS AutoXecute Generator Log\n\n'
@@ -1605,6 +2123,9 @@ def generate_msms_autox_sequence(n_clicks, blank_params_log, sample_params_log,
         ms1_autox = et.parse(autox_seq).getroot()
         new_autox = et.Element(ms1_autox.tag, attrib=ms1_autox.attrib)
         new_autox.attrib['directory'] = outdir
+        default_isolation_width = get_acquisition_time_params()['isolation_width']
+        unmerged_methods = set()
+        precursor_count = 0
         for spot_group in ms1_autox:
             log += f"Spot Group: {spot_group.attrib['sampleName']}\n"
             for cont in spot_group:
@@ -1629,11 +2150,45 @@ def generate_msms_autox_sequence(n_clicks, blank_params_log, sample_params_log,
                                                 'Intensity': precursor_data[cont.attrib['Pos_on_Scout']]['peak_picked_intensity_array']})
                     top_n_peaks = top_n_peaks.sort_values(by='Intensity', ascending=True).round(4)
                     top_n_peaks = top_n_peaks.drop_duplicates(subset='m/z')
+                    precursor_count += top_n_peaks.shape[0]
+                    isolation_width = (get_method_acquisition_params(new_spot_group.attrib['acqMethod'])['isolation_width']
+                                       or default_isolation_width)
+                    if not isolation_width:
+                        unmerged_methods.add(new_spot_group.attrib['acqMethod'])
+                    top_n_peaks = merge_precursors(top_n_peaks, isolation_width)
                     top_n_peaks = top_n_peaks['m/z'].values.tolist()
                     for peak in top_n_peaks:
                         new_cont = et.SubElement(new_spot_group, cont.tag, attrib=cont.attrib)
                         new_cont.attrib['acqJobMode'] = 'MSMS'
                         new_cont.attrib['precursor_m_z'] = str(peak)
+        success_message = f'The MS/MS AutoXecute sequence has been created in {outdir}.'
+        target_count = sum([len(i) for i in new_autox])
+        merge_log = (f'Merged {precursor_count} precursors into {target_count} MS/MS targets using the quadrupole '
+                     f'isolation width ({precursor_count - target_count} acquisitions saved).')
+        if unmerged_methods:
+            merge_log += (' Precursors were not merged for spot groups using ' + ', '.join(sorted(unmerged_methods)) +
+                          ' because the isolation width could not be read from the method and no default '
+                          'isolation_width is set in etc/acquisition_time.cfg.')
+        log += '\n' + merge_log + '\n'
+        success_message += f' {merge_log}'
+        if budget_checkbox and budget:
+            tolerance = 0.05
+            if 'PRECURSOR_SELECTION' in sample_params_log.keys():
+                tolerance = sample_params_log['PRECURSOR_SELECTION']['exclusion_list_tolerance']
+            schedule_log = schedule_precursors(new_autox,
+                                               float(budget) * 3600,
+                                               precursor_data,
+                                               spot_groups,
+                                               tolerance,
+                                               geometry=get_plate_geometry(ms1_autox))
+            log += '\n' + schedule_log + '\n'
+            success_message += f' {schedule_log.splitlines()[0]}'
+        if route_checkbox:
+            route_log = optimize_spot_group_order(new_autox, get_plate_geometry(ms1_autox))
+            log += '\n' + route_log + '\n'
+            success_message += f' {route_log}'
+        estimate = estimate_acquisition_time(new_autox, geometry=get_plate_geometry(ms1_autox))
+        success_message += f' Estimated acquisition time: {format_time(estimate["total_time"])}.'
         new_autox_tree = et.ElementTree(new_autox)
         new_autox_tree.write(os.path.join(outdir, os.path.splitext(os.path.split(autox_seq)[-1])[0]) + '_MALDI_DDA.run',
                              encoding='utf-8',
@@ -1647,10 +2202,13 @@ def generate_msms_autox_sequence(n_clicks, blank_params_log, sample_params_log,
                 log += toml.dumps(blank_params_log) + '\n\n'
                 log += 'Exclusion List\n\n'
                 log += pd.DataFrame(exclusion_list).to_string(index=False) + '\n'
+        log += '\nAcquisition Time Estimate\n\n'
+        log += format_acquisition_time_estimate(estimate)
         with open(os.path.join(outdir,
                                os.path.splitext(os.path.split(autox_seq)[-1])[0]) + '_MALDI_DDA.log', 'w') as logfile:
             logfile.write(log)
-        return not run_is_open, not success_is_open
+        return not run_is_open, not success_is_open, success_message
+    return run_is_open, success_is_open, no_update
 
 
 @app.callback(Output('run_success_modal', 'is_open'),
@@ -1682,6 +2240,28 @@ def toggle_run_new_method_selection_input(n_clicks, value):
         new AutoXecute sequence.
     :return: List of dictionaries containing style template to show or hide parameters.
     """
+    from pymaldiviz.util import SHOWN, HIDDEN
+
+    if value:
+        return copy.deepcopy(SHOWN)
+    elif not value:
+        return copy.deepcopy(HIDDEN)
+
+
+@app.callback(Output('run_budget', 'style'),
+              [Input('preview_precursor_list_modal_run', 'n_clicks'),
+               Input('run_budget_checkbox', 'value')])
+def toggle_run_budget_input(n_clicks, value):
+    """
+    Dash callback to toggle whether the acquisition time budget input group is visible depending on whether limiting
+    MS/MS precursors to an acquisition time budget is enabled or disabled.
+
+    :param n_clicks: Input signal if the preview_precursor_list_modal_run button is clicked.
+    :param value: Whether to limit MS/MS precursors to an acquisition time budget.
+    :return: List of dictionaries containing style template to show or hide parameters.
+    """
+    from pymaldiviz.util import SHOWN, HIDDEN
+
     if value:
         return copy.deepcopy(SHOWN)
     elif not value:
@@ -1735,7 +2315,7 @@ def select_new_method(n_clicks):
               State('store_plot', 'data'),
               prevent_initial_call=True,
               memoize=True)
-def resample_spectrum(relayoutdata: dict, fig: FigureResampler):
+def resample_spectrum(relayoutdata: dict, fig):
     """
     Dash callback used for spectrum resampling to improve plotly figure performance.
 
@@ -6,9 +6,9 @@ import os
 from lxml import etree as et
 from dash import dcc, html, dash_table
 import dash_bootstrap_components as dbc
-from pymaldiviz.util import blank_figure
-from msms_autox_generator.util import (get_plate_map, get_plate_map_legend, get_plate_map_style,
-                                       get_maldi_dda_preprocessing_params, get_geometry_format, get_autox_path_dict)
+from msms_autox_generator.util import (get_plate_map, get_plate_map_legend, get_plate_map_style, get_geometry_format,
+                                       get_autox_path_dict)
+from msms_autox_generator.session import AUTOSAVE_INTERVAL
 
 
 def get_preprocessing_parameters_layout(param_dict):
@@ -997,6 +997,34 @@ def get_run_layout(outdir):
                 style={'margin': '10px',
                        'display': 'flex'}
             ),
+            dbc.Checkbox(
+                id='run_route_checkbox',
+                label='Reorder spots to minimize stage travel',
+                value=False,
+                style={'margin': '10px',
+                       'display': 'flex'}
+            ),
+            dbc.Checkbox(
+                id='run_budget_checkbox',
+                label='Limit MS/MS precursors to an acquisition time budget',
+                value=False,
+                style={'margin': '10px',
+                       'display': 'flex'}
+            ),
+            dbc.InputGroup(
+                [
+                    dbc.InputGroupText('Acquisition Time Budget (h)'),
+                    dbc.Input(id='run_budget_value',
+                              placeholder=12,
+                              value=12,
+                              type='number',
+                              min=0,
+                              step=0.1)
+                ],
+                id='run_budget',
+                style={'margin': '10px',
+                       'display': 'none'}
+            ),
             dbc.InputGroup(
                 [
                     dbc.InputGroupText('MS/MS Method'),
@@ -1036,6 +1064,34 @@ def get_run_layout(outdir):
                 style={'margin': '10px',
                        'display': 'flex'}
             ),
+            dbc.Checkbox(
+                id='run_route_checkbox',
+                label='Reorder spots to minimize stage travel',
+                value=False,
+                style={'margin': '10px',
+                       'display': 'flex'}
+            ),
+            dbc.Checkbox(
+                id='run_budget_checkbox',
+                label='Limit MS/MS precursors to an acquisition time budget',
+                value=False,
+                style={'margin': '10px',
+                       'display': 'flex'}
+            ),
+            dbc.InputGroup(
+                [
+                    dbc.InputGroupText('Acquisition Time Budget (h)'),
+                    dbc.Input(id='run_budget_value',
+                              placeholder=12,
+                              value=12,
+                              type='number',
+                              min=0,
+                              step=0.1)
+                ],
+                id='run_budget',
+                style={'margin': '10px',
+                       'display': 'none'}
+            ),
             dbc.InputGroup(
                 [
                     dbc.InputGroupText('MS/MS Method'),
@@ -1069,6 +1125,8 @@ def get_exclusion_list_spectra_layout():
 
     :return: List of spectraum spot name dropdown and figure elements.
     """
+    from pymaldiviz.util import blank_figure
+
     return [
         dcc.Dropdown(
             id='exclusion_list_blank_spectra_id',
@@ -1093,6 +1151,8 @@ def get_preview_layout():
 
     :return: List of spectrum spot name dropdown and figure elements.
     """
+    from pymaldiviz.util import blank_figure
+
     return [
         dcc.Dropdown(
             id='preview_id',
@@ -1111,21 +1171,63 @@ def get_preview_layout():
     ]
 
 
-def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
+def get_startup_layout():
+    """
+    Obtain the layout shown when the application first starts. Only contains the button used to select the AutoXecute
+    sequence and an empty container for the main dashboard so that the window can be painted before any data is
+    loaded.
+
+    :return: Div containing the startup layout.
+    """
+    return html.Div(
+        [
+            html.Div(
+                [
+                    html.H5('Select an AutoXecute sequence (*.run file) to begin.'),
+                    dbc.Button('Load AutoXecute Sequence',
+                               id='load_autox_seq',
+                               style={'margin': '20px'}),
+                    dbc.Button('Restore Saved Session',
+                               id='restore_session',
+                               style={'margin': '20px'}),
+                    html.Div(id='restore_session_error')
+                ],
+                id='load_autox_seq_div',
+                style={'margin': '20px',
+                       'display': 'flex',
+                       'flex-direction': 'column',
+                       'align-items': 'center'}
+            ),
+            dcc.Loading(
+                html.Div(id='dashboard')
+            )
+        ]
+    )
+
+
+def get_dashboard_layout(param_dict, autox_seq, session=None):
     """
-    Obtain the main dashboard layout.
+    Obtain the main dashboard layout. The AutoXecute validation, preprocessing parameters, and run modal window bodies
+    are left empty and rendered the first time each modal window is opened.
 
     :param param_dict: Dictionary of parameters used to populate default values.
-    :param plate_format: Plate geometry used to generate the plate map table.
-    :param autox_path_dict: Nested dictionary containing spot group sample names, data paths, and method paths from the
-        .run file.
     :param autox_seq: AutoXecute sequence file path.
+    :param session: Restored session snapshot used to populate the plate map, exclusion list, and stored data. If the
+        session contains indexed raw data, the AutoXecute validation modal window is not opened. The spot index and
+        precursor selection results are not included in the layout and are loaded into their serverside stores from
+        the session snapshot at "path" once the dashboard has been rendered.
+    :type session: dict | None
     :return: Div containing the main dashboard layout.
     """
+    # Only parse the AutoXecute sequence once and derive everything else from the loaded tree.
     autox = et.parse(autox_seq).getroot()
     outdir = autox.attrib['directory']
+    plate_format = get_geometry_format(autox)
+    autox_path_dict = get_autox_path_dict(autox)
     plate_map_df = get_plate_map(plate_format)
     plate_map_legend_df = get_plate_map_legend()
+    if session is None:
+        session = {}
     return html.Div(
         [
             dcc.Loading(
@@ -1140,29 +1242,32 @@ def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
                                     style_header={'display': 'none',
                                                   'textAlign': 'center'},
                                     style_cell={'textAlign': 'center'},
-                                    style_data_conditional=get_plate_map_style(plate_map_df, autox)
+                                    style_data_conditional=(session['plate_map_style']
+                                                            if 'plate_map_style' in session
+                                                            else get_plate_map_style(plate_map_df, autox))
                                 ),
                                 width=9
                             ),
                             dbc.Col(
                                 dash_table.DataTable(
-                                    plate_map_legend_df.to_dict('records'),
+                                    session.get('plate_map_legend_data', plate_map_legend_df.to_dict('records')),
                                     columns=[{'name': str(col), 'id': str(col)} for col in
                                              plate_map_legend_df.columns],
                                     id='plate_map_legend',
                                     style_header={'display': 'none',
                                                   'textAlign': 'center'},
                                     style_cell={'textAlign': 'center'},
-                                    style_data_conditional=[{'if': {'row_index': 1},
-                                                             'backgroundColor': 'green', 'color': 'white'},
-                                                            {'if': {'row_index': 2},
-                                                             'backgroundColor': 'gray', 'color': 'white'}]
+                                    style_data_conditional=session.get('plate_map_legend_style',
+                                                                       [{'if': {'row_index': 1},
+                                                                         'backgroundColor': 'green', 'color': 'white'},
+                                                                        {'if': {'row_index': 2},
+                                                                         'backgroundColor': 'gray', 'color': 'white'}])
                                 ),
                                 width=1
                             ),
                             dbc.Col(
                                 dash_table.DataTable(
-                                    data=[],
+                                    data=session.get('exclusion_list', []),
                                     columns=[{'name': 'm/z', 'id': 'm/z'}],
                                     id='exclusion_list',
                                     row_deletable=True,
@@ -1241,7 +1346,8 @@ def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
                                     'View Blank Spectra Used to Generate Exclusion List',
                                     id='view_exclusion_list_spectra',
                                     style={'margin': '20px',
-                                           'display': 'none',
+                                           'display': ('flex' if session.get('blank_params_log') and
+                                                       session.get('indexed_data') else 'none'),
                                            'justify-content': 'center',
                                            'width': '95%'}
                                 ),
@@ -1271,6 +1377,43 @@ def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
                             )
                         ]
                     ),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                dbc.Button(
+                                    'Save Exclusion List to Library',
+                                    id='save_exclusion_list_to_library',
+                                    style={'margin': '20px',
+                                           'display': 'flex',
+                                           'justify-content': 'center',
+                                           'width': '95%'}
+                                ),
+                                width={'size': 3, 'offset': 3}
+                            ),
+                            dbc.Col(
+                                dbc.Button(
+                                    'Load Exclusion Lists from Library',
+                                    id='load_exclusion_list_from_library',
+                                    style={'margin': '20px',
+                                           'display': 'flex',
+                                           'justify-content': 'center',
+                                           'width': '95%'}
+                                ),
+                                width=3
+                            ),
+                            dbc.Col(
+                                dbc.Button(
+                                    'Save Session',
+                                    id='save_session',
+                                    style={'margin': '20px',
+                                           'display': 'flex',
+                                           'justify-content': 'center',
+                                           'width': '95%'}
+                                ),
+                                width=3
+                            )
+                        ]
+                    ),
                     dbc.Row(
                         [
                             dbc.Col(
@@ -1300,7 +1443,7 @@ def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
                     dbc.Modal(
                         [
                             dbc.ModalHeader(dbc.ModalTitle('Loaded AutoXecute Sequence'), close_button=False),
-                            dbc.ModalBody(get_autox_validation_modal_layout(autox_path_dict)),
+                            dbc.ModalBody(id='autox_validation_modal_body'),
                             dbc.ModalFooter(dbc.Button('Close',
                                                        id='autox_validation_modal_close',
                                                        className='ms-auto'))
@@ -1311,12 +1454,12 @@ def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
                         keyboard=False,
                         scrollable=True,
                         centered=True,
-                        is_open=True
+                        is_open=not session.get('indexed_data')
                     ),
                     dbc.Modal(
                         [
                             dbc.ModalHeader(dbc.ModalTitle('Preprocessing Parameters')),
-                            dbc.ModalBody(get_preprocessing_parameters_layout(param_dict)),
+                            dbc.ModalBody(id='edit_processing_parameters_modal_body'),
                             dbc.ModalFooter(
                                 dbc.ButtonGroup(
                                     [
@@ -1435,6 +1578,79 @@ def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
                         centered=True,
                         is_open=False
                     ),
+                    dbc.Modal(
+                        [
+                            dbc.ModalHeader(dbc.ModalTitle('Save Exclusion List to Library')),
+                            dbc.ModalBody(
+                                dbc.InputGroup(
+                                    [
+                                        dbc.InputGroupText('Matrix'),
+                                        dbc.Input(id='save_exclusion_library_matrix_value',
+                                                  placeholder='',
+                                                  value='',
+                                                  type='text')
+                                    ],
+                                    id='save_exclusion_library_matrix',
+                                    style={'margin': '10px',
+                                           'display': 'flex'}
+                                )
+                            ),
+                            dbc.ModalFooter(dbc.Button('Save',
+                                                       id='save_exclusion_library_save',
+                                                       className='ms-auto'))
+                        ],
+                        id='save_exclusion_library_modal',
+                        size='lg',
+                        centered=True,
+                        is_open=False
+                    ),
+                    dbc.Modal(
+                        [
+                            dbc.ModalHeader(dbc.ModalTitle('Load Exclusion Lists from Library')),
+                            dbc.ModalBody(
+                                dash_table.DataTable(
+                                    data=[],
+                                    columns=[{'name': 'Matches Current Methods and Parameters', 'id': 'match'},
+                                             {'name': 'Matrix', 'id': 'matrix'},
+                                             {'name': 'Method', 'id': 'method'},
+                                             {'name': 'Preprocessing Parameters', 'id': 'params_hash'},
+                                             {'name': 'Source', 'id': 'source'},
+                                             {'name': 'AutoXecute Sequence', 'id': 'autox_seq'},
+                                             {'name': 'Created', 'id': 'created'},
+                                             {'name': 'Peaks', 'id': 'count'}],
+                                    id='exclusion_library_table',
+                                    row_selectable='multi',
+                                    selected_rows=[],
+                                    filter_action='native',
+                                    sort_action='native',
+                                    style_header={'textAlign': 'center'},
+                                    style_cell={'textAlign': 'center'},
+                                    page_size=20
+                                )
+                            ),
+                            dbc.ModalFooter(dbc.Button('Load Selected Exclusion Lists',
+                                                       id='load_exclusion_library_load',
+                                                       className='ms-auto'))
+                        ],
+                        id='load_exclusion_library_modal',
+                        fullscreen=True,
+                        scrollable=True,
+                        centered=True,
+                        is_open=False
+                    ),
+                    dbc.Modal(
+                        [
+                            dbc.ModalHeader(dbc.ModalTitle('Exclusion Library Error')),
+                            dbc.ModalBody(id='exclusion_library_error_modal_body'),
+                            dbc.ModalFooter(dbc.Button('Close',
+                                                       id='exclusion_library_error_modal_close',
+                                                       className='ms-auto'))
+                        ],
+                        id='exclusion_library_error_modal',
+                        size='lg',
+                        centered=True,
+                        is_open=False
+                    ),
                     dbc.Modal(
                         [
                             dbc.ModalHeader(dbc.ModalTitle('Preview Precursor List')),
@@ -1462,7 +1678,7 @@ def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
                     dbc.Modal(
                         [
                             dbc.ModalHeader(dbc.ModalTitle('Generate MS/MS AutoXecute Sequence')),
-                            dbc.ModalBody(get_run_layout(outdir)),
+                            dbc.ModalBody(id='run_modal_body'),
                             dbc.ModalFooter(
                                 dbc.Button('Run',
                                            id='run_button',
@@ -1479,7 +1695,8 @@ def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
                     dbc.Modal(
                         [
                             dbc.ModalHeader(dbc.ModalTitle('Success')),
-                            dbc.ModalBody(f'The MS/MS AutoXecute sequence has been created in {outdir}.'),
+                            dbc.ModalBody(f'The MS/MS AutoXecute sequence has been created in {outdir}.',
+                                          id='run_success_modal_body'),
                             dbc.ModalFooter(
                                 dbc.Button('Close',
                                            id='run_success_close',
@@ -1493,25 +1710,32 @@ def get_dashboard_layout(param_dict, plate_format, autox_path_dict, autox_seq):
                     ),
                     dcc.Store(id='store_plot'),
                     dcc.Store(id='store_preprocessing_params',
-                              data=get_maldi_dda_preprocessing_params()),
+                              data=param_dict),
                     dcc.Store(id='store_blank_params_log',
-                              data={}),
+                              data=session.get('blank_params_log', {})),
                     dcc.Store(id='store_sample_params_log',
-                              data={}),
+                              data=session.get('sample_params_log', {})),
                     dcc.Store(id='store_autox_seq',
                               data=autox_seq),
                     dcc.Store(id='store_plate_format',
-                              data=get_geometry_format(et.parse(autox_seq).getroot())),
+                              data=plate_format),
                     dcc.Store(id='store_autox_path_dict',
-                              data=get_autox_path_dict(autox_seq)),
+                              data=session.get('autox_path_dict', autox_path_dict)),
                     dcc.Store(id='store_blank_spots',
-                              data={'spots': []}),
+                              data=session.get('blank_spots', {'spots': []})),
                     dcc.Store(id='store_spot_groups',
-                              data={}),
+                              data=session.get('spot_groups', {})),
                     dcc.Store(id='store_indexed_data',
                               data={}),
                     dcc.Store(id='store_precursor_data',
-                              data={})
+                              data={}),
+                    dcc.Store(id='store_restored_session',
+                              data=session.get('path', '')),
+                    dcc.Store(id='store_session_autosave',
+                              data=''),
+                    dcc.Interval(id='session_autosave_interval',
+                                 interval=AUTOSAVE_INTERVAL * 1000,
+                                 disabled=True)
                 ]
             )
         ],
@@ -0,0 +1,104 @@
+import os
+import json
+import gzip
+import pickle
+import hashlib
+from msms_autox_generator.session import get_raw_data_fingerprint
+from msms_autox_generator.util import get_user_data_dir
+
+# Content addressed cache of precursor selection results. Results are keyed by a hash of everything precursor selection
+# depends on so that regenerating an MS/MS AutoXecute sequence with unchanged inputs skips importing, preprocessing,
+# and peak picking the raw data.
+
+PRECURSOR_CACHE_DIR = os.path.join(get_user_data_dir(), 'precursor_cache')
+PRECURSOR_CACHE_VERSION = 1
+# Maximum number of cached results. The least recently used results are removed first.
+MAX_PRECURSOR_CACHE_ENTRIES = 50
+
+
+def get_precursor_cache_key(indexed_data, blank_spots, spot_groups, preprocessing_params, exclusion_list):
+    """
+    Get the cache key for precursor selection results from the raw data fingerprints, blank spot and spot group
+    definitions, preprocessing parameters, and exclusion list.
+
+    :param indexed_data: Dictionary containing spots as keys and raw data paths as values.
+    :type indexed_data: dict
+    :param blank_spots: Blank spots marked on the plate map.
+    :type blank_spots: list[str]
+    :param spot_groups: Dictionary containing user defined group names as keys and lists of spots as values.
+    :type spot_groups: dict
+    :param preprocessing_params: Nested dictionaries containing preprocessing parameters for each preprocessing step.
+    :type preprocessing_params: dict
+    :param exclusion_list: Exclusion list data.
+    :type exclusion_list: list[dict]
+    :return: SHA-256 hash of the inputs.
+    :rtype: str
+    """
+    inputs = {'version': PRECURSOR_CACHE_VERSION,
+              'indexed_data': sorted(indexed_data.items()),
+              'fingerprints': {path: get_raw_data_fingerprint(path) for path in sorted(set(indexed_data.values()))},
+              'blank_spots': sorted(blank_spots),
+              'spot_groups': {group: sorted(spots) for group, spots in spot_groups.items()},
+              'preprocessing_params': preprocessing_params,
+              'exclusion_list': sorted(float(row['m/z']) for row in exclusion_list if row.get('m/z') is not None)}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_cached_precursor_data(key):
+    """
+    Get cached precursor selection results.
+
+    :param key: Cache key from get_precursor_cache_key().
+    :type key: str
+    :return: Dictionary containing the precursor data and sample preprocessing parameter log, or None if the results
+        are not cached.
+    :rtype: dict | None
+    """
+    path = os.path.join(PRECURSOR_CACHE_DIR, key + '.pkl.gz')
+    if not os.path.isfile(path):
+        return None
+    try:
+        with gzip.open(path, 'rb') as cache_file:
+            result = pickle.load(cache_file)
+        # mark as recently used
+        os.utime(path)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    return result
+
+
+def cache_precursor_data(key, precursor_data, sample_params_log):
+    """
+    Cache precursor selection results and remove the least recently used results if the cache is full. Results are not
+    cached if the cache directory cannot be written to.
+
+    :param key: Cache key from get_precursor_cache_key().
+    :type key: str
+    :param precursor_data: Dictionary containing spots as keys and selected precursors as values.
+    :type precursor_data: dict
+    :param sample_params_log: Preprocessing parameters used for precursor selection.
+    :type sample_params_log: dict
+    :return: Whether the results were cached.
+    :rtype: bool
+    """
+    path = os.path.join(PRECURSOR_CACHE_DIR, key + '.pkl.gz')
+    try:
+        os.makedirs(PRECURSOR_CACHE_DIR, exist_ok=True)
+        with gzip.open(path + '.tmp', 'wb', compresslevel=1) as cache_file:
+            pickle.dump({'precursor_data': precursor_data, 'sample_params_log': sample_params_log},
+                        cache_file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        entries = sorted([entry for entry in os.scandir(PRECURSOR_CACHE_DIR) if entry.name.endswith('.pkl.gz')],
+                         key=lambda x: x.stat().st_mtime,
+                         reverse=True)
+        for entry in entries[MAX_PRECURSOR_CACHE_ENTRIES:]:
+            os.remove(entry.path)
+    except OSError:
+        if os.path.isfile(path + '.tmp'):
+            try:
+                os.remove(path + '.tmp')
+            except OSError:
+                pass
+        return False
+    return True
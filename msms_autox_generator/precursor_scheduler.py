@@ -0,0 +1,192 @@
+import heapq
+import bisect
+from msms_autox_generator.acquisition_time import (get_acquisition_time_params, get_method_acquisition_params,
+                                                   estimate_acquisition_time, format_time)
+
+# Scheduling of MS/MS precursors across all spots of an AutoXecute sequence within a total acquisition time budget.
+
+# Score multiplier applied for each time a precursor m/z has already been scheduled (novelty).
+NOVELTY_DECAY = 0.25
+# Exponent of the score penalty applied for the number of MS/MS events already scheduled in the same group. Larger
+# values spread MS/MS events more evenly across groups.
+GROUP_WEIGHT = 0.5
+
+
+def get_precursor_intensities(precursor_data):
+    """
+    Get the intensity of each precursor selected by preview_precursor_list() for each spot. m/z values are rounded to 4
+    decimal places to match the precursor m/z values written to the AutoXecute sequence.
+
+    :param precursor_data: Dictionary containing spots as keys and peak picked m/z and intensity arrays as values.
+    :type precursor_data: dict
+    :return: Dictionary containing spots as keys and dictionaries of precursor m/z and intensity as values.
+    :rtype: dict
+    """
+    intensities = {}
+    for spot, data in precursor_data.items():
+        if not isinstance(data, dict) or data.get('peak_picked_mz_array') is None or \
+                data.get('peak_picked_intensity_array') is None:
+            continue
+        intensities[spot] = {}
+        for mz, intensity in zip(data['peak_picked_mz_array'], data['peak_picked_intensity_array']):
+            mz = round(float(mz), 4)
+            intensities[spot][mz] = max(float(intensity), intensities[spot].get(mz, 0.0))
+    return intensities
+
+
+def get_precursor_intensity(spot_intensities, mz, isolation_width):
+    """
+    Get the intensity of an MS/MS target. Targets that were merged from several precursors are assigned the highest
+    intensity of the precursors within their isolation window.
+
+    :param spot_intensities: Dictionary containing precursor m/z and intensity for a single spot.
+    :type spot_intensities: dict
+    :param mz: m/z of the MS/MS target.
+    :type mz: float
+    :param isolation_width: Quadrupole isolation width in m/z.
+    :type isolation_width: float
+    :return: Intensity of the MS/MS target or 0 if no precursor was found.
+    :rtype: float
+    """
+    if mz in spot_intensities:
+        return spot_intensities[mz]
+    return max([intensity for precursor_mz, intensity in spot_intensities.items()
+                if abs(precursor_mz - mz) <= isolation_width / 2], default=0.0)
+
+
+def get_spot_group_names(autox, spot_groups=None):
+    """
+    Get the group each spot group in an MS/MS AutoXecute sequence belongs to. Spots in a user defined group belong to
+    that group. All other spots belong to the MS1 spot group (condition) they were acquired in.
+
+    :param autox: MS/MS AutoXecute sequence XML element object.
+    :param spot_groups: Dictionary containing user defined group names as keys and lists of spots as values.
+    :type spot_groups: dict | None
+    :return: List of group names in the same order as the spot groups in the AutoXecute sequence.
+    :rtype: list[str]
+    """
+    user_groups = {spot: group for group, spots in (spot_groups or {}).items() for spot in spots}
+    names = []
+    for spot_group in autox:
+        spot = spot_group[0].attrib['Pos_on_Scout'] if len(spot_group) else ''
+        if spot in user_groups:
+            names.append(user_groups[spot])
+        else:
+            sample_name = spot_group.attrib.get('sampleName', '')
+            suffix = f'_{spot}_MSMS'
+            names.append(sample_name[:-len(suffix)] if sample_name.endswith(suffix) else sample_name)
+    return names
+
+
+def schedule_precursors(autox, budget, precursor_data, spot_groups=None, tolerance=0.05, params=None, geometry=None):
+    """
+    Select the MS/MS precursors to acquire across all spots of an MS/MS AutoXecute sequence so that the estimated
+    acquisition time stays within a time budget. Precursors not selected are removed from the AutoXecute sequence in
+    place, and spot groups without any precursors left are removed.
+
+    Method loads and stage travel for the full sequence are reserved from the budget first. Precursors are then
+    selected greedily by score per second of acquisition time, where the cost of a precursor is its laser shot time and
+    precursor overhead plus the spot overhead if it is the first precursor selected on its spot. The score of a
+    precursor is its intensity relative to the most intense precursor, multiplied by NOVELTY_DECAY for each time a
+    precursor within the m/z tolerance has already been selected, and divided by (1 + number of precursors already
+    selected in its group) ** GROUP_WEIGHT.
+
+    :param autox: MS/MS AutoXecute sequence XML element object with one spot group per spot.
+    :param budget: Total acquisition time budget in seconds.
+    :type budget: float
+    :param precursor_data: Dictionary containing spots as keys and peak picked m/z and intensity arrays as values.
+    :type precursor_data: dict
+    :param spot_groups: Dictionary containing user defined group names as keys and lists of spots as values.
+    :type spot_groups: dict | None
+    :param tolerance: m/z tolerance used to determine whether a precursor has already been selected.
+    :type tolerance: float
+    :param params: Dictionary containing acquisition time estimate parameters. Defaults to the parameters in
+        etc/acquisition_time.cfg.
+    :type params: dict | None
+    :param geometry: Plate geometry used to estimate stage travel.
+    :type geometry: autox_geometry.PlateGeometry | None
+    :return: Message summarizing the number of precursors and spots selected.
+    :rtype: str
+    """
+    if params is None:
+        params = get_acquisition_time_params()
+    intensities = get_precursor_intensities(precursor_data)
+    group_names = get_spot_group_names(autox, spot_groups)
+    spot_group_list = list(autox)
+    full_estimate = estimate_acquisition_time(autox, params, geometry)
+    remaining = budget - full_estimate['method_loads'] * params['method_load_time'] - full_estimate['travel_time']
+
+    # candidates as (spot group index, cont, m/z, intensity, cost)
+    candidates = []
+    for index, spot_group in enumerate(spot_group_list):
+        method_params = get_method_acquisition_params(spot_group.attrib.get('acqMethod', ''))
+        shot_time = ((method_params['shots'] or params['shots']) /
+                     (method_params['laser_frequency'] or params['laser_frequency']))
+        isolation_width = method_params['isolation_width'] or params['isolation_width']
+        for cont in spot_group:
+            mz = round(float(cont.attrib.get('precursor_m_z', 0)), 4)
+            intensity = get_precursor_intensity(intensities.get(cont.attrib['Pos_on_Scout'], {}), mz, isolation_width)
+            candidates.append((index, cont, mz, intensity, shot_time + params['precursor_overhead']))
+    max_intensity = max([candidate[3] for candidate in candidates], default=0.0) or 1.0
+
+    selected_mz = []
+    group_counts = {}
+    started = set()
+    selected = set()
+    dropped = set()
+    spot_candidates = {}
+    for candidate_index, candidate in enumerate(candidates):
+        spot_candidates.setdefault(candidate[0], []).append(candidate_index)
+
+    def get_priority(candidate_index):
+        index, cont, mz, intensity, cost = candidates[candidate_index]
+        novelty = bisect.bisect_right(selected_mz, mz + tolerance) - bisect.bisect_left(selected_mz, mz - tolerance)
+        score = ((intensity / max_intensity) * NOVELTY_DECAY ** novelty /
+                 (1 + group_counts.get(group_names[index], 0)) ** GROUP_WEIGHT)
+        if index not in started:
+            cost += params['spot_overhead']
+        return score / cost, cost
+
+    # Selecting a precursor only lowers the score of other precursors, so their priorities in the heap are upper bounds
+    # that are recomputed when they reach the top of the heap. The exception is the first precursor selected on a spot,
+    # which removes the spot overhead from the cost of the other precursors on that spot, so fresh priorities are pushed
+    # for them.
+    heap = [(-get_priority(i)[0], i) for i in range(len(candidates))]
+    heapq.heapify(heap)
+    while heap and remaining > 0:
+        stale_priority, candidate_index = heapq.heappop(heap)
+        if candidate_index in selected or candidate_index in dropped:
+            continue
+        priority, cost = get_priority(candidate_index)
+        if heap and -priority > heap[0][0]:
+            heapq.heappush(heap, (-priority, candidate_index))
+            continue
+        index, cont, mz = candidates[candidate_index][:3]
+        if cost > remaining:
+            # Precursors that only exceed the remaining budget because of the spot overhead are pushed again if
+            # another precursor on their spot is selected.
+            if index in started or cost - params['spot_overhead'] > remaining:
+                dropped.add(candidate_index)
+            continue
+        remaining -= cost
+        selected.add(candidate_index)
+        bisect.insort(selected_mz, mz)
+        group_counts[group_names[index]] = group_counts.get(group_names[index], 0) + 1
+        if index not in started:
+            started.add(index)
+            for sibling_index in spot_candidates[index]:
+                if sibling_index not in selected and sibling_index not in dropped:
+                    heapq.heappush(heap, (-get_priority(sibling_index)[0], sibling_index))
+
+    for candidate_index, (index, cont, mz, intensity, cost) in enumerate(candidates):
+        if candidate_index not in selected:
+            spot_group_list[index].remove(cont)
+    for spot_group in spot_group_list:
+        if len(spot_group) == 0:
+            autox.remove(spot_group)
+
+    message = (f'Scheduled {len(selected)} of {len(candidates)} MS/MS precursors on {len(started)} of '
+               f'{len(spot_group_list)} spots within an acquisition time budget of {format_time(budget)}.')
+    for group in dict.fromkeys(group_names):
+        message += f'\n{group}: {group_counts.get(group, 0)} precursors'
+    return message
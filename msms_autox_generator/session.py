@@ -0,0 +1,191 @@
+import os
+import json
+import datetime
+
+# Session snapshots for fleX MS/MS AutoXecute Generator. A snapshot stores the plate state, preprocessing parameters,
+# exclusion list, spot index, and precursor selection results so that a plate can be reopened without importing and
+# preprocessing the raw data again. Snapshots are NumPy *.npz archives containing the session data as JSON and the NumPy
+# arrays in the session data as separate arrays, so that loading a snapshot never unpickles data.
+
+SESSION_VERSION = 2
+SESSION_EXTENSION = '.msmssession'
+AUTOSAVE_SESSION_PATH = os.path.join(os.path.split(os.path.dirname(__file__))[0], 'etc',
+                                     'autosave' + SESSION_EXTENSION)
+# Time in seconds between a change to the session and the autosave, so that several changes are saved at once.
+AUTOSAVE_INTERVAL = 30
+# Session data that depends on the raw data and is only restored if the raw data has not changed.
+RAW_DATA_SESSION_KEYS = ['indexed_data', 'precursor_data', 'sample_params_log']
+# Name of the array containing the session data as JSON in session snapshots.
+SESSION_JSON_ARRAY = 'session'
+# Key of the JSON object that replaces a NumPy array in the session data. Its value is the name of the array in the
+# session snapshot.
+ARRAY_REFERENCE_KEY = '__ndarray__'
+
+
+def get_raw_data_fingerprint(path):
+    """
+    Get the fingerprint of a *.d directory, consisting of the name, size, and modification time of each file in the
+    directory.
+
+    :param path: Path to the *.d directory.
+    :type path: str
+    :return: Sorted list of [name, size, modification time] lists. Empty if the directory does not exist.
+    :rtype: list[list]
+    """
+    fingerprint = []
+    if os.path.isdir(path):
+        for entry in sorted(os.scandir(path), key=lambda x: x.name):
+            if entry.is_file():
+                stat = entry.stat()
+                fingerprint.append([entry.name, stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def get_raw_data_fingerprints(autox_path_dict):
+    """
+    Get fingerprints of the raw data in an AutoXecute sequence.
+
+    :param autox_path_dict: Nested dictionary containing spot group sample names, raw data paths, and method paths.
+    :type autox_path_dict: dict
+    :return: Dictionary containing raw data paths as keys and fingerprints from get_raw_data_fingerprint() as values.
+    :rtype: dict
+    """
+    return {value['raw_data_path']: get_raw_data_fingerprint(value['raw_data_path'])
+            for value in autox_path_dict.values()}
+
+
+def get_session(autox_seq, autox_path_dict, preprocessing_params, plate_map_style, plate_map_legend_data,
+                plate_map_legend_style, blank_spots, spot_groups, exclusion_list, blank_params_log, sample_params_log,
+                indexed_data, precursor_data):
+    """
+    Collect the current dashboard state into a session dictionary.
+
+    :param autox_seq: AutoXecute sequence file path.
+    :param autox_path_dict: Nested dictionary containing validated spot group sample names, raw data paths, and method
+        paths.
+    :param preprocessing_params: Data from store_preprocessing_params.
+    :param plate_map_style: Style data of the cells in the plate map.
+    :param plate_map_legend_data: Plate map legend data.
+    :param plate_map_legend_style: Style data of the cells in the plate map legend.
+    :param blank_spots: Data from store_blank_spots.
+    :param spot_groups: Data from store_spot_groups.
+    :param exclusion_list: Exclusion list data.
+    :param blank_params_log: Data from store_blank_params_log.
+    :param sample_params_log: Data from store_sample_params_log.
+    :param indexed_data: Data from store_indexed_data.
+    :param precursor_data: Data from store_precursor_data.
+    :return: Dictionary containing the session data.
+    :rtype: dict
+    """
+    return {'autox_seq': autox_seq,
+            'autox_path_dict': autox_path_dict,
+            'preprocessing_params': preprocessing_params,
+            'plate_map_style': plate_map_style,
+            'plate_map_legend_data': plate_map_legend_data,
+            'plate_map_legend_style': plate_map_legend_style,
+            'blank_spots': blank_spots,
+            'spot_groups': spot_groups,
+            'exclusion_list': exclusion_list,
+            'blank_params_log': blank_params_log,
+            'sample_params_log': sample_params_log,
+            'indexed_data': indexed_data,
+            'precursor_data': precursor_data}
+
+
+def encode_session_value(value, arrays):
+    """
+    Convert session data into JSON serializable data. NumPy arrays are moved to a dictionary of arrays and replaced by
+    a reference to their name, and NumPy scalars are converted to Python scalars.
+
+    :param value: Session data.
+    :param arrays: Dictionary that NumPy arrays are added to with their names as keys.
+    :type arrays: dict
+    :return: JSON serializable session data.
+    """
+    import numpy as np
+
+    if isinstance(value, dict):
+        return {str(key): encode_session_value(val, arrays) for key, val in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [encode_session_value(val, arrays) for val in value]
+    elif isinstance(value, np.ndarray):
+        # object arrays can only be stored pickled
+        if value.dtype.hasobject:
+            return encode_session_value(value.tolist(), arrays)
+        name = f'array_{len(arrays)}'
+        arrays[name] = value
+        return {ARRAY_REFERENCE_KEY: name}
+    elif isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def decode_session_value(value, arrays):
+    """
+    Restore the NumPy arrays referenced in session data loaded from JSON.
+
+    :param value: Session data loaded from JSON.
+    :param arrays: Arrays loaded from the session snapshot.
+    :type arrays: numpy.lib.npyio.NpzFile
+    :return: Session data.
+    """
+    if isinstance(value, dict):
+        if list(value.keys()) == [ARRAY_REFERENCE_KEY]:
+            return arrays[value[ARRAY_REFERENCE_KEY]]
+        return {key: decode_session_value(val, arrays) for key, val in value.items()}
+    elif isinstance(value, list):
+        return [decode_session_value(val, arrays) for val in value]
+    return value
+
+
+def save_session(path, session):
+    """
+    Save a session snapshot as a compressed NumPy *.npz archive. The session data is stored as JSON and the NumPy
+    arrays in the session data are stored as arrays. The raw data fingerprints and save time are added to the snapshot.
+
+    :param path: Path to the session snapshot file.
+    :type path: str
+    :param session: Dictionary containing the session data. Must contain "autox_seq" and "autox_path_dict".
+    :type session: dict
+    """
+    import numpy as np
+
+    session = dict(session,
+                   version=SESSION_VERSION,
+                   created=datetime.datetime.now().isoformat(timespec='seconds'),
+                   fingerprints=get_raw_data_fingerprints(session['autox_path_dict']))
+    arrays = {}
+    session_json = json.dumps(encode_session_value(session, arrays))
+    # write to a temporary file first so that a crash while saving does not corrupt an existing snapshot
+    with open(path + '.tmp', 'wb') as session_file:
+        np.savez_compressed(session_file, **{SESSION_JSON_ARRAY: np.array(session_json)}, **arrays)
+    os.replace(path + '.tmp', path)
+
+
+def load_session(path):
+    """
+    Load a session snapshot. If the raw data has changed since the snapshot was saved, data derived from the raw data
+    is removed from the session so that it is imported and processed again.
+
+    :param path: Path to the session snapshot file.
+    :type path: str
+    :return: Dictionary containing the session data and whether the raw data is unchanged ("raw_data_current").
+    :rtype: dict
+    :raises ValueError: If the file is not a session snapshot or was saved with an incompatible version.
+    """
+    import zipfile
+    import numpy as np
+
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            session = decode_session_value(json.loads(str(arrays[SESSION_JSON_ARRAY][()])), arrays)
+    except (KeyError, ValueError, zipfile.BadZipFile) as e:
+        raise ValueError(f'{path} is not a valid session snapshot: {e}')
+    if not isinstance(session, dict) or session.get('version') != SESSION_VERSION:
+        raise ValueError(f'Session snapshot {path} was saved with an incompatible version.')
+    session['raw_data_current'] = (bool(session['fingerprints']) and
+                                   session['fingerprints'] == get_raw_data_fingerprints(session['autox_path_dict']))
+    if not session['raw_data_current']:
+        for key in RAW_DATA_SESSION_KEYS:
+            session.pop(key, None)
+    return session
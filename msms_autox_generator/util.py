@@ -4,13 +4,29 @@
 
 import os
 import random
-import configparser
-import numpy as np
-import pandas as pd
-from lxml import etree as et
 import tkinter
 from tkinter.filedialog import askopenfilename, askdirectory
-from pymaldiviz.util import get_preprocessing_params
+from autox_geometry import get_geometry_registry, get_route_length, optimize_route
+
+CONFIG_PATH = os.path.join(os.path.split(os.path.dirname(__file__))[0], 'etc', 'ms1_autox_generator.cfg')
+# Name of the per user data directory containing the exclusion library and precursor cache.
+USER_DATA_DIR_NAME = 'fleX MSMS AutoXecute Generator'
+
+
+def get_user_data_dir():
+    """
+    Get the per user directory for data written by fleX MS/MS AutoXecute Generator. Data is written to the user's local
+    application data directory on Windows and the XDG data directory on other platforms so that the install directory
+    does not need to be writable.
+
+    :return: Path to the per user data directory. The directory is not created.
+    :rtype: str
+    """
+    if os.environ.get('LOCALAPPDATA'):
+        base_dir = os.environ['LOCALAPPDATA']
+    else:
+        base_dir = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base_dir, USER_DATA_DIR_NAME)
 
 
 def get_autox_sequence_filename():
@@ -48,6 +64,9 @@ def get_maldi_dda_preprocessing_params():
     :return: Nest dictionaries containing preprocessing parameters for each preprocessing step.
     :rtype: dict
     """
+    # pyMALDIviz pulls in pyMALDIproc/pyopenms, so it is only imported once parameters are actually needed.
+    from pymaldiviz.util import get_preprocessing_params
+
     params_dict = get_preprocessing_params()
     params_dict['TRIM_SPECTRUM']['run'] = False
     params_dict['TRANSFORM_INTENSITY']['run'] = False
@@ -61,11 +80,18 @@ def get_maldi_dda_preprocessing_params():
     return params_dict
 
 
-def get_autox_path_dict(autox_seq):
+def get_autox_path_dict(autox):
+    """
+    Obtain the spot group sample names, raw data paths, and method paths from a loaded AutoXecute sequence.
+
+    :param autox: AutoXecute sequence file loaded as an XML tree.
+    :return: Nested dictionary containing spot group sample names, data paths, and method paths from the .run file.
+    :rtype: dict
+    """
     return {str(index): {'sample_name': spot_group.attrib['sampleName'],
-                         'raw_data_path': f"{os.path.join(et.parse(autox_seq).getroot().attrib['directory'], spot_group.attrib['sampleName'])}.d",
+                         'raw_data_path': f"{os.path.join(autox.attrib['directory'], spot_group.attrib['sampleName'])}.d",
                          'method_path': spot_group.attrib['acqMethod']}
-            for index, spot_group in enumerate(et.parse(autox_seq).getroot())}
+            for index, spot_group in enumerate(autox)}
 
 
 def get_geometry_files(geometry_path):
@@ -77,28 +103,7 @@ def get_geometry_files(geometry_path):
     :return: Dictionary containing the geometry name as keys and the path to the corresponding geometry files as values.
     :rtype: dict
     """
-    # Parse config file for inclusion list of acceptable geometries.
-    config = configparser.ConfigParser()
-    config.read(os.path.join(os.path.split(os.path.dirname(__file__))[0], 'etc', 'ms1_autox_generator.cfg'))
-    defaults = config['GeometryFiles']['defaults'].split(',')
-
-    # Get list of .xeo geometry files from the GeometryFiles path.
-    geometry_files = [os.path.join(dirpath, filename).replace('/', '\\')
-                      for dirpath, dirnames, filenames in os.walk(geometry_path)
-                      for filename in filenames
-                      if os.path.splitext(filename)[1] == '.xeo']
-
-    # Only keep geometry files that are not imaging geometries from flexImaging.
-    # Discard geometry files not found in inclusion list.
-    geometry_files_subset = []
-    for geometry in geometry_files:
-        if os.path.splitext(os.path.split(geometry)[-1])[0] in defaults:
-            with open(geometry, 'r') as geometry_object:
-                if 'flexImaging' not in geometry_object.read():
-                    geometry_files_subset.append(geometry)
-    geometry_files_subset = {os.path.splitext(os.path.split(i)[-1])[0]: i for i in geometry_files_subset}
-
-    return geometry_files_subset
+    return get_geometry_registry(CONFIG_PATH).get_geometry_files(geometry_path)
 
 
 def get_geometry_format(autox):
@@ -110,20 +115,84 @@ def get_geometry_format(autox):
     :return: Generalized MALDI target plate geometry format.
     :rtype: int
     """
-    config = configparser.ConfigParser()
-    config.read(os.path.join(os.path.split(os.path.dirname(__file__))[0], 'etc', 'ms1_autox_generator.cfg'))
-    if autox.attrib['geometry'] in config['GeometryFiles']['24spot_geometries'].split(','):
-        return 24
-    elif autox.attrib['geometry'] in config['GeometryFiles']['48spot_geometries'].split(','):
-        return 48
-    elif autox.attrib['geometry'] in config['GeometryFiles']['96spot_geometries'].split(','):
-        return 96
-    elif autox.attrib['geometry'] in config['GeometryFiles']['384spot_geometries'].split(','):
-        return 384
-    elif autox.attrib['geometry'] in config['GeometryFiles']['1536spot_geometries'].split(','):
-        return 1536
-    elif autox.attrib['geometry'] in config['GeometryFiles']['6144spot_geometries'].split(','):
-        return 6144
+    return get_geometry_registry(CONFIG_PATH).get_geometry_format(autox.attrib['geometry'])
+
+
+def get_plate_geometry(autox):
+    """
+    Obtain the parsed MALDI plate geometry used in the loaded AutoXecute sequence.
+
+    :param autox: AutoXecute sequence file loaded as an XML tree.
+    :return: Parsed plate geometry with spot coordinates or None if the geometry file could not be found.
+    :rtype: autox_geometry.PlateGeometry | None
+    """
+    return get_geometry_registry(CONFIG_PATH).get_plate_geometry(autox.attrib['geometry'])
+
+
+def optimize_spot_group_order(autox, geometry):
+    """
+    Reorder the spot groups of an MS/MS AutoXecute sequence in place to minimize stage travel. Each spot group contains
+    all precursors for a single spot, so precursors of one spot stay contiguous. Spot groups are only reordered within
+    runs of consecutive spot groups that use the same method so that no additional method loads are introduced. The
+    original order is kept if the optimized order is not shorter.
+
+    :param autox: MS/MS AutoXecute sequence XML element object.
+    :param geometry: Parsed plate geometry with spot coordinates.
+    :type geometry: autox_geometry.PlateGeometry | None
+    :return: Message describing the estimated stage travel before and after reordering.
+    :rtype: str
+    """
+    spot_groups = [spot_group for spot_group in autox if len(spot_group)]
+    spots = [spot_group[0].attrib['Pos_on_Scout'] for spot_group in spot_groups]
+    if geometry is None or not all(spot in geometry for spot in spots):
+        return ('Spot order was not optimized because the spot coordinates could not be found in the MALDI plate '
+                'geometry.')
+    order = optimize_route(geometry, spots, [spot_group.attrib['acqMethod'] for spot_group in spot_groups])
+    original_length = get_route_length(geometry, spots)
+    optimized_length = get_route_length(geometry, [spots[i] for i in order])
+    if optimized_length >= original_length:
+        return (f'Spot order was not changed because the optimized order would not reduce the estimated stage travel '
+                f'of {original_length / 1000:.1f} mm.')
+    autox[:] = [spot_groups[i] for i in order] + [spot_group for spot_group in autox if not len(spot_group)]
+    saved = original_length - optimized_length
+    return (f'Estimated stage travel reduced from {original_length / 1000:.1f} mm to {optimized_length / 1000:.1f} mm '
+            f'({saved / 1000:.1f} mm, {saved / original_length * 100:.1f}% saved).')
+
+
+def merge_precursors(peaks, isolation_width):
+    """
+    Merge precursors from a single spot that can be isolated in the same quadrupole isolation window. Precursors are
+    clustered in order of m/z, and a precursor is added to the current cluster as long as the m/z range of the cluster
+    does not exceed the isolation width. Each cluster is acquired as a single MS/MS target at the center of its m/z
+    range.
+
+    :param peaks: Precursors with "m/z" and "Intensity" columns.
+    :type peaks: pandas.DataFrame
+    :param isolation_width: Quadrupole isolation width in m/z. If 0, precursors are not merged.
+    :type isolation_width: float
+    :return: Merged precursors with "m/z" and "Intensity" columns, where the intensity of each target is the highest
+        intensity of its cluster, sorted by ascending intensity.
+    :rtype: pandas.DataFrame
+    """
+    import numpy as np
+    import pandas as pd
+
+    peaks = peaks.sort_values(by='m/z').reset_index(drop=True)
+    if peaks.empty or not isolation_width:
+        return peaks.sort_values(by='Intensity', ascending=True).reset_index(drop=True)
+    mz_values = peaks['m/z'].values
+    clusters = np.zeros(mz_values.shape[0], dtype=int)
+    cluster_start = mz_values[0]
+    for i in range(1, mz_values.shape[0]):
+        if mz_values[i] - cluster_start > isolation_width:
+            cluster_start = mz_values[i]
+            clusters[i] = clusters[i - 1] + 1
+        else:
+            clusters[i] = clusters[i - 1]
+    merged = peaks.groupby(clusters).agg(mz_min=('m/z', 'min'), mz_max=('m/z', 'max'), Intensity=('Intensity', 'max'))
+    merged = pd.DataFrame({'m/z': ((merged['mz_min'] + merged['mz_max']) / 2).round(4),
+                           'Intensity': merged['Intensity']})
+    return merged.sort_values(by='Intensity', ascending=True).reset_index(drop=True)
 
 
 def get_rgb_color():
@@ -145,6 +214,8 @@ def get_plate_map(plate_format):
     :return: Plate map in the form of a pandas.DataFrame with alpha numeric values.
     :rtype: pandas.DataFrame
     """
+    import pandas as pd
+
     alphabets = [chr(i) for i in range(65, 91)]
     double_alphabets = [i + j for i in alphabets for j in alphabets]
     rows = alphabets + double_alphabets
@@ -181,15 +252,12 @@ def get_plate_map_style(df, autox):
     :rtype: list[dict]
     """
     style_dicts = []
-    plate_coords = [coord for coords in df.values.tolist() for coord in coords]
-    autox_coords = [cont.attrib['Pos_on_Scout'] for spot_group in autox for cont in spot_group]
-    for coord in plate_coords:
-        if coord not in autox_coords:
-            row, col = np.where(df.values == coord)
-            row = int(row)
-            col = str(int(col) + 1)
-            style_dicts.append({'if': {'row_index': row, 'column_id': col},
-                                'backgroundColor': 'gray', 'color': 'white'})
+    autox_coords = set(cont.attrib['Pos_on_Scout'] for spot_group in autox for cont in spot_group)
+    for row, coords in enumerate(df.values.tolist()):
+        for col, coord in enumerate(coords, start=1):
+            if coord not in autox_coords:
+                style_dicts.append({'if': {'row_index': row, 'column_id': str(col)},
+                                    'backgroundColor': 'gray', 'color': 'white'})
     return style_dicts
 
 
@@ -201,4 +269,6 @@ def get_plate_map_legend():
     :return: Single column DataFrame containing three default categories.
     :rtype: pandas.DataFrame
     """
+    import pandas as pd
+
     return pd.read_csv(os.path.join(os.path.split(os.path.dirname(__file__))[0], 'etc', 'plate_map_legend.csv'))
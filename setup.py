@@ -17,7 +17,7 @@ setup(
     license='Apache License',
     author='Gordon T. Luu',
     author_email='gtluu912@gmail.com',
-    packages=['msms_autox_generator', 'etc'],
+    packages=['msms_autox_generator', 'autox_geometry', 'etc'],
     include_package_data=True,
     package_data={'': ['*.cfg', '*.csv']},
     description='timsTOF fleX MALDI AutoXecute Automation Scripts',
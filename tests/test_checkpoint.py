@@ -0,0 +1,79 @@
+import json
+import numpy as np
+import pytest
+from maldi_polymerization import maldi_polymerization
+from maldi_polymerization.maldi_polymerization import (CHECKPOINT_JOURNAL, get_checkpoint_settings,
+                                                       iter_checkpoint_spectra, read_checkpoint_journal,
+                                                       write_checkpoint_parts)
+
+FRAMES = list(range(1, 8))
+CHECKPOINT_INTERVAL = 3
+
+
+def get_settings(checkpoint_interval=CHECKPOINT_INTERVAL):
+    return get_checkpoint_settings(['mr1.d', 'mr2.d'], FRAMES, 'profile', 64, checkpoint_interval)
+
+
+def get_spectra(frames):
+    # stitched arrays are reused between frames, so the same arrays are yielded with new values
+    mz_array = np.zeros(0)
+    intensity_array = np.zeros(0)
+    for frame in frames:
+        mz_array.resize(frame, refcheck=False)
+        intensity_array.resize(frame, refcheck=False)
+        mz_array[:] = np.arange(frame) + frame * 100.0
+        intensity_array[:] = frame
+        yield frame, mz_array, intensity_array
+
+
+def assert_spectra(spectra, frames):
+    spectra = list(spectra)
+    assert [i[0] for i in spectra] == frames
+    for frame, mz_array, intensity_array in spectra:
+        np.testing.assert_array_equal(mz_array, np.arange(frame) + frame * 100.0)
+        np.testing.assert_array_equal(intensity_array, np.full(frame, frame, dtype=float))
+
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint_dir = str(tmp_path / 'output.checkpoint')
+    assert read_checkpoint_journal(checkpoint_dir, get_settings()) == []
+    parts = write_checkpoint_parts(checkpoint_dir, get_spectra(FRAMES), 0, CHECKPOINT_INTERVAL)
+    assert [part['spectra'] for part in parts] == [3, 3, 1]
+    assert read_checkpoint_journal(checkpoint_dir, get_settings()) == parts
+    assert_spectra(iter_checkpoint_spectra(checkpoint_dir, parts), FRAMES)
+
+
+def test_checkpoint_resumes_after_truncated_journal_line(tmp_path):
+    checkpoint_dir = str(tmp_path / 'output.checkpoint')
+    read_checkpoint_journal(checkpoint_dir, get_settings())
+    parts = write_checkpoint_parts(checkpoint_dir, get_spectra(FRAMES), 0, CHECKPOINT_INTERVAL)
+    # interrupt the conversion while the entry of the second part is being written
+    journal_path = tmp_path / 'output.checkpoint' / CHECKPOINT_JOURNAL
+    lines = journal_path.read_text().splitlines()
+    journal_path.write_text('\n'.join(lines[:2]) + '\n' + lines[2][:len(lines[2]) // 2])
+    completed = read_checkpoint_journal(checkpoint_dir, get_settings())
+    assert completed == parts[:1]
+    # the truncated entry is removed from the journal
+    assert [json.loads(line) for line in journal_path.read_text().splitlines()[1:]] == completed
+    resumed_frames = [frame for part in completed for frame in range(part['first_frame'], part['last_frame'] + 1)]
+    remaining = [frame for frame in FRAMES if frame not in resumed_frames]
+    parts = completed + write_checkpoint_parts(checkpoint_dir, get_spectra(remaining), len(completed),
+                                               CHECKPOINT_INTERVAL)
+    assert [part['part'] for part in parts] == [0, 1, 2]
+    assert read_checkpoint_journal(checkpoint_dir, get_settings()) == parts
+    assert_spectra(iter_checkpoint_spectra(checkpoint_dir, parts), FRAMES)
+
+
+def test_checkpoint_with_different_settings_is_not_resumed(tmp_path):
+    checkpoint_dir = str(tmp_path / 'output.checkpoint')
+    read_checkpoint_journal(checkpoint_dir, get_settings())
+    write_checkpoint_parts(checkpoint_dir, get_spectra(FRAMES), 0, CHECKPOINT_INTERVAL)
+    with pytest.raises(ValueError, match='different input files or settings'):
+        read_checkpoint_journal(checkpoint_dir, get_settings(checkpoint_interval=CHECKPOINT_INTERVAL + 1))
+
+
+def test_checkpoint_interval_must_be_at_least_1(monkeypatch):
+    monkeypatch.setattr('sys.argv', ['maldi_polymerization.py', '--input', 'mr1.d', '--output', 'output',
+                                     '--checkpoint', '--checkpoint_interval', '0'])
+    with pytest.raises(SystemExit):
+        maldi_polymerization.get_args()
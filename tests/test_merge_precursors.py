@@ -0,0 +1,29 @@
+import pandas as pd
+from msms_autox_generator.util import merge_precursors
+
+
+def get_peaks(peaks):
+    return pd.DataFrame({'m/z': [i[0] for i in peaks], 'Intensity': [i[1] for i in peaks]})
+
+
+def test_merge_precursors_with_zero_isolation_width_does_not_merge():
+    peaks = get_peaks([(500.2, 3.0), (500.0, 1.0), (500.1, 2.0)])
+    merged = merge_precursors(peaks, 0)
+    assert merged['m/z'].tolist() == [500.0, 500.1, 500.2]
+    assert merged['Intensity'].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_merge_precursors_targets_the_center_of_each_cluster():
+    peaks = get_peaks([(500.0, 1.0), (501.5, 4.0), (700.0, 2.0)])
+    merged = merge_precursors(peaks, 2.0)
+    assert merged['m/z'].tolist() == [700.0, 500.75]
+    assert merged['Intensity'].tolist() == [2.0, 4.0]
+
+
+def test_merge_precursors_splits_chains_longer_than_the_isolation_width():
+    # Each precursor is within the isolation width of the next, but the chain spans 3 m/z.
+    # 503.0 starts a new cluster.
+    peaks = get_peaks([(500.0, 1.0), (501.0, 2.0), (502.0, 3.0), (503.0, 4.0)])
+    merged = merge_precursors(peaks, 2.0)
+    assert merged['m/z'].tolist() == [501.0, 503.0]
+    assert merged['Intensity'].tolist() == [3.0, 4.0]
@@ -0,0 +1,56 @@
+import itertools
+import lxml.etree as et
+from msms_autox_generator import precursor_scheduler
+from msms_autox_generator.precursor_scheduler import schedule_precursors
+
+# Each precursor takes 1 s to acquire, and the first precursor on a spot takes an additional 2 s.
+PARAMS = {'shots': 100,
+          'laser_frequency': 100.0,
+          'isolation_width': 2.0,
+          'method_load_time': 0.0,
+          'spot_overhead': 2.0,
+          'precursor_overhead': 0.0,
+          'stage_speed': 10000.0}
+# Precursors as spot: [(m/z, intensity)]. The second and later precursors on A1 are less intense than the precursors on
+# B1, but are cheaper once A1 has been started.
+PRECURSORS = {'A1': [(100.0, 10.0), (200.0, 6.0), (300.0, 6.0), (400.0, 6.0)],
+              'B1': [(500.0, 7.0), (600.0, 7.0)]}
+BUDGET = 6.0
+
+
+def get_autox():
+    autox = et.Element('table')
+    for spot, precursors in PRECURSORS.items():
+        spot_group = et.SubElement(autox, 'spot_group', attrib={'sampleName': f'{spot}_{spot}_MSMS',
+                                                                'acqMethod': 'missing.m'})
+        for mz, intensity in precursors:
+            et.SubElement(spot_group, 'cont', attrib={'Pos_on_Scout': spot,
+                                                      'acqJobMode': 'MSMS',
+                                                      'precursor_m_z': str(mz)})
+    return autox
+
+
+def get_brute_force_intensity():
+    precursors = [(spot, intensity) for spot, spot_precursors in PRECURSORS.items()
+                  for mz, intensity in spot_precursors]
+    best = 0.0
+    for count in range(len(precursors) + 1):
+        for subset in itertools.combinations(precursors, count):
+            spots = {spot for spot, intensity in subset}
+            if len(subset) + len(spots) * PARAMS['spot_overhead'] <= BUDGET:
+                best = max(best, sum(intensity for spot, intensity in subset))
+    return best
+
+
+def test_schedule_precursors_matches_brute_force(monkeypatch):
+    # Without the group penalty and with distinct m/z values, the score of a precursor is its intensity.
+    monkeypatch.setattr(precursor_scheduler, 'GROUP_WEIGHT', 0.0)
+    precursor_data = {spot: {'peak_picked_mz_array': [mz for mz, intensity in precursors],
+                             'peak_picked_intensity_array': [intensity for mz, intensity in precursors]}
+                      for spot, precursors in PRECURSORS.items()}
+    autox = get_autox()
+    schedule_precursors(autox, BUDGET, precursor_data, params=PARAMS)
+    intensities = {(spot, mz): intensity for spot, precursors in PRECURSORS.items() for mz, intensity in precursors}
+    scheduled = sum(intensities[(cont.attrib['Pos_on_Scout'], float(cont.attrib['precursor_m_z']))]
+                    for spot_group in autox for cont in spot_group)
+    assert scheduled == get_brute_force_intensity()
@@ -0,0 +1,46 @@
+import random
+from autox_geometry import PlateGeometry, get_route_length, optimize_route
+
+ROWS = 'ABCDEFGH'
+COLUMNS = 12
+PITCH = 9000.0
+
+
+def get_geometry(tmp_path):
+    spots = ''.join(f'<Spot PositionName="{row}{column}" UnitCoord_X="{(column - 1) * PITCH}" '
+                    f'UnitCoord_Y="{ROWS.index(row) * PITCH}"/>'
+                    for row in ROWS for column in range(1, COLUMNS + 1))
+    geometry_path = tmp_path / 'plate.xeo'
+    geometry_path.write_text(f'<PlateType><PlateSpots>{spots}</PlateSpots></PlateType>')
+    return PlateGeometry(str(geometry_path))
+
+
+def get_random_spots(seed, count):
+    rng = random.Random(seed)
+    return [f'{rng.choice(ROWS)}{rng.randint(1, COLUMNS)}' for i in range(count)]
+
+
+def test_optimize_route_is_a_permutation_not_longer_than_original(tmp_path):
+    geometry = get_geometry(tmp_path)
+    for seed in range(50):
+        spots = get_random_spots(seed, 2 + seed % 20)
+        order = optimize_route(geometry, spots)
+        assert sorted(order) == list(range(len(spots)))
+        assert order[0] == 0
+        assert get_route_length(geometry, [spots[i] for i in order]) <= get_route_length(geometry, spots) + 1e-6
+
+
+def test_optimize_route_keeps_group_runs_contiguous(tmp_path):
+    geometry = get_geometry(tmp_path)
+    for seed in range(50):
+        rng = random.Random(seed)
+        spots = get_random_spots(seed, 30)
+        groups = sorted(rng.choice(['method_1', 'method_2', 'method_3']) for spot in spots)
+        if seed % 2:
+            # a method that is used again later forms a separate run
+            groups = groups[10:] + groups[:10]
+        order = optimize_route(geometry, spots, groups)
+        assert sorted(order) == list(range(len(spots)))
+        # the sequence of groups, and therefore every run of the same group, is unchanged
+        assert [groups[i] for i in order] == groups
+        assert get_route_length(geometry, [spots[i] for i in order]) <= get_route_length(geometry, spots) + 1e-6
@@ -0,0 +1,58 @@
+import gzip
+import pickle
+import numpy as np
+import pytest
+from msms_autox_generator.session import load_session, save_session
+
+
+class Unpickled(object):
+    def __reduce__(self):
+        return pytest.fail, ('session snapshot was unpickled',)
+
+
+def get_session(tmp_path):
+    raw_data_path = tmp_path / 'A1.d'
+    raw_data_path.mkdir(exist_ok=True)
+    (raw_data_path / 'analysis.tsf').write_bytes(b'tsf')
+    return {'autox_seq': str(tmp_path / 'plate.run'),
+            'autox_path_dict': {'0': {'sample_name': 'A1',
+                                      'raw_data_path': str(raw_data_path),
+                                      'method_path': 'method.m'}},
+            'blank_spots': {'spots': ['B1']},
+            'indexed_data': {'A1': str(raw_data_path)},
+            'precursor_data': {'A1': {'peak_picked_mz_array': np.array([100.0, 200.5]),
+                                      'peak_picked_intensity_array': np.array([3.0, 4.0], dtype=np.float32),
+                                      'peak_picking_indices': np.array([1, 5])},
+                               'B1': [{'m/z': np.float64(300.25), 'Intensity': np.float64(2.0)}]},
+            'sample_params_log': {'PEAK_PICKING': {'method': 'locmax', 'snr': 3}}}
+
+
+def test_session_round_trip_restores_arrays(tmp_path):
+    path = str(tmp_path / 'plate.msmssession')
+    save_session(path, get_session(tmp_path))
+    session = load_session(path)
+    assert session['raw_data_current']
+    assert session['blank_spots'] == {'spots': ['B1']}
+    spot = session['precursor_data']['A1']
+    np.testing.assert_array_equal(spot['peak_picked_mz_array'], [100.0, 200.5])
+    assert spot['peak_picked_intensity_array'].dtype == np.float32
+    np.testing.assert_array_equal(spot['peak_picking_indices'], [1, 5])
+    assert session['precursor_data']['B1'] == [{'m/z': 300.25, 'Intensity': 2.0}]
+
+
+def test_session_drops_raw_data_results_if_raw_data_changed(tmp_path):
+    path = str(tmp_path / 'plate.msmssession')
+    save_session(path, get_session(tmp_path))
+    (tmp_path / 'A1.d' / 'analysis.tsf').write_bytes(b'changed')
+    session = load_session(path)
+    assert not session['raw_data_current']
+    assert 'precursor_data' not in session
+    assert session['blank_spots'] == {'spots': ['B1']}
+
+
+def test_load_session_does_not_unpickle(tmp_path):
+    path = str(tmp_path / 'plate.msmssession')
+    with gzip.open(path, 'wb') as session_file:
+        pickle.dump({'version': 1, 'payload': Unpickled()}, session_file)
+    with pytest.raises(ValueError, match='not a valid session snapshot'):
+        load_session(path)